@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ChatRoom, Message, ForumThread, ForumPost
+from .models import ChatRoom, Message
 
 @admin.register(ChatRoom)
 class ChatRoomAdmin(admin.ModelAdmin):
@@ -12,15 +12,3 @@ class MessageAdmin(admin.ModelAdmin):
     list_display = ('sender', 'room', 'created_at')
     list_filter = ('created_at', 'room')
     search_fields = ('content', 'sender__username')
-
-@admin.register(ForumThread)
-class ForumThreadAdmin(admin.ModelAdmin):
-    list_display = ('title', 'creator', 'is_pinned', 'created_at')
-    list_filter = ('is_pinned', 'created_at')
-    search_fields = ('title', 'content')
-
-@admin.register(ForumPost)
-class ForumPostAdmin(admin.ModelAdmin):
-    list_display = ('thread', 'author', 'created_at')
-    list_filter = ('created_at',)
-    search_fields = ('content', 'author__username')
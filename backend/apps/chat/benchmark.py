@@ -0,0 +1,156 @@
+"""
+Load test for the websocket chat tier.
+
+Drives ``ChatConsumer`` through ``WebsocketCommunicator`` on the in-memory
+channel layer: ``rooms`` rooms of ``participants`` users each, every user
+sending ``messages`` messages at about ``rate`` a second with a typing frame
+before some of them. Reports throughput, fan-out latency (send to receipt by
+each other participant; messages are broadcast before the write-behind
+flush) and database queries per message, including the buffered writes and
+notification queueing.
+
+Run it with ``manage.py chat_benchmark``. Rows it creates are rolled back.
+"""
+import asyncio
+import json
+import random
+import time
+import uuid
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from asgiref.sync import async_to_sync
+from .models import ChatRoom, Message
+from .routing import websocket_urlpatterns
+from .services import message_buffer, presence_tracker
+
+User = get_user_model()
+
+BENCHMARK_SETTINGS = {
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer', 'CONFIG': {'capacity': 10000}}},
+    # Benchmark the socket path, not the notification worker
+    'NOTIFICATION_QUEUE_ASYNC': True,
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class ChatBenchmark:
+    def __init__(self, rooms=5, participants=10, messages=10, rate=2.0, typing_ratio=0.5, timeout=30, seed=None):
+        self.rooms = rooms
+        self.participants = participants
+        self.messages = messages
+        self.rate = rate
+        self.typing_ratio = typing_ratio
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.sent_at = {}
+        self.latencies = []
+        self.received = 0
+        self.rejected = 0
+
+    def setup(self):
+        """Create the users and rooms. Returns [(room, [users])]."""
+        prefix = uuid.uuid4().hex[:8]
+        layout = []
+        for room_index in range(self.rooms):
+            users = [User(username=f'bench-{prefix}-{room_index}-{index}') for index in range(self.participants)]
+            for user in users:
+                user.set_unusable_password()
+            users = User.objects.bulk_create(users)
+            room = ChatRoom.objects.create(type='group', name=f'Benchmark {room_index}')
+            room.participants.add(*users)
+            layout.append((room, users))
+        return layout
+
+    def application(self, user):
+        router = URLRouter(websocket_urlpatterns)
+
+        async def app(scope, receive, send):
+            return await router(dict(scope, user=user), receive, send)
+        return app
+
+    async def listen(self, communicator, user):
+        while True:
+            try:
+                data = json.loads(await communicator.receive_from(timeout=self.timeout))
+            except asyncio.TimeoutError:
+                return
+            if data.get('error'):
+                self.rejected += 1
+                continue
+            sent = self.sent_at.get(data.get('message'))
+            if sent and data.get('sender', {}).get('id') != user.id:
+                self.latencies.append(time.perf_counter() - sent)
+                self.received += 1
+
+    async def chat(self, communicator):
+        for _ in range(self.messages):
+            await asyncio.sleep(self.random.expovariate(self.rate))
+            if self.random.random() < self.typing_ratio:
+                await communicator.send_json_to({'type': 'typing'})
+            token = uuid.uuid4().hex
+            self.sent_at[token] = time.perf_counter()
+            await communicator.send_json_to({'type': 'message', 'message': token})
+
+    async def run(self, layout):
+        connections = []
+        for room, users in layout:
+            for user in users:
+                communicator = WebsocketCommunicator(self.application(user), f'/ws/chat/{room.id}/')
+                connected, _ = await communicator.connect()
+                if not connected:
+                    raise RuntimeError(f'User {user.username} could not join room {room.id}')
+                connections.append((communicator, user))
+
+        expected = self.rooms * self.participants * self.messages * (self.participants - 1)
+        listeners = [asyncio.ensure_future(self.listen(communicator, user)) for communicator, user in connections]
+
+        started = time.perf_counter()
+        await asyncio.gather(*[self.chat(communicator) for communicator, _ in connections])
+        deadline = time.perf_counter() + self.timeout
+        while self.received < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+        await message_buffer.flush()
+        for task in listeners + [message_buffer.flush_task, presence_tracker.broadcast_task, presence_tracker.flush_task]:
+            if task is not None and not task.done():
+                task.cancel()
+        for communicator, _ in connections:
+            await communicator.disconnect()
+        await presence_tracker.flush()
+        presence_tracker.changes = {}
+        return elapsed, expected
+
+    def execute(self):
+        """Run the benchmark and roll back everything it wrote. Returns the report dict."""
+        with override_settings(**BENCHMARK_SETTINGS), transaction.atomic():
+            layout = self.setup()
+            with CaptureQueriesContext(connection) as queries:
+                elapsed, expected = async_to_sync(self.run)(layout)
+            persisted = Message.objects.filter(room__in=[room for room, _ in layout]).count()
+            transaction.set_rollback(True)
+
+        sent = len(self.sent_at)
+        return {
+            'connections': self.rooms * self.participants,
+            'messages_sent': sent,
+            'messages_persisted': persisted,
+            'deliveries': self.received,
+            'deliveries_expected': expected,
+            'rejected_frames': self.rejected,
+            'elapsed': elapsed,
+            'messages_per_second': sent / elapsed if elapsed else 0,
+            'deliveries_per_second': self.received / elapsed if elapsed else 0,
+            'fanout_p50_ms': (percentile(self.latencies, 0.5) or 0) * 1000,
+            'fanout_p99_ms': (percentile(self.latencies, 0.99) or 0) * 1000,
+            'queries_per_message': len(queries) / sent if sent else 0,
+        }
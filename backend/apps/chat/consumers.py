@@ -1,16 +1,22 @@
 import json
+import uuid
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.core.exceptions import ObjectDoesNotExist
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from .models import ChatRoom, Message, ChatRoomParticipant
 from .serializers import MessageSerializer
+from django.conf import settings
+from .services import (
+    MessageService, ParticipantService, PresenceService, ReadReceiptService, TokenBucket, TypingService,
+    message_buffer, presence_tracker
+)
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.room_id = self.scope['url_route']['kwargs']['room_id']
-        self.room_group_name = f'chat_{self.room_id}'
         self.user = self.scope['user']
+        self.inbound = TokenBucket(settings.CHAT_INBOUND_RATE, settings.CHAT_INBOUND_BURST)
 
         # Verify user is authenticated
         if not self.user.is_authenticated:
@@ -18,15 +24,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return
 
         # Verify user is a participant
-        try:
-            self.participant = await self.verify_participant()
-        except ObjectDoesNotExist:
+        if not await self.verify_participant():
             await self.close()
             return
 
         # Join room group
+        room_group_name = f'chat_{self.room_id}'
         await self.channel_layer.group_add(
-            self.room_group_name,
+            room_group_name,
             self.channel_name
         )
         
@@ -36,37 +41,21 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        # Accept the connection
+        # Accept the connection; disconnect only cleans up (and announces) accepted sockets
         await self.accept()
+        self.room_group_name = room_group_name
 
         # Update user's online status
         await self.update_user_status(True)
 
-        # Send user joined message
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'user_join',
-                'user': self.user.username,
-                'timestamp': timezone.now().isoformat()
-            }
-        )
-
     async def disconnect(self, close_code):
         if hasattr(self, 'room_group_name'):
+            # Don't leave this socket's messages waiting in the buffer
+            await message_buffer.flush()
+
             # Update user's online status
             await self.update_user_status(False)
-            
-            # Send user left message
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'user_leave',
-                    'user': self.user.username,
-                    'timestamp': timezone.now().isoformat()
-                }
-            )
-            
+
             # Leave room group
             await self.channel_layer.group_discard(
                 self.room_group_name,
@@ -83,24 +72,47 @@ class ChatConsumer(AsyncWebsocketConsumer):
         try:
             text_data_json = json.loads(text_data)
             message_type = text_data_json.get('type', 'message')
-            
+
+            # Heartbeats and typing frames are cheap and typing is throttled by TypingService,
+            # so only frames that do real work spend tokens
+            if message_type not in ('heartbeat', 'typing') and not self.inbound.consume():
+                # Drop the frame and tell the client how long to back off
+                await self.send(text_data=json.dumps({
+                    'error': 'Rate limit exceeded',
+                    'retry_after': round(self.inbound.retry_after(), 2)
+                }))
+                return
+
             if message_type == 'message':
-                message = text_data_json['message']
-                # Save message to database
-                saved_message = await self.save_message(message)
-                
-                # Send message to room group
+                message = Message(
+                    room_id=int(self.room_id),
+                    sender=self.user,
+                    content=text_data_json['message'],
+                    created_at=timezone.now()
+                )
+
+                # Broadcast straight away; the write-behind buffer saves the row and acks its id
+                temp_id = uuid.uuid4().hex
                 await self.channel_layer.group_send(
                     self.room_group_name,
-                    {
-                        'type': 'chat_message',
-                        'message': message,
-                        'user': self.user.username,
-                        'timestamp': saved_message.created_at.isoformat()
-                    }
+                    MessageService.build_event(message, temp_id)
                 )
+                await message_buffer.add(message, temp_id, self.channel_name)
+            elif message_type == 'read':
+                # Clients learn a buffered message's id from its ack; mark_read clamps to stored messages
+                watermark = await self.mark_read(text_data_json.get('message_id'))
+                if watermark is not None:
+                    await self.channel_layer.group_send(
+                        self.room_group_name,
+                        ReadReceiptService.build_event(int(self.room_id), self.user, watermark)
+                    )
+            elif message_type == 'heartbeat':
+                # Keeps this socket online past CHAT_PRESENCE_TTL
+                await self.update_user_status(True)
             elif message_type == 'typing':
-                # Broadcast typing status
+                # Broadcast typing status, at most once per interval; clients treat it as sticky
+                if not await sync_to_async(TypingService.should_broadcast)(int(self.room_id), self.user.id):
+                    return
                 await self.channel_layer.group_send(
                     self.room_group_name,
                     {
@@ -116,15 +128,30 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.send(text_data=json.dumps({
                 'error': 'Missing required fields'
             }))
+        except (TypeError, ValueError):
+            await self.send(text_data=json.dumps({
+                'error': 'Invalid field value'
+            }))
 
     async def chat_message(self, event):
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'message',
-            'message': event['message'],
-            'user': event['user'],
-            'timestamp': event['timestamp']
-        }))
+        # The payload is serialized once by MessageService.build_event
+        await self.send(text_data=event['text'])
+
+    async def chat_ack(self, event):
+        # Stored id for a message broadcast under a temp_id
+        await self.send(text_data=event['text'])
+
+    async def chat_failed(self, event):
+        # A message broadcast under a temp_id could not be saved
+        await self.send(text_data=event['text'])
+
+    async def chat_error(self, event):
+        # Sent only to the socket whose message could not be saved
+        await self.send(text_data=event['text'])
+
+    async def chat_read(self, event):
+        # Read watermark moved for one participant
+        await self.send(text_data=event['text'])
 
     async def user_typing(self, event):
         # Send typing status to WebSocket
@@ -133,40 +160,29 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'user': event['user']
         }))
 
-    async def user_join(self, event):
-        # Send user joined notification
-        await self.send(text_data=json.dumps({
-            'type': 'user_join',
-            'user': event['user']
-        }))
-
-    async def user_leave(self, event):
-        # Send user left notification
-        await self.send(text_data=json.dumps({
-            'type': 'user_leave',
-            'user': event['user']
-        }))
+    async def presence(self, event):
+        # Debounced joined/left usernames from PresenceTracker
+        await self.send(text_data=event['text'])
 
     @database_sync_to_async
     def verify_participant(self):
-        return ChatRoomParticipant.objects.select_related('chat_room').get(
-            chat_room_id=self.room_id,
-            user=self.user
-        )
+        return ParticipantService.is_participant(self.room_id, self.user)
 
     @database_sync_to_async
-    def update_user_status(self, is_online):
-        self.participant.is_online = is_online
-        self.participant.last_seen = timezone.now()
-        self.participant.save(update_fields=['is_online', 'last_seen'])
+    def mark_read(self, message_id):
+        if message_id is not None:
+            message_id = int(message_id)
+        return ReadReceiptService.mark_read(int(self.room_id), self.user, message_id)
 
-    @database_sync_to_async
-    def save_message(self, content):
-        message = Message.objects.create(
-            room_id=self.room_id,
-            sender=self.user,
-            content=content
-        )
-        # Mark as read by sender
-        message.read_by.add(self.user)
-        return message 
\ No newline at end of file
+    async def update_user_status(self, is_online):
+        # Online participants get messages over the socket instead of notifications.
+        # Only the first tab coming online or the last one leaving is broadcast.
+        # Presence only touches the cache, so it runs off the shared ORM thread while waiting for the room lock
+        room_id = int(self.room_id)
+        if is_online:
+            changed = await sync_to_async(PresenceService.join, thread_sensitive=False)(room_id, self.user.id, self.channel_name)
+        else:
+            changed = await sync_to_async(PresenceService.leave, thread_sensitive=False)(room_id, self.user.id, self.channel_name)
+        if changed:
+            await presence_tracker.changed(room_id, self.user, is_online)
+        await presence_tracker.seen_now(room_id, self.user.id) 
\ No newline at end of file
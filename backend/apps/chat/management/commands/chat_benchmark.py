@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.chat.benchmark import ChatBenchmark
+
+
+class Command(BaseCommand):
+    help = 'Load tests ChatConsumer over the in-memory channel layer and reports throughput, latency and queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=5)
+        parser.add_argument('--participants', type=int, default=10, help='Connected users per room')
+        parser.add_argument('--messages', type=int, default=10, help='Messages each user sends')
+        parser.add_argument('--rate', type=float, default=2.0, help='Messages per second per user')
+        parser.add_argument('--typing-ratio', type=float, default=0.5, help='Share of messages preceded by a typing frame')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for outstanding deliveries')
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        if options['participants'] < 2:
+            raise CommandError('--participants must be at least 2')
+        if options['rate'] <= 0:
+            raise CommandError('--rate must be positive')
+
+        report = ChatBenchmark(
+            rooms=options['rooms'],
+            participants=options['participants'],
+            messages=options['messages'],
+            rate=options['rate'],
+            typing_ratio=options['typing_ratio'],
+            timeout=options['timeout'],
+            seed=options['seed']
+        ).execute()
+
+        self.stdout.write(f"Connections:        {report['connections']}")
+        self.stdout.write(f"Messages sent:      {report['messages_sent']} ({report['messages_persisted']} persisted)")
+        self.stdout.write(f"Deliveries:         {report['deliveries']} of {report['deliveries_expected']}")
+        self.stdout.write(f"Rejected frames:    {report['rejected_frames']}")
+        self.stdout.write(f"Messages/sec:       {report['messages_per_second']:.1f}")
+        self.stdout.write(f"Deliveries/sec:     {report['deliveries_per_second']:.1f}")
+        self.stdout.write(f"Fan-out p50:        {report['fanout_p50_ms']:.2f} ms")
+        self.stdout.write(f"Fan-out p99:        {report['fanout_p99_ms']:.2f} ms")
+        self.stdout.write(f"Queries/message:    {report['queries_per_message']:.2f}")
+
+        if report['deliveries'] < report['deliveries_expected']:
+            self.stdout.write(self.style.WARNING('Some deliveries did not arrive before the timeout'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Benchmark complete'))
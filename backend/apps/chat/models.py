@@ -39,6 +39,10 @@ class ChatRoomParticipant(models.Model):
     chat_room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     last_read_at = models.DateTimeField(null=True, blank=True)
+    # Everything in the room up to this message id has been read
+    last_read_message_id = models.PositiveBigIntegerField(null=True, blank=True)
+    # Written in batches by PresenceTracker, so it may lag by a flush interval
+    last_seen = models.DateTimeField(null=True, blank=True)
     joined_at = models.DateTimeField(auto_now_add=True)
     is_admin = models.BooleanField(default=False)
 
@@ -80,6 +84,7 @@ class Message(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['room', '-created_at'], name='message_room_created_at_idx'),
+            models.Index(fields=['room', 'id'], name='message_room_id_idx'),
             models.Index(fields=['sender'], name='message_sender_idx'),
         ]
 
@@ -88,9 +93,8 @@ class Message(models.Model):
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        # Update room's last_message_at
-        self.room.last_message_at = self.created_at
-        self.room.save(update_fields=['last_message_at'])
+        # Update room's last_message_at without loading the room or firing its signals
+        ChatRoom.objects.filter(pk=self.room_id).update(last_message_at=self.created_at)
 
 class MessageRead(models.Model):
     message = models.ForeignKey(Message, on_delete=models.CASCADE)
@@ -102,4 +106,5 @@ class MessageRead(models.Model):
         indexes = [
             models.Index(fields=['message', 'user']),
             models.Index(fields=['user', 'read_at']),
+            models.Index(fields=['read_at', 'id'], name='message_read_read_at_idx'),
         ]
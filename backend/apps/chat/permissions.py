@@ -1,5 +1,15 @@
 from rest_framework import permissions
+from .services import ParticipantService
 
 class IsChatParticipant(permissions.BasePermission):
+    """Room membership for room objects and for views nested under a room_pk."""
+
+    def has_permission(self, request, view):
+        room_id = view.kwargs.get('room_pk')
+        if room_id is None:
+            return True
+        return ParticipantService.is_participant(room_id, request.user, request)
+
     def has_object_permission(self, request, view, obj):
-        return request.user in obj.participants.all() 
\ No newline at end of file
+        room_id = getattr(obj, 'room_id', obj.pk)
+        return ParticipantService.is_participant(room_id, request.user, request)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.core.files.storage import default_storage
 from django.contrib.auth import get_user_model
 from .models import ChatRoom, Message, ChatRoomParticipant
 
@@ -19,7 +20,7 @@ class ChatParticipantSerializer(serializers.ModelSerializer):
         model = ChatRoomParticipant
         fields = [
             'user_id', 'username', 'full_name', 
-            'last_read_at', 'joined_at', 'is_admin',
+            'last_read_at', 'last_read_message_id', 'joined_at', 'is_admin',
             'unread_count'
         ]
 
@@ -34,10 +35,50 @@ class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = ['id', 'room', 'sender', 'content', 'created_at']
+        # Taken from the URL by MessageViewSet
+        read_only_fields = ['room']
 
 class ChatRoomSerializer(serializers.ModelSerializer):
     participants = UserSerializer(many=True, read_only=True)
 
     class Meta:
         model = ChatRoom
-        fields = ['id', 'name', 'participants'] 
\ No newline at end of file
+        fields = ['id', 'name', 'participants']
+
+class LastMessageSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source='last_message_id')
+    content = serializers.SerializerMethodField()
+    sender = serializers.CharField(source='last_message_sender')
+    created_at = serializers.DateTimeField(source='last_message_created_at')
+
+    def get_content(self, obj):
+        content = obj.last_message_content or ''
+        return content[:100] + '...' if len(content) > 100 else content
+
+class ChatRoomListSerializer(serializers.ModelSerializer):
+    """Inbox row; expects the annotations added by ChatRoomViewSet.get_queryset."""
+    participants = UserSerializer(many=True, read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
+    last_message = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChatRoom
+        fields = ['id', 'name', 'type', 'participants', 'unread_count', 'last_message', 'last_message_at']
+
+    def get_last_message(self, obj):
+        if obj.last_message_id is None:
+            return None
+        return LastMessageSerializer(obj).data
+
+class MessageHistorySerializer(serializers.Serializer):
+    """Lean message row built from .values(); senders are side-loaded by id."""
+    id = serializers.IntegerField()
+    sender_id = serializers.IntegerField()
+    content = serializers.CharField()
+    file_url = serializers.SerializerMethodField()
+    is_system_message = serializers.BooleanField()
+    created_at = serializers.DateTimeField()
+
+    def get_file_url(self, obj):
+        return default_storage.url(obj['file']) if obj['file'] else None
+
@@ -0,0 +1,567 @@
+import asyncio
+import atexit
+import json
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from .models import ChatRoom, ChatRoomParticipant, Message, MessageRead
+from apps.notifications.services import NotificationQueue
+
+
+class PresenceService:
+    """
+    Tracks which users have a socket open on each room.
+
+    Each room key maps user id -> {channel name: expiry}, so a user with
+    several tabs stays online until the last one goes away, and a socket
+    that dies without disconnecting drops out once its heartbeat expires.
+    """
+
+    @staticmethod
+    def room_key(room_id):
+        return f'chat_presence_{room_id}'
+
+    @staticmethod
+    def live_connections(connections, now):
+        return {channel: expires for channel, expires in connections.items() if expires > now}
+
+    @staticmethod
+    @contextmanager
+    def locked(room_id):
+        """
+        Serialize read-modify-write of a room's entry across workers.
+
+        Yields False if the lock could not be taken within
+        CHAT_PRESENCE_LOCK_TIMEOUT; callers must then leave the entry alone.
+        """
+        key = f'chat_presence_lock_{room_id}'
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + settings.CHAT_PRESENCE_LOCK_TIMEOUT
+        # cache.add succeeds for one caller at a time; a lock left by a dead worker expires
+        acquired = cache.add(key, token, settings.CHAT_PRESENCE_LOCK_TIMEOUT)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(0.01)
+            acquired = cache.add(key, token, settings.CHAT_PRESENCE_LOCK_TIMEOUT)
+        try:
+            yield acquired
+        finally:
+            # Only release our own lock, never one another worker took after ours expired
+            if acquired and cache.get(key) == token:
+                cache.delete(key)
+
+    @staticmethod
+    def join(room_id, user_id, channel_name):
+        """Register or refresh a connection. Returns True if the user just came online."""
+        key = PresenceService.room_key(room_id)
+        with PresenceService.locked(room_id) as acquired:
+            if not acquired:
+                # The next heartbeat registers the connection
+                print(f"Error registering presence in room {room_id}: lock timed out")
+                return False
+            now = time.time()
+            online = cache.get(key) or {}
+            connections = PresenceService.live_connections(online.get(user_id, {}), now)
+            came_online = not connections
+            connections[channel_name] = now + settings.CHAT_PRESENCE_TTL
+            online[user_id] = connections
+            cache.set(key, online, settings.CHAT_PRESENCE_TTL * 2)
+        return came_online
+
+    @staticmethod
+    def leave(room_id, user_id, channel_name):
+        """Drop a connection. Returns True if it was the user's last one."""
+        key = PresenceService.room_key(room_id)
+        with PresenceService.locked(room_id) as acquired:
+            if not acquired:
+                # The connection drops out once its heartbeat expires
+                print(f"Error removing presence in room {room_id}: lock timed out")
+                return False
+            now = time.time()
+            online = cache.get(key) or {}
+            connections = PresenceService.live_connections(online.get(user_id, {}), now)
+            connections.pop(channel_name, None)
+            if connections:
+                online[user_id] = connections
+            else:
+                online.pop(user_id, None)
+            cache.set(key, online, settings.CHAT_PRESENCE_TTL * 2)
+        return not connections
+
+    @staticmethod
+    def online_users(room_ids):
+        """Get the online user ids for each room."""
+        now = time.time()
+        keys = {PresenceService.room_key(room_id): room_id for room_id in room_ids}
+        found = cache.get_many(list(keys))
+        return {
+            room_id: {
+                user_id for user_id, connections in (found.get(key) or {}).items()
+                if PresenceService.live_connections(connections, now)
+            }
+            for key, room_id in keys.items()
+        }
+
+    @staticmethod
+    def save_last_seen(seen, chunk_size=100):
+        """Write {(room_id, user_id): datetime} to ChatRoomParticipant.last_seen, one lookup per chunk of rooms."""
+        if not seen:
+            return 0
+        users_by_room = defaultdict(list)
+        for room_id, user_id in seen:
+            users_by_room[room_id].append(user_id)
+
+        # One OR'd condition per room, chunked so a reconnect storm stays under the database's expression limits
+        room_ids = list(users_by_room)
+        participants = []
+        for start in range(0, len(room_ids), chunk_size):
+            lookup = Q()
+            for room_id in room_ids[start:start + chunk_size]:
+                lookup |= Q(chat_room_id=room_id, user_id__in=users_by_room[room_id])
+            participants.extend(
+                ChatRoomParticipant(pk=pk, last_seen=seen[(room_id, user_id)])
+                for pk, room_id, user_id in ChatRoomParticipant.objects.filter(lookup).values_list('pk', 'chat_room_id', 'user_id')
+            )
+        ChatRoomParticipant.objects.bulk_update(participants, ['last_seen'], batch_size=chunk_size)
+        return len(participants)
+
+
+class TypingService:
+    """Lets one typing broadcast per user per room through each CHAT_TYPING_INTERVAL."""
+
+    @staticmethod
+    def should_broadcast(room_id, user_id):
+        # cache.add only succeeds for the first caller in each window, on any worker
+        return cache.add(f'chat_typing_{room_id}_{user_id}', 1, settings.CHAT_TYPING_INTERVAL)
+
+
+class TokenBucket:
+    """
+    Per-connection inbound rate limit.
+
+    Refills ``rate`` tokens a second up to ``burst``; each frame takes one.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def consume(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self):
+        """Seconds until the next frame would be accepted."""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class ParticipantService:
+    """
+    Room membership checks backed by ChatRoomParticipant, falling back to the
+    ChatRoom.participants join table for members who have no row yet.
+
+    Answers are memoized on the request and cached for
+    CHAT_MEMBERSHIP_CACHE_TTL seconds per (room, user). Removing a
+    participant clears the entry straight away.
+    """
+
+    @staticmethod
+    def cache_key(room_id, user_id):
+        return f'chat_member_{room_id}_{user_id}'
+
+    @staticmethod
+    def is_participant(room_id, user, request=None):
+        if not user or not user.is_authenticated:
+            return False
+        room_id = int(room_id)
+        memo = getattr(request, '_chat_membership', None) if request is not None else None
+        if memo is not None and room_id in memo:
+            return memo[room_id]
+
+        key = ParticipantService.cache_key(room_id, user.id)
+        is_member = cache.get(key)
+        if is_member is None:
+            is_member = ChatRoomParticipant.objects.filter(chat_room_id=room_id, user_id=user.id).exists()
+            if not is_member and ChatRoom.participants.through.objects.filter(
+                chatroom_id=room_id, user_id=user.id
+            ).exists():
+                # Joined before ChatRoomParticipant rows were kept in step; backfill the row
+                ParticipantService.sync_added(room_id, [user.id])
+                is_member = True
+            cache.set(key, is_member, settings.CHAT_MEMBERSHIP_CACHE_TTL)
+
+        if request is not None:
+            if memo is None:
+                memo = request._chat_membership = {}
+            memo[room_id] = is_member
+        return is_member
+
+    @staticmethod
+    def forget(room_id, user_ids):
+        cache.delete_many([ParticipantService.cache_key(room_id, user_id) for user_id in user_ids])
+
+    @staticmethod
+    def sync_added(room_id, user_ids):
+        """Give users added through ChatRoom.participants a ChatRoomParticipant row."""
+        ChatRoomParticipant.objects.bulk_create(
+            [ChatRoomParticipant(chat_room_id=room_id, user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True
+        )
+        ParticipantService.forget(room_id, user_ids)
+
+    @staticmethod
+    def sync_removed(room_id, user_ids=None):
+        participants = ChatRoomParticipant.objects.filter(chat_room_id=room_id)
+        if user_ids is not None:
+            participants = participants.filter(user_id__in=user_ids)
+        removed = list(participants.values_list('user_id', flat=True))
+        participants.delete()
+        ParticipantService.forget(room_id, removed)
+
+
+class MessageService:
+    @staticmethod
+    def build_event(message, temp_id=None):
+        """
+        Build the group event for a message, serialized once for every socket.
+
+        A buffered message is broadcast before it is saved, so it carries a
+        temp_id and no id; the id follows in the event from build_ack_event.
+        """
+        if message.pk is None and temp_id is None:
+            # Clients dedupe, page and mark read by id, so an unsaved row needs something to match its ack
+            raise ValueError('Cannot broadcast an unsaved message without a temp_id')
+        sender = message.sender
+        payload = {
+            'type': 'message',
+            'id': message.pk,
+            'temp_id': temp_id,
+            'room_id': message.room_id,
+            'message': message.content,
+            'user': sender.username,
+            'sender': {
+                'id': sender.id,
+                'username': sender.username,
+                'full_name': sender.get_full_name()
+            },
+            'timestamp': message.created_at.isoformat(),
+            'file_url': message.file.url if message.file else None
+        }
+        return {'type': 'chat_message', 'text': json.dumps(payload)}
+
+    @staticmethod
+    def build_ack_event(message, temp_id):
+        """Tell the room the stored id and timestamp of a message broadcast under temp_id."""
+        return {
+            'type': 'chat_ack',
+            'text': json.dumps({
+                'type': 'ack',
+                'room_id': message.room_id,
+                'temp_id': temp_id,
+                'id': message.pk,
+                'timestamp': message.created_at.isoformat()
+            })
+        }
+
+    @staticmethod
+    def build_failed_event(message, temp_id):
+        """Tell the room to drop a message broadcast under temp_id that could not be saved."""
+        return {
+            'type': 'chat_failed',
+            'text': json.dumps({
+                'type': 'message_failed',
+                'room_id': message.room_id,
+                'temp_id': temp_id
+            })
+        }
+
+    @staticmethod
+    def deliver(message):
+        """Broadcast a saved message and notify offline participants."""
+        NotificationQueue.enqueue_channel_message(
+            f'chat_{message.room_id}',
+            MessageService.build_event(message)
+        )
+        MessageService.notify_new_messages([message])
+
+    @staticmethod
+    def persist_messages(messages):
+        """Insert a batch of unsaved messages with one query per table. Returns the saved rows."""
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create(messages)
+        except Exception as e:
+            print(f"Error bulk saving messages: {str(e)}")
+            # Keep the rows that are valid instead of losing the whole batch
+            saved = []
+            for message in messages:
+                try:
+                    with transaction.atomic():
+                        Message.objects.bulk_create([message])
+                    saved.append(message)
+                except Exception as e:
+                    print(f"Error saving message from user {message.sender_id}: {str(e)}")
+            messages = saved
+
+        messages = [message for message in messages if message.pk]
+        if not messages:
+            return []
+
+        # Unread state comes from participant watermarks; per-message receipts are opt-in
+        if settings.CHAT_TRACK_MESSAGE_READS:
+            MessageRead.objects.bulk_create(
+                [MessageRead(message=message, user_id=message.sender_id) for message in messages],
+                ignore_conflicts=True
+            )
+
+        latest = {}
+        for message in messages:
+            if message.room_id not in latest or message.created_at > latest[message.room_id]:
+                latest[message.room_id] = message.created_at
+        for room_id, created_at in latest.items():
+            ChatRoom.objects.filter(pk=room_id).update(last_message_at=created_at)
+        return messages
+
+    @staticmethod
+    def notify_new_messages(messages):
+        """Queue notifications for participants who are not in the room."""
+        room_ids = {message.room_id for message in messages}
+        online = PresenceService.online_users(room_ids)
+        participants = defaultdict(list)
+        for room_id, user_id in ChatRoom.participants.through.objects.filter(
+            chatroom_id__in=room_ids
+        ).values_list('chatroom_id', 'user_id'):
+            participants[room_id].append(user_id)
+
+        for message in messages:
+            content = message.content
+            NotificationQueue.enqueue_notification(
+                [
+                    user_id for user_id in participants[message.room_id]
+                    if user_id != message.sender_id and user_id not in online[message.room_id]
+                ],
+                title=f'New message from {message.sender.get_full_name()}',
+                message=content[:100] + '...' if len(content) > 100 else content,
+                notification_type='message',
+                related_object_id=message.room_id,
+                related_object_type='chatroom'
+            )
+
+
+class ReadReceiptService:
+    """Read state as a per-participant watermark instead of one row per message."""
+
+    @staticmethod
+    def mark_read(room_id, user, message_id=None):
+        """Mark the room read up to message_id (default: the latest message). Returns the watermark."""
+        if message_id is not None and message_id < 1:
+            raise ValueError('message_id must be a positive integer')
+        # Never past the room's newest stored message, so ids from other rooms or the future can't skip ahead
+        latest = Message.objects.filter(room_id=room_id).aggregate(latest=Max('id'))['latest']
+        if latest is None:
+            return None
+        message_id = latest if message_id is None else min(message_id, latest)
+
+        # Only ever move the watermark forward
+        updated = ChatRoomParticipant.objects.filter(
+            Q(last_read_message_id__lt=message_id) | Q(last_read_message_id__isnull=True),
+            chat_room_id=room_id,
+            user=user
+        ).update(last_read_message_id=message_id, last_read_at=timezone.now())
+        if not updated:
+            participant, created = ChatRoomParticipant.objects.get_or_create(
+                chat_room_id=room_id,
+                user=user,
+                defaults={'last_read_message_id': message_id, 'last_read_at': timezone.now()}
+            )
+            return participant.last_read_message_id
+        return message_id
+
+    @staticmethod
+    def unread_count(room_id, user):
+        """Count messages from others after the user's watermark; walks message_room_id_idx."""
+        watermark = ChatRoomParticipant.objects.filter(
+            chat_room_id=room_id, user=user
+        ).values_list('last_read_message_id', flat=True).first() or 0
+        return Message.objects.filter(room_id=room_id, id__gt=watermark).exclude(sender=user).count()
+
+    @staticmethod
+    def build_event(room_id, user, message_id):
+        return {
+            'type': 'chat_read',
+            'text': json.dumps({
+                'type': 'read',
+                'room_id': room_id,
+                'user': user.username,
+                'user_id': user.id,
+                'message_id': message_id
+            })
+        }
+
+
+PendingMessage = namedtuple('PendingMessage', ['message', 'temp_id', 'reply_channel'])
+
+
+class MessageWriteBuffer:
+    """
+    Per-process write-behind buffer for websocket chat messages.
+
+    Consumers broadcast a message as soon as it arrives and hand the unsaved
+    row to the buffer, which writes everything received from all rooms within
+    one flush interval through ``MessageService.persist_messages``. Each row
+    is then acknowledged to its room with its id, or retracted and reported
+    to the sender's socket if it could not be saved.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self.flush_task = None
+
+    async def add(self, message, temp_id=None, reply_channel=None):
+        self.pending.append(PendingMessage(message, temp_id, reply_channel))
+        if len(self.pending) >= settings.CHAT_MESSAGE_FLUSH_SIZE:
+            await self.flush()
+        elif self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(settings.CHAT_MESSAGE_FLUSH_INTERVAL)
+        await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return []
+        batch, self.pending = self.pending, []
+        try:
+            await database_sync_to_async(MessageService.persist_messages)([entry.message for entry in batch])
+        except Exception as e:
+            print(f"Error flushing chat messages: {str(e)}")
+
+        # persist_messages keeps every row it could write, so a row without a pk was lost
+        channel_layer = get_channel_layer()
+        saved = []
+        for entry in batch:
+            try:
+                if entry.message.pk:
+                    saved.append(entry.message)
+                    if entry.temp_id is not None:
+                        await channel_layer.group_send(
+                            f'chat_{entry.message.room_id}',
+                            MessageService.build_ack_event(entry.message, entry.temp_id)
+                        )
+                    continue
+                if entry.temp_id is not None:
+                    await channel_layer.group_send(
+                        f'chat_{entry.message.room_id}',
+                        MessageService.build_failed_event(entry.message, entry.temp_id)
+                    )
+                if entry.reply_channel:
+                    await channel_layer.send(entry.reply_channel, {
+                        'type': 'chat_error',
+                        'text': json.dumps({'error': 'Message could not be saved', 'temp_id': entry.temp_id})
+                    })
+            except Exception as e:
+                print(f"Error reporting message from user {entry.message.sender_id}: {str(e)}")
+
+        if saved:
+            # Same order as MessageService.deliver: broadcast, then notify whoever is offline
+            try:
+                await database_sync_to_async(MessageService.notify_new_messages)(saved)
+            except Exception as e:
+                print(f"Error notifying chat participants: {str(e)}")
+        return saved
+
+    def flush_on_exit(self):
+        """Write whatever is still pending when the process stops; the sockets are gone, so nothing is acknowledged."""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            MessageService.notify_new_messages(MessageService.persist_messages([entry.message for entry in batch]))
+        except Exception as e:
+            print(f"Error flushing chat messages on exit: {str(e)}")
+
+
+message_buffer = MessageWriteBuffer()
+atexit.register(message_buffer.flush_on_exit)
+
+
+class PresenceTracker:
+    """
+    Per-process batching for presence side effects.
+
+    Online/offline transitions are broadcast once per room per debounce
+    window, and only when a user's state differs from the start of the
+    window, so a reconnect storm sends nothing. ``last_seen`` stamps are
+    collected in memory and written together every flush interval.
+    """
+
+    def __init__(self):
+        self.changes = {}
+        self.seen = {}
+        self.broadcast_task = None
+        self.flush_task = None
+
+    async def changed(self, room_id, user, online):
+        room_changes = self.changes.setdefault(room_id, {})
+        was_online = room_changes[user.id][0] if user.id in room_changes else not online
+        room_changes[user.id] = (was_online, online, user.username)
+        if self.broadcast_task is None or self.broadcast_task.done():
+            self.broadcast_task = asyncio.ensure_future(self.broadcast_later())
+
+    async def broadcast_later(self):
+        await asyncio.sleep(settings.CHAT_PRESENCE_DEBOUNCE)
+        await self.broadcast()
+
+    async def broadcast(self):
+        changes, self.changes = self.changes, {}
+        channel_layer = get_channel_layer()
+        for room_id, users in changes.items():
+            joined = [username for was_online, online, username in users.values() if online and not was_online]
+            left = [username for was_online, online, username in users.values() if was_online and not online]
+            if not joined and not left:
+                continue
+            try:
+                await channel_layer.group_send(f'chat_{room_id}', {
+                    'type': 'presence',
+                    'text': json.dumps({'type': 'presence', 'joined': joined, 'left': left})
+                })
+            except Exception as e:
+                print(f"Error broadcasting presence: {str(e)}")
+
+    async def seen_now(self, room_id, user_id):
+        self.seen[(room_id, user_id)] = timezone.now()
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(settings.CHAT_PRESENCE_FLUSH_INTERVAL)
+        await self.flush()
+
+    async def flush(self):
+        if not self.seen:
+            return 0
+        seen, self.seen = self.seen, {}
+        try:
+            return await database_sync_to_async(PresenceService.save_last_seen)(seen)
+        except Exception as e:
+            print(f"Error saving last seen: {str(e)}")
+            return 0
+
+
+presence_tracker = PresenceTracker()
+
@@ -1,61 +1,45 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from .models import Message, ChatRoom
-from apps.notifications.services import NotificationService
+from apps.notifications.services import NotificationQueue
+from .services import MessageService, ParticipantService
 
 @receiver(post_save, sender=Message)
 def message_post_save(sender, instance, created, **kwargs):
+    # Websocket messages are bulk inserted and delivered by ChatConsumer,
+    # so this only sees messages created through the REST API
     if created:
-        channel_layer = get_channel_layer()
-        room_group_name = f'chat_{instance.room.id}'
-        
-        # Prepare message data
-        message_data = {
-            'id': instance.id,
-            'content': instance.content,
-            'sender': {
-                'id': instance.sender.id,
-                'username': instance.sender.username,
-                'full_name': instance.sender.get_full_name()
-            },
-            'created_at': instance.created_at.isoformat(),
-            'file_url': instance.file.url if instance.file else None
-        }
-        
-        # Send to websocket group
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
-            {
-                'type': 'chat_message',
-                'message': message_data
-            }
-        )
-
-        # Send notifications to other participants
-        participants = instance.room.participants.exclude(id=instance.sender.id)
-        for participant in participants:
-            NotificationService.create_notification(
-                recipient=participant,
-                title=f'New message from {instance.sender.get_full_name()}',
-                message=instance.content[:100] + '...' if len(instance.content) > 100 else instance.content,
-                notification_type='message',
-                related_object_id=instance.room.id,
-                related_object_type='chatroom'
-            )
+        MessageService.deliver(instance)
 
 @receiver([post_save, post_delete], sender=ChatRoom)
 def chatroom_update(sender, instance, **kwargs):
-    channel_layer = get_channel_layer()
-    
     # Notify all participants about room updates
     for participant in instance.participants.all():
-        async_to_sync(channel_layer.group_send)(
+        NotificationQueue.enqueue_channel_message(
             f'user_{participant.id}',
             {
                 'type': 'chatroom_update',
                 'room_id': instance.id,
                 'action': 'delete' if kwargs.get('deleted', False) else 'update'
             }
-        ) 
\ No newline at end of file
+        )
+
+@receiver(m2m_changed, sender=ChatRoom.participants.through)
+def chatroom_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Keep ChatRoomParticipant, which membership checks read, in step with the M2M
+    if action in ('post_add', 'post_remove'):
+        if reverse:
+            changes = {room_id: [instance.pk] for room_id in pk_set}
+        else:
+            changes = {instance.pk: list(pk_set)}
+        for room_id, user_ids in changes.items():
+            if action == 'post_add':
+                ParticipantService.sync_added(room_id, user_ids)
+            else:
+                ParticipantService.sync_removed(room_id, user_ids)
+    elif action == 'pre_clear':
+        if reverse:
+            for room_id in instance.chat_rooms.values_list('id', flat=True):
+                ParticipantService.sync_removed(room_id, [instance.pk])
+        else:
+            ParticipantService.sync_removed(instance.pk)
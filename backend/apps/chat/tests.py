@@ -1,3 +1,508 @@
-from django.test import TestCase
+import json
+import threading
+from unittest.mock import patch
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from .models import ChatRoom, ChatRoomParticipant, Message, MessageRead
+from apps.notifications.models import NotificationJob
+from .views import ChatRoomViewSet
+from .services import (
+    MessageService, MessageWriteBuffer, ParticipantService, PendingMessage, PresenceService, PresenceTracker, ReadReceiptService,
+    TokenBucket, TypingService, presence_tracker
+)
 
-# Create your tests here.
+User = get_user_model()
+
+class MessageBatchingTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='test123')
+        self.bob = User.objects.create_user(username='bob', password='test123')
+        self.rooms = [ChatRoom.objects.create(type='group') for _ in range(2)]
+        for room in self.rooms:
+            room.participants.add(self.alice, self.bob)
+
+    def build(self, room, sender, content):
+        return Message(room_id=room.id, sender=sender, content=content, created_at=timezone.now())
+
+    @override_settings(CHAT_TRACK_MESSAGE_READS=True)
+    def test_persist_messages_writes_batch(self):
+        messages = [
+            self.build(self.rooms[0], self.alice, 'one'),
+            self.build(self.rooms[0], self.bob, 'two'),
+            self.build(self.rooms[1], self.alice, 'three'),
+        ]
+
+        saved = MessageService.persist_messages(messages)
+
+        self.assertEqual(len(saved), 3)
+        self.assertEqual(Message.objects.count(), 3)
+        self.assertEqual(
+            set(MessageRead.objects.values_list('message__content', 'user__username')),
+            {('one', 'alice'), ('two', 'bob'), ('three', 'alice')}
+        )
+        room = ChatRoom.objects.get(pk=self.rooms[0].pk)
+        self.assertEqual(room.last_message_at, saved[1].created_at)
+
+    @override_settings(CHAT_MESSAGE_FLUSH_SIZE=2)
+    def test_buffer_flushes_when_full(self):
+        buffer = MessageWriteBuffer()
+
+        async_to_sync(buffer.add)(self.build(self.rooms[0], self.alice, 'first'))
+        self.assertEqual(Message.objects.count(), 0)
+
+        async_to_sync(buffer.add)(self.build(self.rooms[1], self.bob, 'second'))
+        self.assertEqual(Message.objects.count(), 2)
+        self.assertEqual(buffer.pending, [])
+
+    def test_buffer_acks_saved_message_with_id(self):
+        buffer = MessageWriteBuffer()
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f'chat_{self.rooms[0].id}', channel)
+
+        async_to_sync(buffer.add)(self.build(self.rooms[0], self.alice, 'hello'), 'temp-1', channel)
+        async_to_sync(buffer.flush)()
+
+        ack = json.loads(async_to_sync(channel_layer.receive)(channel)['text'])
+        self.assertEqual(ack['type'], 'ack')
+        self.assertEqual(ack['temp_id'], 'temp-1')
+        self.assertEqual(ack['id'], Message.objects.get(content='hello').pk)
+
+    def test_unsaved_message_reported_to_sender(self):
+        buffer = MessageWriteBuffer()
+        channel_layer = get_channel_layer()
+        room_channel = async_to_sync(channel_layer.new_channel)()
+        sender_channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f'chat_{self.rooms[0].id}', room_channel)
+
+        with patch.object(Message.objects, 'bulk_create', side_effect=Exception('db down')):
+            async_to_sync(buffer.add)(self.build(self.rooms[0], self.alice, 'lost'), 'temp-2', sender_channel)
+            self.assertEqual(async_to_sync(buffer.flush)(), [])
+
+        retracted = json.loads(async_to_sync(channel_layer.receive)(room_channel)['text'])
+        self.assertEqual((retracted['type'], retracted['temp_id']), ('message_failed', 'temp-2'))
+        error = json.loads(async_to_sync(channel_layer.receive)(sender_channel)['text'])
+        self.assertEqual((error['error'], error['temp_id']), ('Message could not be saved', 'temp-2'))
+        self.assertFalse(Message.objects.exists())
+
+    def test_pending_messages_written_on_exit(self):
+        buffer = MessageWriteBuffer()
+        buffer.pending.append(PendingMessage(self.build(self.rooms[0], self.alice, 'last words'), None, None))
+
+        buffer.flush_on_exit()
+
+        self.assertTrue(Message.objects.filter(content='last words').exists())
+        self.assertEqual(buffer.pending, [])
+
+
+@override_settings(NOTIFICATION_QUEUE_ASYNC=True)
+class MessageDeliveryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'user{index}', password='test123') for index in range(3)]
+        self.room = ChatRoom.objects.create(type='group')
+        self.room.participants.add(*self.users)
+        NotificationJob.objects.all().delete()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_saved_message_broadcast_once_and_skips_online(self):
+        PresenceService.join(self.room.id, self.users[1].id, 'channel-1')
+
+        Message.objects.create(room=self.room, sender=self.users[0], content='hello')
+
+        channel_jobs = NotificationJob.objects.filter(kind=NotificationJob.KIND_CHANNEL)
+        self.assertEqual(channel_jobs.count(), 1)
+        self.assertEqual(channel_jobs.get().payload['group'], f'chat_{self.room.id}')
+        notification_job = NotificationJob.objects.get(kind=NotificationJob.KIND_NOTIFICATION)
+        self.assertEqual(notification_job.payload['recipient_ids'], [self.users[2].id])
+
+    def test_buffered_message_delivered_after_save(self):
+        PresenceService.join(self.room.id, self.users[1].id, 'channel-1')
+        buffer = MessageWriteBuffer()
+        message = Message(room_id=self.room.id, sender=self.users[0], content='buffered', created_at=timezone.now())
+
+        with self.assertRaises(ValueError):
+            MessageService.build_event(message)
+        async_to_sync(buffer.add)(message)
+        async_to_sync(buffer.flush)()
+
+        self.assertIsNotNone(message.pk)
+        notification_job = NotificationJob.objects.get(kind=NotificationJob.KIND_NOTIFICATION)
+        self.assertEqual(notification_job.payload['recipient_ids'], [self.users[2].id])
+
+
+    @override_settings(CHAT_MESSAGE_FLUSH_INTERVAL=60)
+    def test_socket_message_broadcast_before_save(self):
+        from .benchmark import ChatBenchmark
+        from .services import message_buffer
+
+        self.addCleanup(setattr, presence_tracker, 'changes', {})
+        self.addCleanup(setattr, presence_tracker, 'seen', {})
+
+        async def send_and_flush():
+            communicator = WebsocketCommunicator(ChatBenchmark().application(self.users[0]), f'/ws/chat/{self.room.id}/')
+            await communicator.connect()
+            await communicator.send_json_to({'type': 'message', 'message': 'fast'})
+            broadcast = await communicator.receive_json_from()
+            stored_before_flush = await database_sync_to_async(Message.objects.filter(content='fast').exists)()
+            await message_buffer.flush()
+            ack = await communicator.receive_json_from()
+            await communicator.disconnect()
+            for task in (message_buffer.flush_task, presence_tracker.broadcast_task, presence_tracker.flush_task):
+                if task is not None and not task.done():
+                    task.cancel()
+            return broadcast, stored_before_flush, ack
+
+        broadcast, stored_before_flush, ack = async_to_sync(send_and_flush)()
+
+        self.assertIsNone(broadcast['id'])
+        self.assertFalse(stored_before_flush)
+        self.assertEqual(ack['temp_id'], broadcast['temp_id'])
+        self.assertEqual(ack['id'], Message.objects.get(content='fast').pk)
+
+
+class ReadWatermarkTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='test123')
+        self.bob = User.objects.create_user(username='bob', password='test123')
+        self.room = ChatRoom.objects.create(type='private')
+        self.room.participants.add(self.alice, self.bob)
+        self.messages = [
+            Message.objects.create(room=self.room, sender=self.alice, content=f'Message {index}')
+            for index in range(4)
+        ]
+
+    def test_mark_read_moves_watermark_forward_only(self):
+        self.assertEqual(ReadReceiptService.unread_count(self.room.id, self.bob), 4)
+
+        ReadReceiptService.mark_read(self.room.id, self.bob, self.messages[1].id)
+        self.assertEqual(ReadReceiptService.unread_count(self.room.id, self.bob), 2)
+
+        ReadReceiptService.mark_read(self.room.id, self.bob, self.messages[0].id)
+        participant = ChatRoomParticipant.objects.get(chat_room=self.room, user=self.bob)
+        self.assertEqual(participant.last_read_message_id, self.messages[1].id)
+
+        self.assertEqual(ReadReceiptService.mark_read(self.room.id, self.bob), self.messages[-1].id)
+        self.assertEqual(ReadReceiptService.unread_count(self.room.id, self.bob), 0)
+        self.assertFalse(MessageRead.objects.exists())
+
+    def test_own_messages_are_not_unread(self):
+        self.assertEqual(ReadReceiptService.unread_count(self.room.id, self.alice), 0)
+
+    def test_watermark_clamped_to_newest_message(self):
+        self.assertEqual(ReadReceiptService.mark_read(self.room.id, self.bob, self.messages[-1].id + 1000), self.messages[-1].id)
+        with self.assertRaises(ValueError):
+            ReadReceiptService.mark_read(self.room.id, self.bob, -1)
+
+    def test_mark_read_rejects_non_positive_id(self):
+        request = APIRequestFactory().post('/', {'message_id': -5}, format='json')
+        force_authenticate(request, user=self.bob)
+
+        response = ChatRoomViewSet.as_view({'post': 'mark_read'})(request, pk=self.room.pk)
+
+        self.assertEqual(response.status_code, 400)
+
+
+class InboxTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.alice = User.objects.create_user(username='alice', password='test123')
+        self.bob = User.objects.create_user(username='bob', password='test123')
+
+    def add_room(self, messages):
+        room = ChatRoom.objects.create(type='group')
+        room.participants.add(self.alice, self.bob)
+        for index in range(messages):
+            Message.objects.create(room=room, sender=self.bob, content=f'Message {index}')
+        return room
+
+    def list_rooms(self):
+        request = self.factory.get('/api/chat/rooms/')
+        force_authenticate(request, user=self.alice)
+        with CaptureQueriesContext(connection) as queries:
+            response = ChatRoomViewSet.as_view({'get': 'list'})(request)
+        return response, len(queries)
+
+    def test_inbox_rows_and_constant_queries(self):
+        room = self.add_room(3)
+        ReadReceiptService.mark_read(room.id, self.alice, Message.objects.filter(room=room).order_by('id')[0].id)
+        _, single_room_queries = self.list_rooms()
+
+        self.add_room(1)
+        self.add_room(0)
+        response, queries = self.list_rooms()
+
+        self.assertEqual(queries, single_room_queries)
+        rows = {row['id']: row for row in response.data['results']}
+        self.assertEqual(rows[room.id]['unread_count'], 2)
+        self.assertEqual(rows[room.id]['last_message']['content'], 'Message 2')
+        self.assertEqual(rows[room.id]['last_message']['sender'], 'bob')
+        self.assertEqual(len(rows[room.id]['participants']), 2)
+        self.assertEqual(sorted(row['unread_count'] for row in rows.values()), [0, 1, 2])
+
+    def test_inbox_ordered_by_latest_message(self):
+        old = self.add_room(0)
+        new = self.add_room(0)
+        Message.objects.create(room=old, sender=self.bob, content='Still active')
+
+        response, _ = self.list_rooms()
+
+        self.assertEqual([row['id'] for row in response.data['results']], [old.id, new.id])
+
+
+class ParticipantServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.members = [User.objects.create_user(username=f'member{index}', password='test123') for index in range(3)]
+        self.outsider = User.objects.create_user(username='outsider', password='test123')
+        self.room = ChatRoom.objects.create(type='group')
+        self.room.participants.add(*self.members)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_membership_memoized_and_cached(self):
+        request = APIRequestFactory().get('/')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(ParticipantService.is_participant(self.room.id, self.members[0], request))
+            self.assertTrue(ParticipantService.is_participant(self.room.id, self.members[0], request))
+            self.assertFalse(ParticipantService.is_participant(self.room.id, self.outsider))
+        # One lookup for the member; the outsider also misses the join table fallback
+        self.assertEqual(len(queries), 3)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(ParticipantService.is_participant(self.room.id, self.members[0]))
+        self.assertEqual(len(queries), 0)
+
+    def test_removing_participant_revokes_cached_membership(self):
+        self.assertTrue(ParticipantService.is_participant(self.room.id, self.members[1]))
+
+        self.room.participants.remove(self.members[1])
+
+        self.assertFalse(ParticipantService.is_participant(self.room.id, self.members[1]))
+
+    def test_join_table_member_without_row_is_backfilled(self):
+        ChatRoomParticipant.objects.filter(chat_room=self.room, user=self.members[2]).delete()
+        cache.clear()
+
+        self.assertTrue(ParticipantService.is_participant(self.room.id, self.members[2]))
+        self.assertTrue(ChatRoomParticipant.objects.filter(chat_room=self.room, user=self.members[2]).exists())
+
+    def test_message_post_checks_membership(self):
+        from .views import MessageViewSet
+
+        view = MessageViewSet.as_view({'post': 'create'})
+        for user, expected in [(self.members[0], 201), (self.outsider, 403)]:
+            request = APIRequestFactory().post('/', {'content': 'hi'}, format='json')
+            force_authenticate(request, user=user)
+            self.assertEqual(view(request, room_pk=self.room.id).status_code, expected)
+
+
+
+class PresenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='test123')
+        self.room = ChatRoom.objects.create(type='group')
+        self.room.participants.add(self.alice)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_user_stays_online_until_last_tab_leaves(self):
+        self.assertTrue(PresenceService.join(self.room.id, self.alice.id, 'tab-1'))
+        self.assertFalse(PresenceService.join(self.room.id, self.alice.id, 'tab-2'))
+
+        self.assertFalse(PresenceService.leave(self.room.id, self.alice.id, 'tab-1'))
+        self.assertEqual(PresenceService.online_users([self.room.id])[self.room.id], {self.alice.id})
+
+        self.assertTrue(PresenceService.leave(self.room.id, self.alice.id, 'tab-2'))
+        self.assertEqual(PresenceService.online_users([self.room.id])[self.room.id], set())
+
+    @override_settings(CHAT_PRESENCE_TTL=0)
+    def test_connection_without_heartbeat_expires(self):
+        PresenceService.join(self.room.id, self.alice.id, 'tab-1')
+        self.assertEqual(PresenceService.online_users([self.room.id])[self.room.id], set())
+
+    def test_reconnect_within_window_is_not_broadcast(self):
+        tracker = PresenceTracker()
+        async_to_sync(tracker.changed)(self.room.id, self.alice, False)
+        async_to_sync(tracker.changed)(self.room.id, self.alice, True)
+        self.assertEqual(tracker.changes[self.room.id][self.alice.id][:2], (True, True))
+
+    def test_last_seen_flushed_in_one_batch(self):
+        tracker = PresenceTracker()
+        async_to_sync(tracker.seen_now)(self.room.id, self.alice.id)
+        self.assertIsNone(ChatRoomParticipant.objects.get(user=self.alice).last_seen)
+
+        self.assertEqual(async_to_sync(tracker.flush)(), 1)
+        self.assertIsNotNone(ChatRoomParticipant.objects.get(user=self.alice).last_seen)
+
+    def test_last_seen_chunked_by_room(self):
+        other = ChatRoom.objects.create(type='group')
+        other.participants.add(self.alice)
+        now = timezone.now()
+
+        self.assertEqual(PresenceService.save_last_seen({(self.room.id, self.alice.id): now, (other.id, self.alice.id): now}, chunk_size=1), 2)
+        self.assertEqual(ChatRoomParticipant.objects.filter(user=self.alice, last_seen=now).count(), 2)
+
+    @override_settings(CHAT_PRESENCE_LOCK_TIMEOUT=0.05)
+    def test_lock_timeout_leaves_other_holder_alone(self):
+        lock_key = f'chat_presence_lock_{self.room.id}'
+        cache.set(lock_key, 'other-worker', 60)
+
+        self.assertFalse(PresenceService.join(self.room.id, self.alice.id, 'tab-1'))
+
+        self.assertEqual(cache.get(lock_key), 'other-worker')
+        self.assertIsNone(cache.get(PresenceService.room_key(self.room.id)))
+
+    def test_concurrent_tabs_all_registered(self):
+        threads = [
+            threading.Thread(target=PresenceService.join, args=(self.room.id, self.alice.id, f'tab-{index}'))
+            for index in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(cache.get(PresenceService.room_key(self.room.id))[self.alice.id]), 8)
+
+    def test_rejected_socket_is_not_announced(self):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from .routing import websocket_urlpatterns
+
+        outsider = User.objects.create_user(username='outsider', password='test123')
+        router = URLRouter(websocket_urlpatterns)
+
+        async def app(scope, receive, send):
+            return await router(dict(scope, user=outsider), receive, send)
+
+        async def connect():
+            communicator = WebsocketCommunicator(app, f'/ws/chat/{self.room.id}/')
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            return connected
+
+        self.assertFalse(async_to_sync(connect)())
+        self.assertNotIn(self.room.id, presence_tracker.changes)
+
+
+
+class RateLimitTests(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_typing_broadcast_once_per_interval(self):
+        self.assertTrue(TypingService.should_broadcast(1, 1))
+        self.assertFalse(TypingService.should_broadcast(1, 1))
+        self.assertTrue(TypingService.should_broadcast(1, 2))
+        self.assertTrue(TypingService.should_broadcast(2, 1))
+
+    def test_token_bucket_allows_burst_then_backs_off(self):
+        bucket = TokenBucket(rate=1, burst=3)
+        self.assertEqual([bucket.consume() for _ in range(4)], [True, True, True, False])
+        self.assertGreater(bucket.retry_after(), 0)
+
+    @override_settings(CHAT_INBOUND_BURST=2, CHAT_INBOUND_RATE=0.01)
+    def test_typing_frames_do_not_use_message_tokens(self):
+        from .benchmark import ChatBenchmark
+
+        user = User.objects.create_user(username='typist', password='test123')
+        room = ChatRoom.objects.create(type='group')
+        room.participants.add(user)
+
+        async def type_then_send():
+            communicator = WebsocketCommunicator(ChatBenchmark().application(user), f'/ws/chat/{room.id}/')
+            await communicator.connect()
+            for _ in range(5):
+                await communicator.send_json_to({'type': 'typing'})
+            await communicator.send_json_to({'type': 'message', 'message': 'hello'})
+            frames = []
+            while not await communicator.receive_nothing(timeout=0.5):
+                frames.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+            return frames
+
+        frames = async_to_sync(type_then_send)()
+
+        self.assertFalse([frame for frame in frames if 'error' in frame])
+        self.assertIn('hello', [frame.get('message') for frame in frames])
+
+
+@override_settings(CHAT_HISTORY_SYNC_LIMIT=4)
+class MessageHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='test123', first_name='Alice')
+        self.bob = User.objects.create_user(username='bob', password='test123')
+        self.room = ChatRoom.objects.create(type='private')
+        self.room.participants.add(self.alice, self.bob)
+        self.ids = [
+            Message.objects.create(room=self.room, sender=[self.alice, self.bob][index % 2], content=str(index)).id
+            for index in range(6)
+        ]
+
+    def tearDown(self):
+        cache.clear()
+
+    def history(self, **params):
+        from .views import MessageViewSet
+
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=self.alice)
+        return MessageViewSet.as_view({'get': 'history'})(request, room_pk=self.room.id).data
+
+    def test_latest_page_then_before_id(self):
+        page = self.history(limit=2)
+        self.assertEqual([row['id'] for row in page['messages']], self.ids[-2:])
+        self.assertTrue(page['has_more'])
+        self.assertEqual(page['users'][self.alice.id]['full_name'], 'Alice')
+        self.assertNotIn('sender', page['messages'][0])
+
+        older = self.history(before_id=page['first_id'], limit=10)
+        self.assertEqual([row['id'] for row in older['messages']], self.ids[:-2])
+        self.assertFalse(older['has_more'])
+
+    def test_after_id_and_since(self):
+        self.assertEqual(
+            [row['id'] for row in self.history(after_id=self.ids[1], limit=2)['messages']],
+            self.ids[2:4]
+        )
+
+        sync = self.history(since=self.ids[0])
+        self.assertEqual([row['id'] for row in sync['messages']], self.ids[1:5])
+        self.assertTrue(sync['has_more'])
+
+    def test_non_positive_limit_rejected(self):
+        self.assertEqual(self.history(limit=-1), {'error': 'limit must be a positive integer'})
+        self.assertEqual(self.history(limit=0), {'error': 'limit must be a positive integer'})
+
+
+
+class ChatBenchmarkTests(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_small_run_delivers_everything(self):
+        from .benchmark import ChatBenchmark
+
+        report = ChatBenchmark(rooms=2, participants=3, messages=2, rate=200, typing_ratio=1, timeout=5, seed=1).execute()
+
+        self.assertEqual(report['messages_sent'], 12)
+        self.assertEqual(report['messages_persisted'], 12)
+        self.assertEqual(report['deliveries'], report['deliveries_expected'])
+        self.assertGreater(report['queries_per_message'], 0)
+        self.assertFalse(ChatRoom.objects.exists())
@@ -6,5 +6,7 @@ router = DefaultRouter()
 router.register(r'rooms', views.ChatRoomViewSet, basename='chatroom')
 
 urlpatterns = [
+    path('rooms/<int:room_pk>/messages/', views.MessageViewSet.as_view({'get': 'list', 'post': 'create'}), name='room-messages'),
+    path('rooms/<int:room_pk>/messages/history/', views.MessageViewSet.as_view({'get': 'history'}), name='room-message-history'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
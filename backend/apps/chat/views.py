@@ -1,36 +1,147 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Count, Q, OuterRef, Subquery
+from django.db.models import Count, Q, OuterRef, Subquery, Prefetch
+from django.db.models.functions import Coalesce
+from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.conf import settings
 from .models import ChatRoom, Message, ChatRoomParticipant
-from .serializers import ChatRoomSerializer, MessageSerializer
+from .serializers import ChatRoomListSerializer, MessageSerializer, MessageHistorySerializer
 from .permissions import IsChatParticipant
 from rest_framework.exceptions import PermissionDenied
+from core.mixins import ConditionalGetMixin
+from core.pagination import CreatedAtCursorPagination, LastMessageAtCursorPagination
+from apps.notifications.services import NotificationQueue
+from .services import ParticipantService, ReadReceiptService
 
 # Create your views here.
 
-class IsParticipant(permissions.BasePermission):
-    def has_object_permission(self, request, view, obj):
-        return request.user in obj.participants.all()
-
-class ChatRoomViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = ChatRoom.objects.prefetch_related('participants').all()
-    serializer_class = ChatRoomSerializer
-    permission_classes = [permissions.IsAuthenticated, IsParticipant]
+class ChatRoomViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = ChatRoom.objects.all()
+    serializer_class = ChatRoomListSerializer
+    permission_classes = [permissions.IsAuthenticated, IsChatParticipant]
+    # Read watermarks move unread counts without touching the room
+    conditional_fields = ('updated_at', 'last_message_at', 'chatroomparticipant__last_read_at')
+    # Keep the Meta.ordering inbox order, so an active old room stays above new empty ones
+    pagination_class = LastMessageAtCursorPagination
 
     def get_queryset(self):
-        return self.queryset.filter(participants=self.request.user)
+        user = self.request.user
+
+        # Correlated LIMIT 1 lookups served by message_room_created_at_idx
+        last_message = Message.objects.filter(room=OuterRef('pk')).order_by('-created_at', '-id')
+        watermark = ChatRoomParticipant.objects.filter(
+            chat_room=OuterRef('room'), user=user
+        ).values('last_read_message_id')[:1]
+        unread = Message.objects.filter(
+            room=OuterRef('pk'),
+            id__gt=Coalesce(Subquery(watermark), 0)
+        ).exclude(sender=user).order_by().values('room').annotate(count=Count('id')).values('count')
+
+        return self.queryset.filter(participants=user).annotate(
+            unread_count=Coalesce(Subquery(unread), 0),
+            last_message_id=Subquery(last_message.values('id')[:1]),
+            last_message_content=Subquery(last_message.values('content')[:1]),
+            last_message_sender=Subquery(last_message.values('sender__username')[:1]),
+            last_message_created_at=Subquery(last_message.values('created_at')[:1])
+        ).prefetch_related(
+            Prefetch(
+                'participants',
+                queryset=get_user_model().objects.only('id', 'username', 'first_name', 'last_name')
+            )
+        )
+
+    @action(detail=True, methods=['post'])
+    def mark_read(self, request, pk=None):
+        """Mark every message up to message_id (default: the latest) as read"""
+        room = self.get_object()
+        message_id = request.data.get('message_id')
+        if message_id is not None:
+            try:
+                message_id = int(message_id)
+            except (TypeError, ValueError):
+                return Response({'error': 'message_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            if message_id < 1:
+                return Response({'error': 'message_id must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        watermark = ReadReceiptService.mark_read(room.id, request.user, message_id)
+        if watermark is not None:
+            NotificationQueue.enqueue_channel_message(
+                f'chat_{room.id}',
+                ReadReceiptService.build_event(room.id, request.user, watermark)
+            )
+        return Response({
+            'last_read_message_id': watermark,
+            'unread_count': ReadReceiptService.unread_count(room.id, request.user)
+        })
 
 class MessageViewSet(viewsets.ModelViewSet):
     serializer_class = MessageSerializer
-    permission_classes = [permissions.IsAuthenticated, IsParticipant]
+    permission_classes = [permissions.IsAuthenticated, IsChatParticipant]
+    # Walks message_room_created_at_idx
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         return Message.objects.filter(room_id=self.kwargs['room_pk']).select_related('sender')
 
     def perform_create(self, serializer):
-        room = ChatRoom.objects.get(pk=self.kwargs['room_pk'])
-        if self.request.user not in room.participants.all():
+        # Usually answered from the memo filled by IsChatParticipant.has_permission
+        if not ParticipantService.is_participant(self.kwargs['room_pk'], self.request.user, self.request):
             raise PermissionDenied("You are not a participant in this chat room.")
-        serializer.save(room=room, sender=self.request.user)
+        serializer.save(room_id=int(self.kwargs['room_pk']), sender=self.request.user)
+
+    @action(detail=False)
+    def history(self, request, room_pk=None):
+        """
+        Keyset history on message id, oldest first in every response.
+
+        ?before_id=N  page backwards from N (default: the newest messages)
+        ?after_id=N   page forwards from N
+        ?since=N      everything after N for a reconnecting client, capped at CHAT_HISTORY_SYNC_LIMIT
+        """
+        params = {}
+        for name in ['before_id', 'after_id', 'since', 'limit']:
+            value = request.query_params.get(name)
+            if value is not None:
+                try:
+                    params[name] = int(value)
+                except ValueError:
+                    return Response({'error': f'{name} must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if params.get('limit', 1) < 1:
+            return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        messages = Message.objects.filter(room_id=room_pk).values(
+            'id', 'sender_id', 'content', 'file', 'is_system_message', 'created_at'
+        )
+        if 'since' in params:
+            limit = settings.CHAT_HISTORY_SYNC_LIMIT
+            messages = messages.filter(id__gt=params['since']).order_by('id')
+        else:
+            limit = min(params.get('limit', settings.CHAT_HISTORY_PAGE_SIZE), settings.CHAT_HISTORY_MAX_PAGE_SIZE)
+            if 'after_id' in params:
+                messages = messages.filter(id__gt=params['after_id']).order_by('id')
+            else:
+                if 'before_id' in params:
+                    messages = messages.filter(id__lt=params['before_id'])
+                messages = messages.order_by('-id')
+
+        rows = list(messages[:limit + 1])
+        has_more = len(rows) > limit
+        rows = sorted(rows[:limit], key=lambda row: row['id'])
+
+        users = get_user_model().objects.filter(
+            id__in={row['sender_id'] for row in rows}
+        ).only('id', 'username', 'first_name', 'last_name')
+
+        return Response({
+            'messages': MessageHistorySerializer(rows, many=True).data,
+            'users': {
+                user.id: {'username': user.username, 'full_name': user.get_full_name()}
+                for user in users
+            },
+            'has_more': has_more,
+            'first_id': rows[0]['id'] if rows else None,
+            'last_id': rows[-1]['id'] if rows else None
+        })
+
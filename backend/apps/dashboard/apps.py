@@ -1,7 +1,23 @@
 from django.apps import AppConfig
+from importlib import import_module
+
+
+# Modules with views decorated by core.cache.cache_response
+CACHED_VIEW_MODULES = (
+    'apps.dashboard.views',
+    'apps.internships.views',
+    'apps.users.views',
+)
 
 
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.dashboard'
     label = 'dashboard'
+
+    def ready(self):
+        import apps.dashboard.signals
+        # cache_response registers the models each view depends on at import time;
+        # load the views in every process, including workers that never route a request
+        for module in CACHED_VIEW_MODULES:
+            import_module(module)
@@ -0,0 +1,55 @@
+import os
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.retention import prune
+from apps.notifications.services import UnreadCounter
+
+# model label -> (date field, hook run on each batch of ids before it is deleted)
+HISTORY_MODELS = {
+    'notifications.Notification': ('created_at', UnreadCounter.release),
+    'dashboard.Activity': ('created_at', None),
+    'users.Activity': ('created_at', None),
+    'chat.MessageRead': ('read_at', None),
+}
+
+
+class Command(BaseCommand):
+    help = 'Deletes old notifications, activity records and message read receipts in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.HISTORY_RETENTION_DAYS, help='Keep rows newer than this')
+        parser.add_argument('--models', nargs='+', choices=list(HISTORY_MODELS), default=list(HISTORY_MODELS))
+        parser.add_argument('--batch-size', type=int, default=settings.HISTORY_PRUNE_BATCH_SIZE, help='Rows deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=0.1, help='Seconds to pause between batches')
+        parser.add_argument('--archive-dir', help='Write deleted rows to gzipped JSONL files in this directory first')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        archive_dir = options['archive_dir']
+        if archive_dir:
+            os.makedirs(archive_dir, exist_ok=True)
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+
+        for label in options['models']:
+            date_field, before_delete = HISTORY_MODELS[label]
+            archive_path = None
+            if archive_dir:
+                archive_path = os.path.join(archive_dir, f"{label.replace('.', '_').lower()}-{stamp}.jsonl.gz")
+
+            deleted = prune(
+                apps.get_model(label),
+                date_field,
+                cutoff,
+                batch_size=options['batch_size'],
+                pause=options['sleep'],
+                archive_path=archive_path,
+                before_delete=before_delete
+            )
+            self.stdout.write(self.style.SUCCESS(f'{label}: deleted {deleted} rows older than {cutoff:%Y-%m-%d}'))
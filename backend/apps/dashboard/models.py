@@ -81,6 +81,7 @@ class Activity(models.Model):
         indexes = [
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['activity_type', '-created_at']),
+            models.Index(fields=['created_at', 'id'], name='dashboard_activity_created_idx'),
         ]
 
     def __str__(self):
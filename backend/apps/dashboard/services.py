@@ -2,7 +2,7 @@ from django.utils import timezone
 from django.db.models import Count, Q
 from .models import DashboardMetric, Activity
 from apps.users.models import User
-from apps.internships.models import Internship
+from apps.internships.models import Internship, Report
 
 class DashboardService:
     @staticmethod
@@ -84,4 +84,44 @@ class DashboardService:
                     status='active'
                 ).count()
             }
-        return {} 
\ No newline at end of file
+        return {}
+
+    @staticmethod
+    def get_teacher_stats(teacher):
+        """Get teacher dashboard statistics in a single aggregate query."""
+        return Internship.objects.filter(teacher=teacher).aggregate(
+            pending_reports=Count(
+                'internship_report',
+                filter=Q(internship_report__status='pending'),
+                distinct=True
+            ),
+            under_review=Count(
+                'internship_report',
+                filter=Q(internship_report__status='under_review'),
+                distinct=True
+            ),
+            evaluated_reports=Count(
+                'internship_report',
+                filter=Q(internship_report__status__in=['approved', 'rejected']),
+                distinct=True
+            ),
+            active_students=Count(
+                'student',
+                filter=Q(student__user_type='student', student__is_active=True),
+                distinct=True
+            ),
+            total_internships=Count('id', distinct=True),
+            active_internships=Count(
+                'id', filter=Q(status=Internship.STATUS_ACTIVE), distinct=True
+            )
+        )
+
+    @staticmethod
+    def get_teacher_reports(teacher):
+        """Get reports submitted for internships supervised by a teacher."""
+        return Report.objects.filter(
+            internship__teacher=teacher
+        ).select_related(
+            'student',
+            'internship'
+        ).order_by('-submitted_at', '-id')
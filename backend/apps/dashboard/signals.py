@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.cache import bump_generation, is_tracked
+
+# Saves touching only these fields never change a cached response (e.g. login stamping last_login)
+IGNORED_UPDATE_FIELDS = {'last_login'}
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_responses(sender, update_fields=None, **kwargs):
+    # Responses cached with core.cache.cache_response key on these generations
+    if not is_tracked(sender):
+        return
+    if update_fields and set(update_fields) <= IGNORED_UPDATE_FIELDS:
+        return
+    bump_generation(sender)
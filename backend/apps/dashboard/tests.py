@@ -1,3 +1,170 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from apps.companies.models import Organization
+from apps.internships.models import Internship, Report
+from apps.notifications.models import Notification
+from .models import Activity
+from core.cache import get_generations
+from rest_framework.test import APIRequestFactory, force_authenticate
+from .services import DashboardService
+from .views import StudentDashboardView
 
-# Create your tests here.
+User = get_user_model()
+
+class TeacherDashboardStatsTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher',
+            password='test123',
+            user_type='teacher'
+        )
+        self.organization = Organization.objects.create(name='Test Org')
+
+        for index, status in enumerate([Internship.STATUS_ACTIVE, Internship.STATUS_PENDING]):
+            student = User.objects.create_user(
+                username=f'student{index}',
+                password='test123',
+                user_type='student'
+            )
+            internship = Internship.objects.create(
+                student=student,
+                teacher=self.teacher,
+                organization=self.organization,
+                title='Test Internship',
+                description='Test Description',
+                start_date='2024-01-01',
+                end_date='2024-06-30',
+                status=status
+            )
+            for report_status in ['pending', 'under_review', 'approved']:
+                Report.objects.create(
+                    student=student,
+                    internship=internship,
+                    title='Weekly report',
+                    content='Content',
+                    status=report_status
+                )
+
+    def test_teacher_stats_single_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            stats = DashboardService.get_teacher_stats(self.teacher)
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(stats, {
+            'pending_reports': 2,
+            'under_review': 2,
+            'evaluated_reports': 2,
+            'active_students': 2,
+            'total_internships': 2,
+            'active_internships': 1,
+        })
+
+    def test_teacher_reports_scoped_to_teacher(self):
+        other_teacher = User.objects.create_user(
+            username='other',
+            password='test123',
+            user_type='teacher'
+        )
+        self.assertEqual(DashboardService.get_teacher_reports(self.teacher).count(), 6)
+        self.assertEqual(DashboardService.get_teacher_reports(other_teacher).count(), 0)
+
+
+class CachedDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.view = StudentDashboardView.as_view()
+        self.student = User.objects.create_user(username='student', password='test123', user_type='student')
+        self.internship = Internship.objects.create(
+            student=self.student,
+            organization=Organization.objects.create(name='Test Org'),
+            title='Test Internship',
+            description='Test Description',
+            start_date='2024-01-01',
+            end_date='2024-06-30',
+            status=Internship.STATUS_ACTIVE
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def get(self, **headers):
+        request = self.factory.get('/api/dashboard/student/', **headers)
+        force_authenticate(request, user=self.student)
+        return self.view(request)
+
+    def test_cached_response_served_as_bytes_with_validators(self):
+        first = self.get()
+        with CaptureQueriesContext(connection) as queries:
+            second = self.get()
+
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('Last-Modified', second)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+    def test_model_change_invalidates_cache(self):
+        self.assertEqual(json.loads(self.get().content)['reports_submitted'], 0)
+
+        Report.objects.create(
+            student=self.student,
+            internship=self.internship,
+            title='Weekly report',
+            content='Content'
+        )
+
+        self.assertEqual(json.loads(self.get().content)['reports_submitted'], 1)
+
+    def test_untracked_saves_and_logins_keep_cache(self):
+        generations = get_generations(['users.user', Activity])
+
+        self.student.last_login = timezone.now()
+        self.student.save(update_fields=['last_login'])
+        Activity.objects.create(user=self.student, activity_type='meeting', description='Weekly sync')
+
+        self.assertEqual(get_generations(['users.user', Activity]), generations)
+
+
+class PruneHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='archivist', password='test123')
+        Notification.objects.all().delete()
+        old = timezone.now() - timedelta(days=400)
+        for index in range(5):
+            Notification.objects.create(recipient=self.user, title=f'Old {index}', message='', notification_type='system')
+            Activity.objects.create(user=self.user, activity_type='meeting', description=f'Old {index}')
+        Notification.objects.update(created_at=old)
+        Activity.objects.update(created_at=old)
+        Notification.objects.create(recipient=self.user, title='Recent', message='', notification_type='system')
+
+    def test_prunes_in_chunks_and_archives(self):
+        with tempfile.TemporaryDirectory() as archive_dir:
+            call_command(
+                'prune_history',
+                models=['notifications.Notification', 'dashboard.Activity'],
+                batch_size=2,
+                sleep=0,
+                archive_dir=archive_dir,
+                stdout=open(os.devnull, 'w')
+            )
+
+            archived = {}
+            for name in os.listdir(archive_dir):
+                with gzip.open(os.path.join(archive_dir, name), 'rt') as archive:
+                    archived[name.split('-')[0]] = [json.loads(line) for line in archive]
+
+        self.assertEqual(list(Notification.objects.values_list('title', flat=True)), ['Recent'])
+        self.assertFalse(Activity.objects.exists())
+        self.assertEqual(len(archived['notifications_notification']), 5)
+        self.assertEqual(len(archived['dashboard_activity']), 5)
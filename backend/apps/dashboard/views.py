@@ -3,16 +3,21 @@ from rest_framework.response import Response
 from rest_framework import permissions
 from apps.internships.models import Internship, Report
 from apps.notifications.models import Notification
+from apps.notifications.services import NotificationService
 from django.db.models import Count, Avg
+from core.cache import cache_response
 
 class StudentDashboardView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @cache_response(timeout=300, key_prefix='dashboard_student', models=[
+        'companies.organization', Internship, Report, Notification
+    ])
     def get(self, request):
         user = request.user
-        internship = Internship.objects.filter(student=user, status='active').select_related('organization').first()
+        internship = Internship.objects.filter(student=user, status=Internship.STATUS_ACTIVE).select_related('organization').first()
         reports_submitted = Report.objects.filter(student=user).count()
-        notifications = Notification.objects.filter(recipient=user, is_read=False).count()
+        notifications = NotificationService.get_unread_count(user)
 
         data = {
             'internship': {
@@ -32,6 +32,7 @@ class Evaluation(models.Model):
         indexes = [
             models.Index(fields=['student', 'evaluation_type']),
             models.Index(fields=['evaluator', 'status']),
+            models.Index(fields=['-created_at', '-id'], name='evaluation_created_idx'),
         ]
 
     def __str__(self):
@@ -1,7 +1,7 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import Evaluation
-from apps.notifications.services import NotificationService
+from apps.notifications.services import NotificationQueue
 
 @receiver(post_save, sender=Evaluation)
 def handle_evaluation_status_change(sender, instance, created, **kwargs):
@@ -9,8 +9,8 @@ def handle_evaluation_status_change(sender, instance, created, **kwargs):
     try:
         if created:
             # Notify student about new evaluation
-            NotificationService.create_notification(
-                recipient=instance.student,
+            NotificationQueue.enqueue_notification(
+                [instance.student],
                 title='New Evaluation Created',
                 message=f'A new {instance.get_evaluation_type_display()} has been created for you.',
                 notification_type='evaluation'
@@ -18,15 +18,15 @@ def handle_evaluation_status_change(sender, instance, created, **kwargs):
         else:
             # Notify relevant parties about status changes
             if instance.status == 'completed':
-                NotificationService.create_notification(
-                    recipient=instance.student,
+                NotificationQueue.enqueue_notification(
+                    [instance.student],
                     title='Evaluation Completed',
                     message=f'Your {instance.get_evaluation_type_display()} has been completed.',
                     notification_type='evaluation'
                 )
             elif instance.status == 'reviewed':
-                NotificationService.create_notification(
-                    recipient=instance.evaluator,
+                NotificationQueue.enqueue_notification(
+                    [instance.evaluator],
                     title='Evaluation Reviewed',
                     message=f'The {instance.get_evaluation_type_display()} has been reviewed.',
                     notification_type='evaluation'
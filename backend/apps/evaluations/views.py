@@ -10,6 +10,7 @@ from .serializers import (
     EvaluationCriteriaSerializer
 )
 from .permissions import CanCreateEvaluation, CanViewEvaluation
+from core.pagination import CreatedAtCursorPagination
 
 # Create your views here.
 
@@ -59,6 +60,7 @@ class MentorEvaluationsView(views.APIView):
 
 class TeacherEvaluationsView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get(self, request):
         if request.user.user_type != 'teacher':
@@ -66,10 +68,14 @@ class TeacherEvaluationsView(views.APIView):
                 'error': 'Only teachers can access this endpoint'
             }, status=status.HTTP_403_FORBIDDEN)
 
-        evaluations = Evaluation.objects.all().order_by('-created_at')
+        evaluations = Evaluation.objects.select_related('student', 'evaluator')
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(evaluations, request, view=self)
         return Response({
             'status': 'success',
-            'data': EvaluationSerializer(evaluations, many=True).data
+            'data': EvaluationSerializer(page, many=True).data,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link()
         })
 
 class StudentEvaluationsView(views.APIView):
@@ -0,0 +1,99 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.internships.models import Agreement, Internship
+from apps.internships.services import AGREEMENT_KINDS, AgreementService, render_agreement_docx, render_agreement_pdf
+from core.cache import bump_generation
+from core.documents import DocumentCache
+
+RENDERERS = {
+    'pdf': render_agreement_pdf,
+    'docx': render_agreement_docx,
+}
+
+
+class Command(BaseCommand):
+    help = 'Creates and renders agreements for every active internship starting in a cohort year'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cohort', type=int, required=True, help='Year the internships start in')
+        parser.add_argument('--formats', nargs='+', choices=list(RENDERERS), default=list(RENDERERS))
+        parser.add_argument('--workers', type=int, default=settings.RENDER_WORKERS, help='Render processes')
+        parser.add_argument('--batch-size', type=int, default=200, help='Agreements read and saved per batch')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        internships = Internship.objects.filter(
+            status=Internship.STATUS_ACTIVE,
+            start_date__year=options['cohort']
+        )
+        created = AgreementService.create_missing_agreements(internships, options['batch_size'])
+        self.stdout.write(f'Created {created} agreements')
+
+        agreements = Agreement.objects.filter(
+            internship__in=internships
+        ).select_related('student', 'organization__contact_person').order_by('pk')
+
+        started = time.monotonic()
+        totals = {'agreements': 0, 'rendered': 0, 'cached': 0, 'failed': 0}
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            batch = []
+            for agreement in agreements.iterator(chunk_size=options['batch_size']):
+                batch.append(agreement)
+                if len(batch) >= options['batch_size']:
+                    self.render_batch(batch, options['formats'], executor, totals)
+                    batch = []
+            if batch:
+                self.render_batch(batch, options['formats'], executor, totals)
+        elapsed = time.monotonic() - started
+
+        if totals['agreements']:
+            bump_generation(Agreement)
+        documents = totals['rendered'] + totals['cached']
+        rate = documents / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{totals['agreements']} agreements: {totals['rendered']} documents rendered, "
+            f"{totals['cached']} from cache, {totals['failed']} failed in {elapsed:.1f}s ({rate:.1f} documents/s)"
+        )
+        style = self.style.WARNING if totals['failed'] else self.style.SUCCESS
+        self.stdout.write(style('Agreement generation complete'))
+
+    def render_batch(self, agreements, formats, executor, totals):
+        """Render one batch across the pool and save the PDF paths with one bulk_update."""
+        pending = []
+        pdf_paths = {}
+        for agreement in agreements:
+            data = AgreementService.document_data(agreement)
+            for extension in formats:
+                _, path, hit = DocumentCache.lookup(AGREEMENT_KINDS[extension], data, 'agreements', extension)
+                if hit:
+                    totals['cached'] += 1
+                    if extension == 'pdf':
+                        pdf_paths[agreement.pk] = path
+                else:
+                    pending.append((agreement, extension, path, executor.submit(RENDERERS[extension], data)))
+
+        for agreement, extension, path, future in pending:
+            try:
+                DocumentCache.store(path, future.result())
+            except Exception as e:
+                print(f"Error rendering agreement {agreement.pk} as {extension}: {str(e)}")
+                totals['failed'] += 1
+                continue
+            totals['rendered'] += 1
+            if extension == 'pdf':
+                pdf_paths[agreement.pk] = path
+
+        changed = []
+        for agreement in agreements:
+            path = pdf_paths.get(agreement.pk)
+            if path and agreement.agreement_file.name != path:
+                agreement.agreement_file = path
+                changed.append(agreement)
+        Agreement.objects.bulk_update(changed, ['agreement_file'])
+        totals['agreements'] += len(agreements)
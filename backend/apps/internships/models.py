@@ -21,6 +21,7 @@ class Internship(models.Model):
 
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='internships')
     mentor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='mentored_internships')
+    teacher = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='supervised_internships')
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='internships')
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -36,6 +37,7 @@ class Internship(models.Model):
         indexes = [
             models.Index(fields=['student', 'status']),
             models.Index(fields=['mentor']),
+            models.Index(fields=['teacher', 'status']),
             models.Index(fields=['organization']),
         ]
 
@@ -153,7 +155,8 @@ class Report(models.Model):
     internship = models.ForeignKey(
         'Internship',
         on_delete=models.CASCADE,
-        related_name='reports'
+        related_name='reports',
+        related_query_name='internship_report'
     )
     title = models.CharField(max_length=200)
     content = models.TextField()
@@ -170,6 +173,7 @@ class Report(models.Model):
     )
     submitted_at = models.DateTimeField(auto_now_add=True)
     evaluated_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
     evaluated_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
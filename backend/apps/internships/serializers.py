@@ -4,7 +4,7 @@ from .models import Internship, Task, Agreement, InternshipPlan, Evaluation, Pre
 from apps.users.serializers import UserSerializer
 from apps.companies.serializers import OrganizationSerializer
 from apps.reports.serializers import ReportSerializer
-from companies.models import Organization
+from apps.companies.models import Organization
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
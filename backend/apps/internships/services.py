@@ -1,4 +1,6 @@
 import os
+from functools import lru_cache
+from io import BytesIO
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils import timezone
@@ -10,137 +12,77 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from .models import Agreement, InternshipPlan, Internship
 from apps.notifications.services import NotificationService
+from apps.reports.models import RenderJob
 from docx import Document
+from core.documents import DocumentCache
+
+# RenderJob kind for each agreement format, so direct renders and queued jobs share cache keys
+AGREEMENT_KINDS = {
+    'pdf': RenderJob.KIND_AGREEMENT_PDF,
+    'docx': RenderJob.KIND_AGREEMENT_DOCX,
+}
 
 class AgreementService:
+    @staticmethod
+    def document_data(agreement):
+        """Collect the plain fields an agreement document is rendered from."""
+        organization = agreement.organization
+        department = getattr(organization, 'department', None)
+        return {
+            'id': agreement.id,
+            'date': agreement.created_at.date(),
+            'university_name': settings.UNIVERSITY_NAME,
+            'university_address': settings.UNIVERSITY_ADDRESS,
+            'organization_name': organization.name,
+            'organization_address': organization.address,
+            'organization_contact': str(organization.contact_person or ''),
+            'student_name': agreement.student.get_full_name(),
+            'student_username': agreement.student.username,
+            'start_date': agreement.start_date,
+            'end_date': agreement.end_date,
+            'department': department.name if department else 'N/A',
+            'terms': get_terms_and_conditions(),
+        }
+
     @staticmethod
     def generate_agreement_pdf(agreement):
         """Generate PDF agreement using ReportLab instead of WeasyPrint."""
-        output_file = f'agreement_{agreement.id}_{timezone.now().strftime("%Y%m%d")}.pdf'
-        output_path = os.path.join(settings.MEDIA_ROOT, 'agreements', output_file)
-
-        # Create the PDF document
-        doc = SimpleDocTemplate(
-            output_path,
-            pagesize=letter,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72
-        )
-
-        # Prepare the story (content)
-        story = []
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            alignment=1  # Center alignment
-        )
-
-        # Add title
-        story.append(Paragraph("INTERNSHIP AGREEMENT", title_style))
-        story.append(Spacer(1, 12))
-
-        # Add agreement details
-        story.append(Paragraph(f"Agreement No: {agreement.id}", styles['Normal']))
-        story.append(Paragraph(f"Date: {timezone.now().strftime('%B %d, %Y')}", styles['Normal']))
-        story.append(Spacer(1, 20))
-
-        # Add parties information
-        story.append(Paragraph("1. PARTIES", styles['Heading2']))
-        story.append(Spacer(1, 12))
-
-        # University Info
-        story.append(Paragraph("UNIVERSITY:", styles['Heading3']))
-        story.append(Paragraph(f"Name: {settings.UNIVERSITY_NAME}", styles['Normal']))
-        story.append(Paragraph(f"Address: {settings.UNIVERSITY_ADDRESS}", styles['Normal']))
-        story.append(Spacer(1, 12))
-
-        # Organization Info
-        story.append(Paragraph("ORGANIZATION:", styles['Heading3']))
-        story.append(Paragraph(f"Name: {agreement.organization.name}", styles['Normal']))
-        story.append(Paragraph(f"Address: {agreement.organization.address}", styles['Normal']))
-        story.append(Paragraph(f"Contact Person: {agreement.organization.contact_person}", styles['Normal']))
-        story.append(Spacer(1, 12))
-
-        # Student Info
-        story.append(Paragraph("STUDENT:", styles['Heading3']))
-        story.append(Paragraph(f"Name: {agreement.student.get_full_name()}", styles['Normal']))
-        story.append(Paragraph(f"Student ID: {agreement.student.username}", styles['Normal']))
-        story.append(Spacer(1, 20))
-
-        # Add internship details
-        story.append(Paragraph("2. INTERNSHIP DETAILS", styles['Heading2']))
-        story.append(Spacer(1, 12))
-
-        # Create a table for internship details
-        data = [
-            ['Start Date', agreement.start_date.strftime('%B %d, %Y')],
-            ['End Date', agreement.end_date.strftime('%B %d, %Y')],
-            ['Department', agreement.organization.department.name if agreement.organization.department else 'N/A']
-        ]
-        
-        t = Table(data, colWidths=[200, 300])
-        t.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ]))
-        story.append(t)
-        story.append(Spacer(1, 20))
-
-        # Add terms and conditions
-        story.append(Paragraph("3. TERMS AND CONDITIONS", styles['Heading2']))
-        story.append(Spacer(1, 12))
-        terms = get_terms_and_conditions()
-        for term in terms.split('\n'):
-            if term.strip():
-                story.append(Paragraph(term, styles['Normal']))
-                story.append(Spacer(1, 6))
-
-        # Add signature section
-        story.append(Spacer(1, 30))
-        story.append(Paragraph("4. SIGNATURES", styles['Heading2']))
-        story.append(Spacer(1, 12))
-
-        # Create signature table
-        sig_data = [
-            ['University Representative', 'Organization Representative', 'Student'],
-            ['_________________', '_________________', '_________________'],
-            ['Date: ____________', 'Date: ____________', 'Date: ____________']
-        ]
-        
-        sig_table = Table(sig_data, colWidths=[180, 180, 180])
-        sig_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        story.append(sig_table)
-
-        # Build the PDF
-        doc.build(story)
-
-        return f'agreements/{output_file}'
+        return AgreementService.write_document(agreement, 'pdf', render_agreement_pdf)
 
     @staticmethod
     def generate_docx_agreement(agreement):
         """Generate DOCX version of agreement for editing."""
-        doc = Document()
-        doc.add_heading('Internship Agreement', 0)
+        return AgreementService.write_document(agreement, 'docx', render_agreement_docx)
 
-        # Add agreement details
-        doc.add_heading('1. Parties', level=1)
-        doc.add_paragraph(f'Student: {agreement.student.get_full_name()}')
-        doc.add_paragraph(f'Organization: {agreement.organization.name}')
-        # Add more sections...
+    @staticmethod
+    def create_missing_agreements(internships, batch_size=500):
+        """Create draft agreements for internships that have none. Returns the number created."""
+        missing = internships.filter(agreement__isnull=True)
+        # bulk_create counts rows skipped by ignore_conflicts too, so count what is still missing afterwards
+        before = missing.count()
+        batch = []
+        rows = missing.values_list(
+            'pk', 'student_id', 'organization_id', 'start_date', 'end_date'
+        )
+        for internship_id, student_id, organization_id, start_date, end_date in rows.iterator(chunk_size=batch_size):
+            batch.append(Agreement(
+                internship_id=internship_id,
+                student_id=student_id,
+                organization_id=organization_id,
+                start_date=start_date,
+                end_date=end_date
+            ))
+            if len(batch) >= batch_size:
+                Agreement.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            Agreement.objects.bulk_create(batch, ignore_conflicts=True)
+        return before - missing.count()
 
-        # Save document
-        output_file = f'agreement_{agreement.id}_{timezone.now().strftime("%Y%m%d")}.docx'
-        output_path = os.path.join(settings.MEDIA_ROOT, 'agreements', output_file)
-        doc.save(output_path)
-        return f'agreements/{output_file}'
+    @staticmethod
+    def write_document(agreement, extension, render):
+        data = AgreementService.document_data(agreement)
+        return DocumentCache.get_or_render(AGREEMENT_KINDS[extension], data, 'agreements', extension, render)
 
     @staticmethod
     def process_signature(agreement, user_type, signature_data=None):
@@ -170,18 +112,20 @@ class AgreementService:
                 )
                 
                 # Notify relevant parties
-                NotificationService.create_bulk_notifications([
-                    {
-                        'recipient': agreement.student,
-                        'title': 'Agreement Approved',
-                        'message': 'Your internship agreement has been approved'
-                    },
-                    {
-                        'recipient': agreement.organization.contact_person,
+                notifications = [{
+                    'recipient_id': agreement.student_id,
+                    'title': 'Agreement Approved',
+                    'message': 'Your internship agreement has been approved',
+                    'notification_type': 'agreement'
+                }]
+                if agreement.organization.contact_person_id:
+                    notifications.append({
+                        'recipient_id': agreement.organization.contact_person_id,
                         'title': 'Agreement Approved',
-                        'message': 'Internship agreement has been approved'
-                    }
-                ])
+                        'message': 'Internship agreement has been approved',
+                        'notification_type': 'agreement'
+                    })
+                NotificationService.create_bulk_notifications(notifications)
 
             return True
         except Exception as e:
@@ -199,6 +143,7 @@ class InternshipPlanService:
 
         # Generate default template
         weeks = calculate_internship_weeks(internship.start_date, internship.end_date)
+        department = getattr(internship, 'department', None)
         
         template = f"""
         Internship Plan for {internship.student.get_full_name()}
@@ -208,7 +153,7 @@ class InternshipPlanService:
 
         1. Learning Objectives:
         - Understand {internship.organization.name}'s business processes
-        - Develop practical skills in {internship.department.name if internship.department else 'assigned area'}
+        - Develop practical skills in {department.name if department else 'assigned area'}
         - Gain hands-on experience with industry tools and technologies
 
         2. Weekly Schedule:
@@ -264,8 +209,9 @@ class InternshipPlanService:
             notification_type='plan'
         )
 
+@lru_cache(maxsize=128)
 def generate_weekly_schedule(weeks):
-    """Generate detailed weekly schedule template."""
+    """Generate detailed weekly schedule template. Depends only on ``weeks``, so results are memoized."""
     schedule = []
     for i in range(1, weeks + 1):
         if i == 1:
@@ -317,6 +263,136 @@ def get_terms_and_conditions():
     7. Termination Conditions
     """
 
+DETAILS_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('PADDING', (0, 0), (-1, -1), 6),
+])
+
+SIGNATURE_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+@lru_cache(maxsize=None)
+def agreement_styles():
+    """Build the ReportLab paragraph styles once per process; documents only read them."""
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        alignment=1  # Center alignment
+    )
+    return styles, title_style
+
+def render_agreement_pdf(data):
+    """Render an agreement PDF from AgreementService.document_data. Returns bytes."""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72
+    )
+
+    # Prepare the story (content)
+    story = []
+    styles, title_style = agreement_styles()
+
+    # Add title
+    story.append(Paragraph("INTERNSHIP AGREEMENT", title_style))
+    story.append(Spacer(1, 12))
+
+    # Add agreement details
+    story.append(Paragraph(f"Agreement No: {data['id']}", styles['Normal']))
+    story.append(Paragraph(f"Date: {data['date'].strftime('%B %d, %Y')}", styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    # Add parties information
+    story.append(Paragraph("1. PARTIES", styles['Heading2']))
+    story.append(Spacer(1, 12))
+
+    # University Info
+    story.append(Paragraph("UNIVERSITY:", styles['Heading3']))
+    story.append(Paragraph(f"Name: {data['university_name']}", styles['Normal']))
+    story.append(Paragraph(f"Address: {data['university_address']}", styles['Normal']))
+    story.append(Spacer(1, 12))
+
+    # Organization Info
+    story.append(Paragraph("ORGANIZATION:", styles['Heading3']))
+    story.append(Paragraph(f"Name: {data['organization_name']}", styles['Normal']))
+    story.append(Paragraph(f"Address: {data['organization_address']}", styles['Normal']))
+    story.append(Paragraph(f"Contact Person: {data['organization_contact']}", styles['Normal']))
+    story.append(Spacer(1, 12))
+
+    # Student Info
+    story.append(Paragraph("STUDENT:", styles['Heading3']))
+    story.append(Paragraph(f"Name: {data['student_name']}", styles['Normal']))
+    story.append(Paragraph(f"Student ID: {data['student_username']}", styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    # Add internship details
+    story.append(Paragraph("2. INTERNSHIP DETAILS", styles['Heading2']))
+    story.append(Spacer(1, 12))
+
+    # Create a table for internship details
+    table_data = [
+        ['Start Date', data['start_date'].strftime('%B %d, %Y')],
+        ['End Date', data['end_date'].strftime('%B %d, %Y')],
+        ['Department', data['department']]
+    ]
+
+    t = Table(table_data, colWidths=[200, 300])
+    t.setStyle(DETAILS_TABLE_STYLE)
+    story.append(t)
+    story.append(Spacer(1, 20))
+
+    # Add terms and conditions
+    story.append(Paragraph("3. TERMS AND CONDITIONS", styles['Heading2']))
+    story.append(Spacer(1, 12))
+    for term in data['terms'].split('\n'):
+        if term.strip():
+            story.append(Paragraph(term, styles['Normal']))
+            story.append(Spacer(1, 6))
+
+    # Add signature section
+    story.append(Spacer(1, 30))
+    story.append(Paragraph("4. SIGNATURES", styles['Heading2']))
+    story.append(Spacer(1, 12))
+
+    # Create signature table
+    sig_data = [
+        ['University Representative', 'Organization Representative', 'Student'],
+        ['_________________', '_________________', '_________________'],
+        ['Date: ____________', 'Date: ____________', 'Date: ____________']
+    ]
+
+    sig_table = Table(sig_data, colWidths=[180, 180, 180])
+    sig_table.setStyle(SIGNATURE_TABLE_STYLE)
+    story.append(sig_table)
+
+    # Build the PDF
+    doc.build(story)
+    return buffer.getvalue()
+
+def render_agreement_docx(data):
+    """Render an agreement DOCX from AgreementService.document_data. Returns bytes."""
+    doc = Document()
+    doc.add_heading('Internship Agreement', 0)
+
+    # Add agreement details
+    doc.add_heading('1. Parties', level=1)
+    doc.add_paragraph(f"Student: {data['student_name']}")
+    doc.add_paragraph(f"Organization: {data['organization_name']}")
+    # Add more sections...
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
 def generate_verification_qr(agreement):
     """Generate QR code for agreement verification."""
     import qrcode
@@ -1,21 +1,22 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from .models import Internship, Task, Evaluation
-from apps.notifications.services import NotificationService
+from apps.notifications.services import NotificationQueue
+from apps.users.services import UserStatsService
 
 @receiver(post_save, sender=Internship)
 def internship_post_save(sender, instance, created, **kwargs):
     if created:
-        NotificationService.create_notification(
-            recipient=instance.student,
+        NotificationQueue.enqueue_notification(
+            [instance.student],
             title='Internship Created',
             message=f'Your internship at {instance.organization.name} has been created',
             notification_type='internship'
         )
 
         if instance.mentor:
-            NotificationService.create_notification(
-                recipient=instance.mentor,
+            NotificationQueue.enqueue_notification(
+                [instance.mentor],
                 title='New Intern Assigned',
                 message=f'You have been assigned as mentor for {instance.student.get_full_name()}',
                 notification_type='internship'
@@ -24,15 +25,15 @@ def internship_post_save(sender, instance, created, **kwargs):
 @receiver(post_save, sender=Task)
 def task_post_save(sender, instance, created, **kwargs):
     if created:
-        NotificationService.create_notification(
-            recipient=instance.internship.student,
+        NotificationQueue.enqueue_notification(
+            [instance.internship.student],
             title='New Task Assigned',
             message=f'You have been assigned a new task: {instance.title}',
             notification_type='task'
         )
     elif instance.status == 'completed':
-        NotificationService.create_notification(
-            recipient=instance.assigned_by,
+        NotificationQueue.enqueue_notification(
+            [instance.assigned_by],
             title='Task Completed',
             message=f'Task "{instance.title}" has been completed',
             notification_type='task'
@@ -41,9 +42,77 @@ def task_post_save(sender, instance, created, **kwargs):
 @receiver(post_save, sender=Evaluation)
 def evaluation_post_save(sender, instance, created, **kwargs):
     if created:
-        NotificationService.create_notification(
-            recipient=instance.internship.student,
+        NotificationQueue.enqueue_notification(
+            [instance.internship.student],
             title='New Evaluation',
             message=f'You have received a new evaluation from your {instance.evaluator_type}',
             notification_type='evaluation'
-        )
\ No newline at end of file
+        )
+
+@receiver(pre_save, sender=Internship)
+def internship_stats_snapshot(sender, instance, **kwargs):
+    # Remember what the stored row contributed so post_save can move counters
+    instance._stats_contribution = None
+    instance._stats_mentor_id = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values(
+            'student_id', 'mentor_id', 'status'
+        ).first()
+        if previous:
+            instance._stats_contribution = UserStatsService.internship_contribution(**previous)
+            instance._stats_mentor_id = previous['mentor_id']
+
+@receiver(post_save, sender=Internship)
+def internship_stats_post_save(sender, instance, created, **kwargs):
+    UserStatsService.apply_change(
+        old=getattr(instance, '_stats_contribution', None),
+        new=UserStatsService.internship_contribution(
+            instance.student_id, instance.mentor_id, instance.status
+        )
+    )
+
+    # Report counters are keyed on the mentor, so a new mentor takes over the existing reports
+    previous_mentor_id = getattr(instance, '_stats_mentor_id', None)
+    if not created and previous_mentor_id != instance.mentor_id:
+        UserStatsService.apply_change(
+            old=UserStatsService.mentor_reports_contribution(instance.pk, previous_mentor_id),
+            new=UserStatsService.mentor_reports_contribution(instance.pk, instance.mentor_id)
+        )
+
+@receiver(post_delete, sender=Internship)
+def internship_stats_post_delete(sender, instance, **kwargs):
+    UserStatsService.apply_change(
+        old=UserStatsService.internship_contribution(
+            instance.student_id, instance.mentor_id, instance.status
+        )
+    )
+
+@receiver(pre_save, sender=Task)
+def task_stats_snapshot(sender, instance, **kwargs):
+    instance._stats_contribution = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values(
+            'internship__student_id', 'status'
+        ).first()
+        if previous:
+            instance._stats_contribution = UserStatsService.task_contribution(
+                previous['internship__student_id'], previous['status']
+            )
+
+@receiver(post_save, sender=Task)
+def task_stats_post_save(sender, instance, **kwargs):
+    UserStatsService.apply_change(
+        old=getattr(instance, '_stats_contribution', None),
+        new=UserStatsService.task_contribution(
+            instance.internship.student_id, instance.status
+        )
+    )
+
+@receiver(post_delete, sender=Task)
+def task_stats_post_delete(sender, instance, **kwargs):
+    UserStatsService.apply_change(
+        old=UserStatsService.task_contribution(
+            instance.internship.student_id, instance.status
+        )
+    )
+
@@ -1,6 +1,14 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import date
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
 from django.contrib.auth import get_user_model
-from .models import Internship, Report
+from .models import Agreement, Internship, Report
 from apps.companies.models import Organization
 
 # Create your tests here.
@@ -27,3 +35,121 @@ class InternshipTests(TestCase):
         )
         self.assertEqual(internship.status, 'pending')
         self.assertEqual(str(internship), f"Test Internship - {self.user.get_full_name()}")
+
+
+class GenerateAgreementsCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+
+        organization = Organization.objects.create(name='Acme', address='1 Main St')
+        for index, (year, status) in enumerate([
+            (2024, Internship.STATUS_ACTIVE),
+            (2024, Internship.STATUS_ACTIVE),
+            (2024, Internship.STATUS_PENDING),
+            (2023, Internship.STATUS_ACTIVE),
+        ]):
+            Internship.objects.create(
+                student=get_user_model().objects.create_user(username=f'student{index}', password='test123'),
+                organization=organization,
+                title='Intern',
+                description='Work',
+                start_date=date(year, 2, 1),
+                end_date=date(year, 6, 30),
+                status=status
+            )
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        cache.clear()
+
+    def test_cohort_agreements_created_and_rendered(self):
+        output = StringIO()
+        call_command('generate_agreements', cohort=2024, workers=1, batch_size=1, stdout=output)
+
+        agreements = Agreement.objects.all()
+        self.assertEqual(agreements.count(), 2)
+        for agreement in agreements:
+            self.assertTrue(agreement.agreement_file.name.endswith('.pdf'))
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, agreement.agreement_file.name)))
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, 'agreements'))), 4)
+        self.assertIn('Created 2 agreements', output.getvalue())
+        self.assertIn('4 documents rendered', output.getvalue())
+
+        output = StringIO()
+        call_command('generate_agreements', cohort=2024, workers=1, stdout=output)
+        self.assertIn('Created 0 agreements', output.getvalue())
+        self.assertIn('0 documents rendered, 4 from cache', output.getvalue())
+
+
+class PlanTemplateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = get_user_model().objects.create_user(username='student', password='test123', first_name='Ann')
+        self.internship = Internship.objects.create(
+            student=self.student,
+            organization=Organization.objects.create(name='Acme'),
+            title='Intern',
+            description='Work',
+            start_date=date(2024, 1, 1),
+            end_date=date(2024, 3, 31)
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_template(self, **headers):
+        from .views import InternshipPlanViewSet
+
+        request = APIRequestFactory().get('/', **headers)
+        force_authenticate(request, user=self.student)
+        return InternshipPlanViewSet.as_view({'get': 'template'})(request, pk=self.internship.pk)
+
+    def test_template_served_with_validators_and_cache_control(self):
+        response = self.get_template()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Acme', response.data['template'])
+        self.assertIn('max-age=300', response['Cache-Control'])
+
+        cached = self.get_template(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertIn('private', cached['Cache-Control'])
+
+        self.internship.title = 'Renamed'
+        self.internship.save()
+        self.assertEqual(self.get_template(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+
+class ConditionalReportTests(TestCase):
+    def setUp(self):
+        self.student = get_user_model().objects.create_user(username='student', password='test123', user_type='student')
+        internship = Internship.objects.create(
+            student=self.student,
+            organization=Organization.objects.create(name='Acme'),
+            title='Intern',
+            description='Work',
+            start_date=date(2024, 1, 1),
+            end_date=date(2024, 3, 31)
+        )
+        self.report = Report.objects.create(student=self.student, internship=internship, title='Week 1', content='Draft')
+
+    def request(self, action, method='get', data=None, **headers):
+        from .views import ReportViewSet
+
+        request = getattr(APIRequestFactory(), method)('/', data, format='json', **headers)
+        force_authenticate(request, user=self.student)
+        return ReportViewSet.as_view({method: action})(request, pk=self.report.pk)
+
+    def test_edit_changes_validator(self):
+        etag = self.request('retrieve')['ETag']
+        self.assertEqual(self.request('retrieve', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.request('partial_update', method='patch', data={'content': 'Final'})
+
+        response = self.request('retrieve', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['content'], 'Final')
@@ -26,6 +26,14 @@ from .serializers import (
 from .permissions import IsInternshipParticipant, IsAgreementParticipant, IsTeacher, IsStudent
 from apps.notifications.services import NotificationService
 from .services import AgreementService, InternshipPlanService
+from apps.reports.models import RenderJob
+from apps.reports.serializers import RenderJobSerializer
+from apps.reports.services import RenderService
+from core.documents import document_exists
+from apps.dashboard.services import DashboardService
+from core.pagination import SubmittedAtCursorPagination
+from core.cache import cache_response
+from core.mixins import ConditionalGetMixin
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from django.conf import settings
@@ -34,7 +42,7 @@ from rest_framework.exceptions import PermissionDenied
 
 User = get_user_model()
 
-class InternshipViewSet(viewsets.ModelViewSet):
+class InternshipViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsInternshipParticipant]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'organization', 'department']
@@ -197,10 +205,9 @@ class AgreementViewSet(viewsets.ModelViewSet):
         return AgreementSerializer
 
     def perform_create(self, serializer):
-        # Create agreement and generate initial PDF
+        # Create agreement; the initial PDF is rendered by run_render_worker
         agreement = serializer.save(student=self.request.user)
-        agreement.agreement_file = agreement.generate_agreement_file()
-        agreement.save()
+        RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, agreement, self.request.user)
 
         # Notify organization
         NotificationService.create_notification(
@@ -243,17 +250,12 @@ class AgreementViewSet(viewsets.ModelViewSet):
         if AgreementService.process_signature(agreement, user_type, signature_data):
             # Notify relevant parties
             if agreement.status == 'approved':
-                recipients = [agreement.student]
-                if agreement.organization.contact_person:
-                    recipients.append(agreement.organization.contact_person)
-                
-                for recipient in recipients:
-                    NotificationService.create_notification(
-                        recipient=recipient,
-                        title='Agreement Approved',
-                        message='The internship agreement has been fully approved',
-                        notification_type='agreement'
-                    )
+                NotificationService.notify_recipients(
+                    [agreement.student_id, agreement.organization.contact_person_id],
+                    title='Agreement Approved',
+                    message='The internship agreement has been fully approved',
+                    notification_type='agreement'
+                )
 
             return Response({'status': 'signature processed'})
         
@@ -265,17 +267,31 @@ class AgreementViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['GET'])
     def download(self, request, pk=None):
         agreement = self.get_object()
-        if not agreement.agreement_file:
-            return Response(
-                {'error': 'No agreement file available'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        if not agreement.agreement_file or not document_exists(agreement.agreement_file.name):
+            # Served straight from the document cache when the inputs are unchanged,
+            # otherwise queued for the worker and polled through the job
+            job = RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, agreement, request.user)
+            if job.status != RenderJob.STATUS_DONE:
+                return Response(
+                    RenderJobSerializer(job, context={'request': request}).data,
+                    status=status.HTTP_202_ACCEPTED
+                )
+            agreement.refresh_from_db(fields=['agreement_file'])
         
         # Return file URL or serve file directly
         return Response({
             'file_url': request.build_absolute_uri(agreement.agreement_file.url)
         })
 
+    @action(detail=True, methods=['POST'])
+    def regenerate(self, request, pk=None):
+        agreement = self.get_object()
+        job = RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, agreement, request.user)
+        return Response(
+            RenderJobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_200_OK if job.status == RenderJob.STATUS_DONE else status.HTTP_202_ACCEPTED
+        )
+
 class InternshipPlanViewSet(viewsets.ModelViewSet):
     serializer_class = InternshipPlanSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -325,12 +341,15 @@ class InternshipPlanViewSet(viewsets.ModelViewSet):
         return Response({'status': 'plan reviewed'})
 
     @action(detail=True, methods=['GET'])
+    @cache_response(timeout=3600, key_prefix='plan_template', models=[
+        Internship, 'users.user', 'companies.organization'
+    ], max_age=300)
     def template(self, request, pk=None):
         internship = get_object_or_404(Internship, pk=pk)
         template_content = InternshipPlanService.generate_plan_template(internship)
         return Response({'template': template_content})
 
-class StudentInternshipViewSet(viewsets.ModelViewSet):
+class StudentInternshipViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = InternshipSerializer
     permission_classes = [permissions.IsAuthenticated, IsInternshipParticipant]
 
@@ -577,13 +596,19 @@ class TeacherViewSet(viewsets.ModelViewSet):
             status='submitted'
         ).select_related(
             'student', 'internship'
-        ).order_by('submission_date')
-        
-        return Response(ReportSerializer(reports, many=True).data)
+        )
 
-class ReportViewSet(viewsets.ModelViewSet):
+        # Oldest first, one cursor page at a time
+        paginator = SubmittedAtCursorPagination()
+        paginator.ordering = ('submitted_at', 'id')
+        page = paginator.paginate_queryset(reports, request, view=self)
+        return paginator.get_paginated_response(ReportSerializer(page, many=True).data)
+
+class ReportViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ReportSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Every edit, status change and evaluation saves the row and moves updated_at
+    conditional_fields = ('updated_at',)
 
     def get_queryset(self):
         user = self.request.user
@@ -624,7 +649,7 @@ class EvaluationViewSet(viewsets.ModelViewSet):
             evaluator_type=self.request.user.user_type
         )
 
-class InternshipViewSet(viewsets.ModelViewSet):
+class InternshipViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = InternshipSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -644,6 +669,9 @@ class InternshipViewSet(viewsets.ModelViewSet):
 class StudentDashboardView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsStudent]
 
+    @cache_response(timeout=300, key_prefix='student_dashboard', models=[
+        'users.user', 'companies.organization', Internship, Report, Evaluation
+    ])
     def get(self, request):
         try:
             student = request.user
@@ -717,47 +745,26 @@ class StudentDashboardView(APIView):
 class TeacherDashboardView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsTeacher]
     serializer_class = DashboardSerializer
+    pagination_class = SubmittedAtCursorPagination
 
+    @cache_response(timeout=300, key_prefix='teacher_dashboard', models=['users.user', Internship, Report])
     def get(self, request):
         try:
             teacher = request.user
-            print(f"Debug - User ID: {teacher.id}")
-            print(f"Debug - User Type: {teacher.user_type}")
-            print(f"Debug - User Permissions: {teacher.get_all_permissions()}")
 
-            # Get internships assigned to this teacher
-            teacher_internships = Internship.objects.filter(teacher=teacher)
-            print(f"Debug - Teacher Internships Count: {teacher_internships.count()}")
+            # All counters come from one conditional-aggregate query
+            stats = DashboardService.get_teacher_stats(teacher)
 
-            # Get all reports for these internships
-            reports = Report.objects.filter(
-                internship__in=teacher_internships
-            ).select_related(
-                'student',
-                'internship'
-            ).order_by('-submitted_at')
-
-            # Calculate statistics
-            stats = {
-                'pending_reports': reports.filter(status='pending').count(),
-                'under_review': reports.filter(status='under_review').count(),
-                'evaluated_reports': reports.filter(
-                    status__in=['approved', 'rejected']
-                ).count(),
-                'active_students': User.objects.filter(
-                    internships__in=teacher_internships,
-                    user_type='student',
-                    is_active=True
-                ).distinct().count(),
-                'total_internships': teacher_internships.count(),
-                'active_internships': teacher_internships.filter(status='active').count()
-            }
+            # Reports are returned one cursor page at a time
+            reports = DashboardService.get_teacher_reports(teacher)
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(reports, request, view=self)
 
             # Get recent activities
             recent_activities = []
-            
+
             # Add recent report submissions
-            recent_reports = reports.order_by('-submitted_at')[:5]
+            recent_reports = reports[:5]
             for report in recent_reports:
                 recent_activities.append({
                     'type': 'report_submission',
@@ -769,11 +776,12 @@ class TeacherDashboardView(APIView):
 
             data = {
                 'stats': stats,
-                'reports': ReportSerializer(reports, many=True).data,
+                'reports': ReportSerializer(page, many=True).data,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
                 'recent_activities': recent_activities
             }
 
-            print("Debug - Response Data:", data)
             return Response(data)
 
         except Exception as e:
@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import NotificationJob
 
-# Register your models here.
+@admin.register(NotificationJob)
+class NotificationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'ordering_key', 'status', 'attempts', 'available_at', 'created_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('ordering_key', 'last_error')
+    ordering = ('id',)
@@ -0,0 +1,109 @@
+import asyncio
+import json
+from urllib.parse import parse_qs
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from django.conf import settings
+from .models import Notification
+from .serializers import NotificationSerializer
+from .services import NotificationPush, UnreadCounter
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
+        self.user = self.scope['user']
+
+        # Verify user is authenticated
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = NotificationPush.group_name(self.user.id)
+        self.replayed_up_to = 0
+        self.pending = None
+        self.flush_task = None
+
+        # Join before replaying so nothing created in between is missed
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        await self.replay(self.parse_id(query.get('last_id', [None])[0]))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            if self.flush_task:
+                self.flush_task.cancel()
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self.send(text_data=json.dumps({
+                'error': 'Invalid message format'
+            }))
+            return
+
+        if data.get('type') == 'sync':
+            await self.replay(self.parse_id(data.get('last_id')))
+
+    async def notification_delta(self, event):
+        # Merge bursts into one frame per coalesce window
+        if self.pending is None:
+            self.pending = {'created': {}, 'read': set(), 'all_read': False}
+        for notification in event.get('created', []):
+            if notification['id'] > self.replayed_up_to:
+                self.pending['created'][notification['id']] = notification
+        self.pending['read'].update(event.get('read', []))
+        self.pending['all_read'] = self.pending['all_read'] or event.get('all_read', False)
+        self.pending['unread_count'] = event['unread_count']
+
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(settings.NOTIFICATION_PUSH_COALESCE_WINDOW)
+        pending, self.pending = self.pending, None
+        if pending is None:
+            return
+
+        await self.send(text_data=json.dumps({
+            'type': 'notifications',
+            'created': sorted(pending['created'].values(), key=lambda item: item['id']),
+            'read': sorted(pending['read']),
+            'all_read': pending['all_read'],
+            'unread_count': pending['unread_count']
+        }))
+
+    async def replay(self, last_id):
+        if last_id is None:
+            return
+
+        notifications, has_more, unread_count = await self.get_missed(last_id)
+        if notifications:
+            self.replayed_up_to = max(self.replayed_up_to, notifications[-1]['id'])
+        await self.send(text_data=json.dumps({
+            'type': 'notifications',
+            'replay': True,
+            'created': notifications,
+            'has_more': has_more,
+            'unread_count': unread_count
+        }))
+
+    def parse_id(self, value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    @database_sync_to_async
+    def get_missed(self, last_id):
+        limit = settings.NOTIFICATION_REPLAY_LIMIT
+        notifications = list(
+            Notification.objects.filter(recipient=self.user, id__gt=last_id).order_by('id')[:limit + 1]
+        )
+        return (
+            NotificationSerializer(notifications[:limit], many=True).data,
+            len(notifications) > limit,
+            UnreadCounter.get(self.user.id)
+        )
@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from apps.notifications.services import NotificationQueue
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued notifications, activity records and channel messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Jobs claimed per pass')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain due jobs and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.stdout.write('Notification worker started')
+
+        try:
+            while True:
+                processed = NotificationQueue.process_jobs(batch_size=batch_size)
+                if processed:
+                    self.stdout.write(f'Processed {processed} jobs')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('Notification worker stopped'))
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 User = settings.AUTH_USER_MODEL
 
@@ -15,13 +16,18 @@ class Notification(models.Model):
     title = models.CharField(max_length=255)
     message = models.TextField()
     notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPE_CHOICES)
+    related_object_id = models.PositiveIntegerField(null=True, blank=True)
+    related_object_type = models.CharField(max_length=50, null=True, blank=True)
     is_read = models.BooleanField(default=False)
+    read_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['recipient', 'is_read'], name='notification_recipient_is_read_idx'),
+            models.Index(fields=['recipient', '-created_at'], name='notif_recipient_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='notification_created_id_idx'),
         ]
 
     def __str__(self):
@@ -47,3 +53,43 @@ class NotificationPreference(models.Model):
 
     def __str__(self):
         return f"Notification preferences for {self.user.username}"
+
+class NotificationJob(models.Model):
+    """Deferred side effect written in the request transaction and run by the worker."""
+    KIND_NOTIFICATION = 'notification'
+    KIND_ACTIVITY = 'activity'
+    KIND_CHANNEL = 'channel'
+
+    KIND_CHOICES = [
+        (KIND_NOTIFICATION, 'Notification'),
+        (KIND_ACTIVITY, 'Activity Log'),
+        (KIND_CHANNEL, 'Channel Layer Send'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict)
+    ordering_key = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='notification_job_status_idx'),
+            models.Index(fields=['ordering_key', 'status'], name='notification_job_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} job {self.id}"
+
@@ -1,5 +1,145 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef
 from django.utils import timezone
-from .models import Notification
+from .models import Notification, NotificationJob
+from .serializers import NotificationSerializer
+from core.cache import bump_generation
+from core.retention import prune
+
+def unique_recipient_ids(recipients):
+    """Get recipient primary keys in order, skipping empty and repeated ones."""
+    # Accept users or primary keys
+    return list(dict.fromkeys(
+        recipient_id for recipient_id in (getattr(recipient, 'pk', recipient) for recipient in recipients)
+        if recipient_id is not None
+    ))
+
+class UnreadCounter:
+    """
+    Per-user unread notification counts kept in the cache.
+
+    Counts are moved with atomic incr/decr as notifications are created and
+    read. Each entry expires after NOTIFICATION_UNREAD_RECONCILE_INTERVAL, and
+    the next read recounts it from the database, so any drift is short-lived.
+    """
+
+    @staticmethod
+    def key(user_id):
+        return f'notification_unread_{user_id}'
+
+    @staticmethod
+    def get(user_id):
+        """Get the unread count, recounting it when it is not cached."""
+        count = cache.get(UnreadCounter.key(user_id))
+        if count is None:
+            count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+            cache.add(UnreadCounter.key(user_id), count, settings.NOTIFICATION_UNREAD_RECONCILE_INTERVAL)
+        return count
+
+    @staticmethod
+    def get_many(user_ids):
+        """Get unread counts for several users, recounting misses in one query."""
+        keys = {UnreadCounter.key(user_id): user_id for user_id in user_ids}
+        counts = {keys[key]: count for key, count in cache.get_many(list(keys)).items()}
+        missing = [user_id for user_id in user_ids if user_id not in counts]
+        if missing:
+            found = dict(
+                Notification.objects.filter(recipient_id__in=missing, is_read=False)
+                .values('recipient_id').annotate(unread=Count('id'))
+                .values_list('recipient_id', 'unread')
+            )
+            for user_id in missing:
+                counts[user_id] = found.get(user_id, 0)
+                cache.add(UnreadCounter.key(user_id), counts[user_id], settings.NOTIFICATION_UNREAD_RECONCILE_INTERVAL)
+        return counts
+
+    @staticmethod
+    def adjust(deltas):
+        """Apply a {user_id: delta} mapping to the cached counts."""
+        for user_id, delta in deltas.items():
+            if not delta:
+                continue
+            try:
+                if cache.incr(UnreadCounter.key(user_id), delta) < 0:
+                    cache.delete(UnreadCounter.key(user_id))
+            except ValueError:
+                # Not cached; the next read counts from the database
+                pass
+
+    @staticmethod
+    def release(notification_ids):
+        """Take notifications that are about to be deleted out of the counts."""
+        unread = Notification.objects.filter(id__in=notification_ids, is_read=False).values(
+            'recipient_id'
+        ).annotate(unread=Count('id'))
+        UnreadCounter.adjust({row['recipient_id']: -row['unread'] for row in unread})
+
+    @staticmethod
+    def reset(user_id):
+        cache.set(UnreadCounter.key(user_id), 0, settings.NOTIFICATION_UNREAD_RECONCILE_INTERVAL)
+
+class NotificationPush:
+    """
+    Sends notification deltas to each user's ``notifications_{id}`` group.
+
+    Every event carries the recipient's current unread count, so a connected
+    client never has to poll. Sends happen after the surrounding transaction
+    commits, so a pushed id is always visible to a replay.
+    """
+
+    @staticmethod
+    def group_name(user_id):
+        return f'notifications_{user_id}'
+
+    @staticmethod
+    def send(events):
+        """Send a {user_id: event} mapping once the transaction commits."""
+        def deliver():
+            channel_layer = get_channel_layer()
+            if channel_layer is None:
+                return
+            unread = UnreadCounter.get_many(list(events))
+            for user_id, event in events.items():
+                event['unread_count'] = unread[user_id]
+                try:
+                    async_to_sync(channel_layer.group_send)(NotificationPush.group_name(user_id), event)
+                except Exception as e:
+                    print(f"Error pushing notifications to user {user_id}: {str(e)}")
+
+        if events:
+            transaction.on_commit(deliver)
+
+    @staticmethod
+    def push_created(notifications):
+        """Push new notifications, one event per recipient."""
+        created = defaultdict(list)
+        for notification in notifications:
+            created[notification.recipient_id].append(notification)
+        NotificationPush.send({
+            user_id: {
+                'type': 'notification.delta',
+                'created': NotificationSerializer(items, many=True).data
+            }
+            for user_id, items in created.items()
+        })
+
+    @staticmethod
+    def push_read(user_id, notification_ids=None):
+        """Push read markers; no ids means everything was marked read."""
+        NotificationPush.send({
+            user_id: {
+                'type': 'notification.delta',
+                'read': list(notification_ids or []),
+                'all_read': notification_ids is None
+            }
+        })
 
 class NotificationService:
     @staticmethod
@@ -15,70 +155,262 @@ class NotificationService:
                 related_object_type=related_object_type
             )
             
-            # You can add real-time notification here if needed
-            # For example, using channels/websockets
-            
+            UnreadCounter.adjust({notification.recipient_id: 1})
+            NotificationPush.push_created([notification])
             return notification
         except Exception as e:
             print(f"Error creating notification: {str(e)}")
             return None
 
     @staticmethod
-    def create_bulk_notifications(notifications_data):
-        """Create multiple notifications at once."""
+    def insert_notifications(notifications_data, batch_size=None):
+        """Create multiple notifications with batched INSERTs, letting errors through to the caller."""
+        notifications = [Notification(**data) for data in notifications_data]
+        created = Notification.objects.bulk_create(
+            notifications,
+            batch_size=batch_size or settings.NOTIFICATION_BULK_BATCH_SIZE
+        )
+        # bulk_create skips post_save, so invalidate cached responses here
+        bump_generation(Notification)
+        UnreadCounter.adjust(Counter(
+            notification.recipient_id for notification in created if not notification.is_read
+        ))
+        NotificationPush.push_created(created)
+        return created
+
+    @staticmethod
+    def create_bulk_notifications(notifications_data, batch_size=None):
+        """Create multiple notifications with batched INSERTs."""
         try:
-            notifications = []
-            for data in notifications_data:
-                notification = Notification.objects.create(**data)
-                notifications.append(notification)
-            return notifications
+            return NotificationService.insert_notifications(notifications_data, batch_size=batch_size)
         except Exception as e:
             print(f"Error creating bulk notifications: {str(e)}")
             return []
 
+    @staticmethod
+    def recipient_rows(recipients, title, message, notification_type, related_object_id=None, related_object_type=None):
+        """Get one notification row per distinct recipient."""
+        return [
+            {
+                'recipient_id': recipient_id,
+                'title': title,
+                'message': message,
+                'notification_type': notification_type,
+                'related_object_id': related_object_id,
+                'related_object_type': related_object_type
+            }
+            for recipient_id in unique_recipient_ids(recipients)
+        ]
+
+    @staticmethod
+    def notify_recipients(recipients, title, message, notification_type, related_object_id=None, related_object_type=None, batch_size=None):
+        """Create the same notification for every recipient in one bulk insert."""
+        return NotificationService.create_bulk_notifications(NotificationService.recipient_rows(
+            recipients, title, message, notification_type, related_object_id, related_object_type
+        ), batch_size=batch_size)
+
     @staticmethod
     def mark_as_read(notification_id, user):
-        """Mark a notification as read."""
-        try:
-            notification = Notification.objects.get(id=notification_id, recipient=user)
-            notification.is_read = True
-            notification.read_at = timezone.now()
-            notification.save()
-            return True
-        except Notification.DoesNotExist:
+        """Mark a notification as read. Returns True if this call changed it."""
+        # Conditional UPDATE, so concurrent requests can't both take it off the count
+        updated = Notification.objects.filter(
+            id=notification_id,
+            recipient=user,
+            is_read=False
+        ).update(is_read=True, read_at=timezone.now())
+        if not updated:
             return False
+        bump_generation(Notification)
+        UnreadCounter.adjust({user.id: -1})
+        NotificationPush.push_read(user.id, [notification_id])
+        return True
 
     @staticmethod
     def mark_all_as_read(user):
-        """Mark all notifications as read for a user."""
+        """Mark all notifications as read for a user. Returns how many were marked."""
         try:
-            Notification.objects.filter(
+            updated = Notification.objects.filter(
                 recipient=user,
                 is_read=False
             ).update(
                 is_read=True,
                 read_at=timezone.now()
             )
-            return True
         except Exception as e:
             print(f"Error marking notifications as read: {str(e)}")
-            return False
+            return 0
+
+        UnreadCounter.reset(user.id)
+        if updated:
+            bump_generation(Notification)
+            NotificationPush.push_read(user.id)
+        return updated
 
     @staticmethod
     def get_unread_count(user):
         """Get count of unread notifications for a user."""
-        return Notification.objects.filter(
-            recipient=user,
-            is_read=False
-        ).count()
+        return UnreadCounter.get(user.id)
 
     @staticmethod
     def delete_old_notifications(days=30):
         """Delete notifications older than specified days."""
         try:
             cutoff_date = timezone.now() - timezone.timedelta(days=days)
-            Notification.objects.filter(created_at__lt=cutoff_date).delete()
+            prune(
+                Notification,
+                'created_at',
+                cutoff_date,
+                batch_size=settings.HISTORY_PRUNE_BATCH_SIZE,
+                before_delete=UnreadCounter.release
+            )
             return True
         except Exception as e:
             print(f"Error deleting old notifications: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+class NotificationQueue:
+    """
+    Outbox for side effects that do not have to finish inside the request.
+
+    Jobs are inserted in the caller's transaction, so they become visible to
+    ``run_notification_worker`` only once the primary row is committed.
+    Jobs sharing an ordering key are delivered in insertion order.
+    """
+
+    @staticmethod
+    def enqueue(kind, payload, ordering_key=''):
+        """Queue a job, or run it inline when the queue is disabled."""
+        if not settings.NOTIFICATION_QUEUE_ASYNC:
+            NotificationQueue.run(kind, payload)
+            return None
+        return NotificationJob.objects.create(
+            kind=kind,
+            payload=payload,
+            ordering_key=ordering_key
+        )
+
+    @staticmethod
+    def enqueue_notification(recipients, title, message, notification_type, related_object_id=None, related_object_type=None):
+        """Queue one notification job per recipient, keyed on the recipient."""
+        recipient_ids = unique_recipient_ids(recipients)
+        if not recipient_ids:
+            return []
+        payload = {
+            'title': title,
+            'message': message,
+            'notification_type': notification_type,
+            'related_object_id': related_object_id,
+            'related_object_type': related_object_type
+        }
+        if not settings.NOTIFICATION_QUEUE_ASYNC:
+            # Nothing would retry an inline failure, so it is logged like other direct notifications
+            NotificationService.notify_recipients(recipient_ids, **payload)
+            return []
+
+        # One job per recipient so each user's notifications keep their order
+        return NotificationJob.objects.bulk_create([
+            NotificationJob(
+                kind=NotificationJob.KIND_NOTIFICATION,
+                payload={'recipient_ids': [recipient_id], **payload},
+                ordering_key=f'user:{recipient_id}'
+            )
+            for recipient_id in recipient_ids
+        ])
+
+    @staticmethod
+    def enqueue_activity(model_label, user, **fields):
+        """Queue an activity log row, e.g. ``enqueue_activity('dashboard.Activity', user, ...)``."""
+        user_id = getattr(user, 'pk', user)
+        return NotificationQueue.enqueue(NotificationJob.KIND_ACTIVITY, {
+            'model': model_label,
+            'fields': {'user_id': user_id, **fields}
+        }, ordering_key=f'user:{user_id}')
+
+    @staticmethod
+    def enqueue_activities(model_label, entries):
+        """Queue many activity rows with one INSERT; ``entries`` is a list of (user, fields) pairs."""
+        payloads = []
+        for user, fields in entries:
+            user_id = getattr(user, 'pk', user)
+            payloads.append((user_id, {'model': model_label, 'fields': {'user_id': user_id, **fields}}))
+        if not settings.NOTIFICATION_QUEUE_ASYNC:
+            model = apps.get_model(model_label)
+            return model.objects.bulk_create([model(**payload['fields']) for _, payload in payloads])
+        return NotificationJob.objects.bulk_create([
+            NotificationJob(kind=NotificationJob.KIND_ACTIVITY, payload=payload, ordering_key=f'user:{user_id}')
+            for user_id, payload in payloads
+        ])
+
+    @staticmethod
+    def enqueue_channel_message(group, message):
+        """Queue a channel layer group_send."""
+        return NotificationQueue.enqueue(NotificationJob.KIND_CHANNEL, {
+            'group': group,
+            'message': message
+        }, ordering_key=group)
+
+    @staticmethod
+    def run(kind, payload):
+        """Perform the side effect described by a job."""
+        if kind == NotificationJob.KIND_NOTIFICATION:
+            payload = dict(payload)
+            recipient_ids = payload.pop('recipient_ids')
+            # Errors must reach process_jobs so the job is retried instead of deleted
+            NotificationService.insert_notifications(NotificationService.recipient_rows(recipient_ids, **payload))
+        elif kind == NotificationJob.KIND_ACTIVITY:
+            apps.get_model(payload['model']).objects.create(**payload['fields'])
+        elif kind == NotificationJob.KIND_CHANNEL:
+            from asgiref.sync import async_to_sync
+            from channels.layers import get_channel_layer
+
+            channel_layer = get_channel_layer()
+            if channel_layer is not None:
+                async_to_sync(channel_layer.group_send)(payload['group'], payload['message'])
+        else:
+            raise ValueError(f'Unknown job kind: {kind}')
+
+    @staticmethod
+    def process_jobs(batch_size=100):
+        """Run due jobs in id order. Returns the number of jobs run."""
+        now = timezone.now()
+        # A job waiting for a retry holds back newer jobs with the same key
+        held_back = NotificationJob.objects.filter(
+            status=NotificationJob.STATUS_PENDING,
+            available_at__gt=now,
+            ordering_key=OuterRef('ordering_key'),
+            id__lt=OuterRef('id')
+        ).exclude(ordering_key='')
+        with transaction.atomic():
+            queryset = NotificationJob.objects.filter(
+                ~Exists(held_back),
+                status=NotificationJob.STATUS_PENDING,
+                available_at__lte=now
+            ).order_by('id')
+            if connection.features.has_select_for_update_skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+            jobs = list(queryset[:batch_size])
+
+            processed = 0
+            failed_keys = set()
+            for job in jobs:
+                if job.ordering_key and job.ordering_key in failed_keys:
+                    continue
+                processed += 1
+                try:
+                    with transaction.atomic():
+                        NotificationQueue.run(job.kind, job.payload)
+                    job.delete()
+                except Exception as e:
+                    job.attempts += 1
+                    job.last_error = str(e)
+                    if job.attempts >= settings.NOTIFICATION_QUEUE_MAX_ATTEMPTS:
+                        job.status = NotificationJob.STATUS_FAILED
+                    else:
+                        delay = settings.NOTIFICATION_QUEUE_RETRY_DELAY * 2 ** (job.attempts - 1)
+                        job.available_at = now + timedelta(seconds=delay)
+                        if job.ordering_key:
+                            failed_keys.add(job.ordering_key)
+                    job.save(update_fields=['attempts', 'last_error', 'status', 'available_at'])
+                    print(f"Error running notification job {job.id}: {str(e)}")
+
+        return processed
@@ -1,3 +1,286 @@
-from django.test import TestCase
+from unittest.mock import patch
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from .models import Notification, NotificationJob
+from rest_framework.test import APIRequestFactory, force_authenticate
+from .services import NotificationService, NotificationQueue, UnreadCounter
+from .views import NotificationViewSet
+from .consumers import NotificationConsumer
 
-# Create your tests here.
+User = get_user_model()
+
+class BulkNotificationTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f'user{index}', password='test123')
+            for index in range(5)
+        ]
+        Notification.objects.all().delete()
+
+    def test_notify_recipients_single_insert(self):
+        recipients = [user.id for user in self.users] + [self.users[0].id, None]
+
+        with CaptureQueriesContext(connection) as queries:
+            created = NotificationService.notify_recipients(
+                recipients,
+                title='New message',
+                message='Hello',
+                notification_type='message',
+                related_object_id=1,
+                related_object_type='chatroom'
+            )
+
+        self.assertEqual(len(created), 5)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            Notification.objects.filter(related_object_type='chatroom').count(),
+            5
+        )
+
+    @override_settings(NOTIFICATION_BULK_BATCH_SIZE=2)
+    def test_bulk_notifications_respect_batch_size(self):
+        with CaptureQueriesContext(connection) as queries:
+            NotificationService.notify_recipients(
+                self.users,
+                title='System',
+                message='Maintenance tonight',
+                notification_type='system'
+            )
+
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(Notification.objects.count(), 5)
+
+
+@override_settings(NOTIFICATION_QUEUE_ASYNC=True)
+class NotificationQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='queued', password='test123')
+        Notification.objects.all().delete()
+        NotificationJob.objects.all().delete()
+
+    def test_enqueue_defers_notification(self):
+        NotificationQueue.enqueue_notification(
+            [self.user],
+            title='Queued',
+            message='Later',
+            notification_type='system'
+        )
+
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(NotificationQueue.process_jobs(), 1)
+        self.assertEqual(Notification.objects.filter(recipient=self.user).count(), 1)
+        self.assertFalse(NotificationJob.objects.exists())
+
+    def test_failed_insert_keeps_job_for_retry(self):
+        job, = NotificationQueue.enqueue_notification(
+            [self.user],
+            title='Retried',
+            message='db down',
+            notification_type='system'
+        )
+
+        with patch.object(Notification.objects, 'bulk_create', side_effect=Exception('db down')):
+            self.assertEqual(NotificationQueue.process_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.last_error, 'db down')
+        self.assertEqual(job.status, NotificationJob.STATUS_PENDING)
+        self.assertEqual(Notification.objects.count(), 0)
+
+        NotificationJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+        self.assertEqual(NotificationQueue.process_jobs(), 1)
+        self.assertEqual(Notification.objects.filter(title='Retried').count(), 1)
+        self.assertFalse(NotificationJob.objects.exists())
+
+    def test_failed_job_holds_back_same_key(self):
+        failing = NotificationQueue.enqueue_activity('dashboard.Activity', self.user, missing_field='x')
+        NotificationQueue.enqueue_notification(
+            [self.user],
+            title='Second',
+            message='After the failure',
+            notification_type='system'
+        )
+
+        self.assertEqual(NotificationQueue.process_jobs(), 1)
+
+        failing.refresh_from_db()
+        self.assertEqual(failing.attempts, 1)
+        self.assertGreater(failing.available_at, failing.created_at)
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(NotificationJob.objects.count(), 2)
+        # Only held-back jobs are due, so the worker sees an empty queue
+        self.assertEqual(NotificationQueue.process_jobs(), 0)
+
+    def test_held_back_key_does_not_block_other_recipients(self):
+        other = User.objects.create_user(username='other', password='test123')
+        NotificationQueue.enqueue_activity('dashboard.Activity', self.user, missing_field='x')
+        NotificationQueue.process_jobs()
+        NotificationQueue.enqueue_notification(
+            [self.user, other],
+            title='Both',
+            message='Shared',
+            notification_type='system'
+        )
+
+        self.assertEqual(
+            set(NotificationJob.objects.values_list('ordering_key', flat=True)),
+            {f'user:{self.user.id}', f'user:{other.id}'}
+        )
+        self.assertEqual(NotificationQueue.process_jobs(), 1)
+        self.assertEqual(list(Notification.objects.filter(title='Both').values_list('recipient_id', flat=True)), [other.id])
+
+    @override_settings(NOTIFICATION_QUEUE_ASYNC=False)
+    def test_synchronous_mode_runs_inline(self):
+        NotificationQueue.enqueue_notification(
+            [self.user.id],
+            title='Inline',
+            message='Now',
+            notification_type='system'
+        )
+
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertFalse(NotificationJob.objects.exists())
+
+
+class ConditionalNotificationListTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(username='poller', password='test123')
+        Notification.objects.all().delete()
+        NotificationService.notify_recipients([self.user], 'First', 'Hello', 'system')
+
+    def request(self, action, method='get', pk=None, **headers):
+        request = getattr(self.factory, method)('/api/notifications/', **headers)
+        force_authenticate(request, user=self.user)
+        view = NotificationViewSet.as_view({method: action})
+        return view(request, pk=pk) if pk else view(request)
+
+    def test_unchanged_list_returns_304(self):
+        first = self.request('list')
+        self.assertEqual(first.status_code, 200)
+
+        second = self.request('list', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+    def test_mark_read_changes_validator(self):
+        etag = self.request('list')['ETag']
+        notification = Notification.objects.get()
+
+        self.request('mark_read', method='post', pk=notification.pk)
+
+        notification.refresh_from_db()
+        self.assertIsNotNone(notification.read_at)
+        self.assertEqual(self.request('list', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_retrieve_honours_if_modified_since(self):
+        notification = Notification.objects.get()
+        first = self.request('retrieve', pk=notification.pk)
+
+        second = self.request('retrieve', pk=notification.pk, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(second.status_code, 304)
+
+    def test_list_is_cursor_paginated(self):
+        NotificationService.notify_recipients([self.user], 'Second', 'Hello', 'system')
+        NotificationService.notify_recipients([self.user], 'Third', 'Hello', 'system')
+
+        request = self.factory.get('/api/notifications/', {'page_size': 2})
+        force_authenticate(request, user=self.user)
+        response = NotificationViewSet.as_view({'get': 'list'})(request)
+
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn('cursor=', response.data['next'])
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='test123')
+        Notification.objects.all().delete()
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def notify(self, count=1):
+        for _ in range(count):
+            NotificationService.notify_recipients([self.user], 'Hello', 'Body', 'system')
+
+    def test_counter_served_from_cache_and_kept_in_step(self):
+        self.notify(2)
+        self.assertEqual(NotificationService.get_unread_count(self.user), 2)
+
+        self.notify()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(NotificationService.get_unread_count(self.user), 3)
+        self.assertEqual(len(queries), 0)
+
+        notification_id = Notification.objects.first().id
+        self.assertTrue(NotificationService.mark_as_read(notification_id, self.user))
+        # A repeated (or concurrent) mark doesn't take it off the count twice
+        self.assertFalse(NotificationService.mark_as_read(notification_id, self.user))
+        self.assertEqual(UnreadCounter.get(self.user.id), 2)
+
+        self.assertEqual(NotificationService.mark_all_as_read(self.user), 2)
+        self.assertEqual(UnreadCounter.get(self.user.id), 0)
+        self.assertEqual(NotificationService.mark_all_as_read(self.user), 0)
+
+    def test_delete_old_notifications_decrements(self):
+        self.notify(2)
+        self.assertEqual(UnreadCounter.get(self.user.id), 2)
+        Notification.objects.filter(pk=Notification.objects.first().pk).update(
+            created_at=timezone.now() - timezone.timedelta(days=60)
+        )
+
+        NotificationService.delete_old_notifications(days=30)
+
+        self.assertEqual(UnreadCounter.get(self.user.id), 1)
+
+    def test_missing_entry_recounted_from_database(self):
+        self.notify(2)
+        cache.delete(UnreadCounter.key(self.user.id))
+        self.assertEqual(UnreadCounter.get(self.user.id), 2)
+
+
+@override_settings(NOTIFICATION_PUSH_COALESCE_WINDOW=0.05)
+class NotificationPushTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='listener', password='test123')
+        Notification.objects.all().delete()
+        self.missed = NotificationService.notify_recipients([self.user], 'Missed', 'While offline', 'system')[0]
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_replay_then_coalesced_push(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                NotificationConsumer.as_asgi(),
+                f'/ws/notifications/?last_id={self.missed.id - 1}'
+            )
+            communicator.scope['user'] = self.user
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+
+            replay = await communicator.receive_json_from()
+            self.assertTrue(replay['replay'])
+            self.assertEqual([item['id'] for item in replay['created']], [self.missed.id])
+            self.assertEqual(replay['unread_count'], 1)
+
+            for title in ['First', 'Second']:
+                await sync_to_async(NotificationService.notify_recipients)([self.user], title, 'Body', 'system')
+
+            frame = await communicator.receive_json_from()
+            self.assertEqual([item['title'] for item in frame['created']], ['First', 'Second'])
+            self.assertEqual(frame['unread_count'], 3)
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
@@ -4,31 +4,34 @@ from rest_framework.response import Response
 from django.db.models import Q
 from .models import Notification, NotificationPreference
 from .serializers import NotificationSerializer, NotificationPreferenceSerializer
+from .services import NotificationService, UnreadCounter
+from core.mixins import ConditionalGetMixin
+from core.pagination import CreatedAtCursorPagination
 
-class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+class NotificationViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Notifications are never edited, only created and marked read
+    conditional_fields = ('created_at', 'read_at')
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         return Notification.objects.filter(recipient=self.request.user)
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        updated = self.get_queryset().filter(is_read=False).update(is_read=True)
+        updated = NotificationService.mark_all_as_read(request.user)
         return Response({'status': f'{updated} notifications marked as read'})
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         notification = self.get_object()
-        if not notification.is_read:
-            notification.is_read = True
-            notification.save()
+        NotificationService.mark_as_read(notification.id, request.user)
         return Response({'status': 'Notification marked as read'})
 
     @action(detail=False)
     def unread_count(self, request):
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'count': count})
+        return Response({'count': UnreadCounter.get(request.user.id)})
 
 class NotificationPreferenceViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationPreferenceSerializer
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Report, ReportComment
+from .models import Report, ReportComment, RenderJob
 
 @admin.register(Report)
 class ReportAdmin(admin.ModelAdmin):
@@ -15,3 +15,12 @@ class ReportCommentAdmin(admin.ModelAdmin):
     list_filter = ('created_at',)
     search_fields = ('content', 'author__username', 'report__title')
     raw_id_fields = ('report', 'author')
+
+@admin.register(RenderJob)
+class RenderJobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'object_id', 'status', 'requested_by', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status', 'created_at')
+    search_fields = ('content_hash', 'error')
+    raw_id_fields = ('requested_by',)
+    date_hierarchy = 'created_at'
+
@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.reports.services import RenderService
+
+
+class Command(BaseCommand):
+    help = 'Renders queued agreement and report documents in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.RENDER_WORKERS, help='Render processes')
+        parser.add_argument('--batch-size', type=int, help='Jobs claimed per pass (default: twice the workers)')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain pending jobs and exit')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers must be at least 1')
+        batch_size = options['batch_size'] or workers * 2
+        self.stdout.write(f'Render worker started with {workers} processes')
+        self.evicted_at = 0
+
+        try:
+            while True:
+                try:
+                    with ProcessPoolExecutor(max_workers=workers) as executor:
+                        self.work(executor, batch_size, options)
+                    break
+                except BrokenProcessPool as e:
+                    # A render process died (e.g. killed for memory); its jobs were marked failed
+                    self.stderr.write(f'Render pool broke, starting a new one: {str(e)}')
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('Render worker stopped'))
+
+    def work(self, executor, batch_size, options):
+        while True:
+            if time.monotonic() - self.evicted_at >= settings.DOCUMENT_CACHE_EVICT_INTERVAL:
+                deleted, freed = RenderService.evict()
+                if deleted:
+                    self.stdout.write(f'Evicted {deleted} documents ({freed} bytes)')
+                self.evicted_at = time.monotonic()
+
+            processed = RenderService.process_jobs(batch_size=batch_size, executor=executor)
+            if processed:
+                self.stdout.write(f'Processed {processed} jobs')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -109,3 +109,54 @@ class ReportTemplate(models.Model):
 
     def __str__(self):
         return self.name
+
+class RenderJob(models.Model):
+    """Document render requested by a view and run by run_render_worker."""
+    KIND_AGREEMENT_PDF = 'agreement_pdf'
+    KIND_AGREEMENT_DOCX = 'agreement_docx'
+    KIND_REPORT_PDF = 'report_pdf'
+
+    KIND_CHOICES = [
+        (KIND_AGREEMENT_PDF, 'Agreement PDF'),
+        (KIND_AGREEMENT_DOCX, 'Agreement DOCX'),
+        (KIND_REPORT_PDF, 'Report PDF'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    content_hash = models.CharField(max_length=64, blank=True)
+    file_path = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='render_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='render_job_status_idx'),
+            models.Index(fields=['kind', 'object_id'], name='render_job_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} job {self.id}"
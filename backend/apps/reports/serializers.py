@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
-from .models import Report, ReportComment, ReportTemplate
+from django.core.files.storage import default_storage
+from .models import Report, ReportComment, ReportTemplate, RenderJob
 from apps.users.serializers import UserSerializer
 
 class ReportCommentSerializer(serializers.ModelSerializer):
@@ -82,4 +83,23 @@ class ReportSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Can only edit draft or revised reports"
             )
-        return data
\ No newline at end of file
+        return data
+
+class RenderJobSerializer(serializers.ModelSerializer):
+    file_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RenderJob
+        fields = [
+            'id', 'kind', 'object_id', 'status', 'file_url',
+            'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_file_url(self, obj):
+        if not obj.file_path:
+            return None
+        url = default_storage.url(obj.file_path)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
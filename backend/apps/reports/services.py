@@ -1,41 +1,125 @@
+from collections import OrderedDict, defaultdict, namedtuple
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
 from django.utils import timezone
 from django.template import Template, Context
-from django.db import models
-from .models import Report, ReportTemplate
+from django.db import connection, models, transaction
+from .models import Report, ReportTemplate, RenderJob
 import os
+import threading
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.core.files import File
-from weasyprint import HTML
 from docx import Document
 from docx.shared import Inches
-from apps.notifications.services import NotificationService
+from apps.internships.models import Agreement
+from apps.internships.services import AgreementService, render_agreement_docx, render_agreement_pdf
+from apps.notifications.services import NotificationQueue, NotificationService
+from apps.users.services import UserStatsService
+from core.cache import bump_generation
+from core.documents import DocumentCache
+
+class TemplateCache:
+    """
+    Per-process LRU of compiled ReportTemplate bodies.
+
+    Entries are keyed by (template id, updated_at), so an edited template is
+    recompiled on its next use in every process; saving or deleting a
+    template also drops it here straight away.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        # Request threads share this process's cache; every read or write of entries holds the lock
+        self.lock = threading.Lock()
+
+    def get(self, template):
+        key = (template.pk, template.updated_at)
+        with self.lock:
+            compiled = self.entries.get(key)
+            if compiled is not None:
+                self.entries.move_to_end(key)
+                return compiled
+
+        compiled = Template(template.content_template)
+        max_size = self.max_size or settings.REPORT_TEMPLATE_CACHE_SIZE
+        with self.lock:
+            self._drop(template.pk)
+            self.entries[key] = compiled
+            while len(self.entries) > max_size:
+                self.entries.popitem(last=False)
+        return compiled
+
+    def invalidate(self, template_id):
+        with self.lock:
+            self._drop(template_id)
+
+    def _drop(self, template_id):
+        for key in [key for key in self.entries if key[0] == template_id]:
+            del self.entries[key]
+
+
+compiled_templates = TemplateCache()
+
 
 class ReportService:
     @staticmethod
     def create_from_template(template_id, student, internship, **kwargs):
         """Create a new report from a template."""
+        return ReportService.create_many_from_template(template_id, [(student, internship)], **kwargs)[0]
+
+    @staticmethod
+    def create_many_from_template(template_id, pairs, batch_size=500, **kwargs):
+        """
+        Create one report per (student, internship) pair from a template.
+
+        The template is fetched and compiled once and the reports are inserted
+        with bulk_create; stats, activity records and cache generations that
+        Report signals would have handled per row are updated once at the end.
+        """
         template = ReportTemplate.objects.get(id=template_id)
-        
-        # Process template content
-        content_template = Template(template.content_template)
-        context = Context({
-            'student': student,
-            'internship': internship,
-            'date': timezone.now(),
-            **kwargs
-        })
-        processed_content = content_template.render(context)
-
-        # Create report
-        return Report.objects.create(
-            title=f"{template.name} - {timezone.now().strftime('%Y-%m-%d')}",
-            content=processed_content,
-            student=student,
-            mentor=internship.mentor,
-            internship=internship,
-            type=template.report_type
-        )
+        content_template = compiled_templates.get(template)
+        now = timezone.now()
+        title = f"{template.name} - {now.strftime('%Y-%m-%d')}"
+
+        reports = []
+        for student, internship in pairs:
+            context = Context({
+                'student': student,
+                'internship': internship,
+                'date': now,
+                **kwargs
+            })
+            reports.append(Report(
+                title=title,
+                content=content_template.render(context),
+                student=student,
+                internship=internship,
+                report_type=template.report_type
+            ))
+        if not reports:
+            return []
+
+        reports = Report.objects.bulk_create(reports, batch_size=batch_size)
+
+        contribution = defaultdict(list)
+        for report in reports:
+            for user_id, fields in UserStatsService.report_contribution(
+                report.student_id, report.internship.mentor_id, report.status
+            ).items():
+                contribution[user_id].extend(fields)
+        UserStatsService.apply_change(new=contribution)
+
+        NotificationQueue.enqueue_activities('dashboard.Activity', [
+            (report.student_id, {
+                'activity_type': 'report_submission',
+                'description': f'Created new report: {report.title}'
+            })
+            for report in reports
+        ])
+        bump_generation(Report)
+        return reports
 
     @staticmethod
     def get_report_statistics(user):
@@ -64,29 +148,34 @@ class ReportService:
         }
 
     @staticmethod
-    def generate_report_pdf(report):
-        """Generate PDF report with proper formatting."""
-        context = {
-            'report': report,
-            'student': report.student,
-            'mentor': report.mentor,
-            'internship': report.internship,
-            'generated_date': timezone.now(),
+    def document_data(report):
+        """Collect the plain fields a report PDF is rendered from."""
+        internship = report.internship
+        return {
+            'report': {
+                'id': report.id,
+                'title': report.title,
+                'content': report.content,
+                'type': report.get_report_type_display(),
+                'submission_date': report.submission_date,
+            },
+            'student': {'name': report.student.get_full_name(), 'username': report.student.username},
+            'mentor': {'name': internship.mentor.get_full_name() if internship.mentor else ''},
+            'internship': {
+                'title': internship.title,
+                'organization': internship.organization.name,
+                'start_date': internship.start_date,
+                'end_date': internship.end_date,
+            },
+            'generated_date': report.submission_date or report.created_at,
             'university_info': settings.UNIVERSITY_INFO
         }
 
-        html_string = render_to_string('reports/report_template.html', context)
-        html = HTML(string=html_string)
-        
-        output_file = f'report_{report.id}_{timezone.now().strftime("%Y%m%d")}.pdf'
-        output_path = os.path.join(settings.MEDIA_ROOT, 'reports', output_file)
-        html.write_pdf(
-            output_path,
-            stylesheets=[settings.REPORT_CSS],
-            presentational_hints=True
-        )
-
-        return f'reports/{output_file}'
+    @staticmethod
+    def generate_report_pdf(report):
+        """Generate PDF report with proper formatting."""
+        data = ReportService.document_data(report)
+        return DocumentCache.get_or_render(RenderJob.KIND_REPORT_PDF, data, 'reports', 'pdf', render_report_pdf)
 
     @staticmethod
     def generate_report_template(report_type, internship):
@@ -103,18 +192,20 @@ class ReportService:
     def process_submission(report):
         """Process report submission with notifications."""
         try:
-            # Generate PDF version
-            report.file = ReportService.generate_report_pdf(report)
             report.submission_date = timezone.now()
             report.status = 'pending'
             report.save()
 
+            # The PDF version is rendered by run_render_worker
+            RenderService.enqueue(RenderJob.KIND_REPORT_PDF, report, report.student)
+
             # Notify mentor
-            if report.mentor:
+            mentor = report.internship.mentor
+            if mentor:
                 NotificationService.create_notification(
-                    recipient=report.mentor,
+                    recipient=mentor,
                     title='New Report Submission',
-                    message=f'New {report.get_type_display()} report submitted by {report.student.get_full_name()}',
+                    message=f'New {report.get_report_type_display()} report submitted by {report.student.get_full_name()}',
                     notification_type='report'
                 )
 
@@ -149,6 +240,200 @@ class ReportService:
             print(f"Error processing report review: {str(e)}")
             return False
 
+def render_report_pdf(data):
+    """Render a report PDF from ReportService.document_data. Returns bytes."""
+    # Imported here so only render workers load WeasyPrint and its native libraries
+    from weasyprint import HTML
+
+    html_string = render_to_string('reports/report_template.html', data)
+    return HTML(string=html_string).write_pdf(
+        stylesheets=[settings.REPORT_CSS] if settings.REPORT_CSS else None,
+        presentational_hints=True
+    )
+
+
+Renderer = namedtuple('Renderer', ['queryset', 'data', 'render', 'folder', 'extension', 'field'])
+
+RENDERERS = {
+    RenderJob.KIND_AGREEMENT_PDF: Renderer(
+        Agreement.objects.select_related('student', 'organization__contact_person'),
+        AgreementService.document_data, render_agreement_pdf, 'agreements', 'pdf', 'agreement_file'
+    ),
+    RenderJob.KIND_AGREEMENT_DOCX: Renderer(
+        Agreement.objects.select_related('student', 'organization__contact_person'),
+        AgreementService.document_data, render_agreement_docx, 'agreements', 'docx', None
+    ),
+    RenderJob.KIND_REPORT_PDF: Renderer(
+        Report.objects.select_related('student', 'internship__mentor', 'internship__organization'),
+        ReportService.document_data, render_report_pdf, 'reports', 'pdf', 'file'
+    ),
+}
+
+
+class RenderService:
+    """
+    Renders agreement and report documents outside the request.
+
+    Views queue a RenderJob; ``run_render_worker`` loads each job's fields,
+    hands the pure render function to a process pool and writes the result
+    atomically under MEDIA_ROOT. A document already in the DocumentCache is
+    attached when the job is queued, without waiting for the worker.
+    """
+
+    @staticmethod
+    def enqueue(kind, instance, user=None):
+        """Queue a render, reusing an unfinished job for the same document."""
+        RenderService.requeue_stale(kind=kind, object_id=instance.pk)
+        job = RenderJob.objects.filter(
+            kind=kind,
+            object_id=instance.pk,
+            status__in=[RenderJob.STATUS_PENDING, RenderJob.STATUS_RUNNING]
+        ).first()
+        if job is None:
+            job = RenderJob.objects.create(
+                kind=kind,
+                object_id=instance.pk,
+                requested_by=user if user is not None and user.is_authenticated else None
+            )
+            if not settings.RENDER_QUEUE_ASYNC:
+                RenderService.run_jobs([job])
+            else:
+                RenderService.prepare(job)
+        return job
+
+    @staticmethod
+    def process_jobs(batch_size=10, executor=None):
+        """Claim and run pending jobs. Returns the number of jobs claimed."""
+        RenderService.requeue_stale()
+        with transaction.atomic():
+            queryset = RenderJob.objects.filter(status=RenderJob.STATUS_PENDING).order_by('id')
+            if connection.features.has_select_for_update_skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+            jobs = list(queryset[:batch_size])
+            if not jobs:
+                return 0
+            RenderJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=RenderJob.STATUS_RUNNING,
+                started_at=timezone.now()
+            )
+
+        # enqueue already looked these documents up in the cache
+        RenderService.run_jobs(jobs, executor, count_lookups=False)
+        return len(jobs)
+
+    @staticmethod
+    def requeue_stale(**filters):
+        """Put running jobs older than RENDER_JOB_TIMEOUT back in the queue; their worker died."""
+        cutoff = timezone.now() - timedelta(seconds=settings.RENDER_JOB_TIMEOUT)
+        return RenderJob.objects.filter(
+            status=RenderJob.STATUS_RUNNING,
+            started_at__lt=cutoff,
+            **filters
+        ).update(status=RenderJob.STATUS_PENDING, started_at=None)
+
+    @staticmethod
+    def run_jobs(jobs, executor=None, count_lookups=True):
+        """
+        Render jobs, in ``executor`` when given, and record the results.
+
+        Every job ends up done or failed. If the process pool broke, the
+        BrokenProcessPool is raised afterwards so the worker can replace it.
+        """
+        rendering = []
+        broken = None
+        for job in jobs:
+            prepared = RenderService.prepare(job, count_lookup=count_lookups)
+            if prepared is None:
+                continue
+            renderer, instance, data, path = prepared
+            try:
+                future = executor.submit(renderer.render, data) if executor else None
+            except Exception as e:
+                RenderService.fail(job, e)
+                if isinstance(e, BrokenProcessPool):
+                    broken = e
+                continue
+            rendering.append((job, renderer, instance, path, data, future))
+
+        for job, renderer, instance, path, data, future in rendering:
+            try:
+                content = future.result() if future else renderer.render(data)
+                DocumentCache.store(path, content)
+                RenderService.complete(job, renderer, instance, path)
+            except Exception as e:
+                RenderService.fail(job, e)
+                if isinstance(e, BrokenProcessPool):
+                    broken = e
+
+        if broken is not None:
+            raise broken
+
+    @staticmethod
+    def prepare(job, count_lookup=True):
+        """
+        Load a job's input fields and look them up in the DocumentCache.
+
+        A hit completes the job. Returns (renderer, instance, data, path) when
+        the document still has to be rendered, otherwise None.
+        """
+        renderer = RENDERERS[job.kind]
+        try:
+            instance = renderer.queryset.get(pk=job.object_id)
+            data = renderer.data(instance)
+            job.content_hash, path, hit = DocumentCache.lookup(
+                job.kind, data, renderer.folder, renderer.extension, count=count_lookup
+            )
+        except Exception as e:
+            RenderService.fail(job, e)
+            return None
+
+        if hit:
+            RenderService.complete(job, renderer, instance, path)
+            return None
+        return renderer, instance, data, path
+
+    @staticmethod
+    def complete(job, renderer, instance, path):
+        if renderer.field:
+            # A queryset update, so saving the file does not look like a status change to signals
+            type(instance).objects.filter(pk=instance.pk).update(**{renderer.field: path})
+            bump_generation(type(instance))
+        job.status = RenderJob.STATUS_DONE
+        job.file_path = path
+        job.error = ''
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'file_path', 'content_hash', 'error', 'finished_at'])
+
+    @staticmethod
+    def folders():
+        return sorted({renderer.folder for renderer in RENDERERS.values()})
+
+    @staticmethod
+    def evict(max_bytes=None):
+        """Trim rendered documents to the disk budget, keeping files a row still points at."""
+        protected = set()
+        for renderer in RENDERERS.values():
+            if renderer.field:
+                protected.update(
+                    renderer.queryset.model.objects.exclude(**{renderer.field: ''})
+                    .exclude(**{f'{renderer.field}__isnull': True})
+                    .values_list(renderer.field, flat=True)
+                )
+        return DocumentCache.evict(RenderService.folders(), max_bytes, protected)
+
+    @staticmethod
+    def cache_stats():
+        return DocumentCache.stats(RenderService.folders())
+
+    @staticmethod
+    def fail(job, error):
+        print(f"Error rendering {job.kind} {job.object_id}: {str(error)}")
+        job.status = RenderJob.STATUS_FAILED
+        job.error = str(error)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'content_hash', 'error', 'finished_at'])
+
+
 def generate_weekly_report_template(internship):
     """Generate weekly report template."""
     return f"""
@@ -1,29 +1,33 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
-from .models import Report, ReportComment
-from apps.notifications.services import NotificationService
-from apps.dashboard.models import Activity
+from .models import Report, ReportComment, ReportTemplate
+from apps.notifications.services import NotificationQueue
+from apps.users.services import UserStatsService
+from .services import compiled_templates
 
 @receiver(post_save, sender=Report)
 def report_post_save(sender, instance, created, **kwargs):
     if created:
         # Create activity record
-        Activity.objects.create(
-            user=instance.student,
+        NotificationQueue.enqueue_activity(
+            'dashboard.Activity',
+            instance.student,
             activity_type='report_submission',
             description=f'Created new report: {instance.title}'
         )
     else:
         # Status change notifications
         if instance.status == 'pending':
-            Activity.objects.create(
-                user=instance.student,
+            NotificationQueue.enqueue_activity(
+                'dashboard.Activity',
+                instance.student,
                 activity_type='report_submission',
                 description=f'Submitted report: {instance.title}'
             )
         elif instance.status in ['approved', 'rejected', 'revised']:
-            Activity.objects.create(
-                user=instance.mentor if instance.mentor else instance.student,
+            NotificationQueue.enqueue_activity(
+                'dashboard.Activity',
+                instance.internship.mentor or instance.student,
                 activity_type='report_review',
                 description=f'Report {instance.status}: {instance.title}'
             )
@@ -32,19 +36,57 @@ def report_post_save(sender, instance, created, **kwargs):
 def comment_post_save(sender, instance, created, **kwargs):
     if created:
         # Create activity record
-        Activity.objects.create(
-            user=instance.author,
+        NotificationQueue.enqueue_activity(
+            'dashboard.Activity',
+            instance.author,
             activity_type='report_comment',
             description=f'Commented on report: {instance.report.title}'
         )
 
         # Notify relevant users
-        recipients = {instance.report.student, instance.report.mentor} - {instance.author}
-        for recipient in recipients:
-            if recipient:
-                NotificationService.create_notification(
-                    recipient=recipient,
-                    title='New Comment on Report',
-                    message=f'New comment on report: {instance.report.title}',
-                    notification_type='report_comment'
-                ) 
\ No newline at end of file
+        report = instance.report
+        recipients = {report.student_id, report.internship.mentor_id} - {instance.author_id}
+        NotificationQueue.enqueue_notification(
+            recipients,
+            title='New Comment on Report',
+            message=f'New comment on report: {report.title}',
+            notification_type='report_comment'
+        )
+
+@receiver(pre_save, sender=Report)
+def report_stats_snapshot(sender, instance, **kwargs):
+    # Remember what the stored row contributed so post_save can move counters
+    instance._stats_contribution = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values(
+            'student_id', 'internship__mentor_id', 'status'
+        ).first()
+        if previous:
+            instance._stats_contribution = UserStatsService.report_contribution(
+                previous['student_id'],
+                previous['internship__mentor_id'],
+                previous['status']
+            )
+
+@receiver(post_save, sender=Report)
+def report_stats_post_save(sender, instance, **kwargs):
+    UserStatsService.apply_change(
+        old=getattr(instance, '_stats_contribution', None),
+        new=UserStatsService.report_contribution(
+            instance.student_id, instance.internship.mentor_id, instance.status
+        )
+    )
+
+@receiver(post_delete, sender=Report)
+def report_stats_post_delete(sender, instance, **kwargs):
+    UserStatsService.apply_change(
+        old=UserStatsService.report_contribution(
+            instance.student_id, instance.internship.mentor_id, instance.status
+        )
+    )
+
+@receiver([post_save, post_delete], sender=ReportTemplate)
+def report_template_changed(sender, instance, **kwargs):
+    # Drop this process's compiled copy; other processes see the new updated_at
+    compiled_templates.invalidate(instance.pk)
+
@@ -1,3 +1,215 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest.mock import Mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.companies.models import Organization
+from apps.internships.models import Agreement, Internship
+from apps.dashboard.models import Activity
+from apps.users.models import UserStats
+from apps.users.services import UserStatsService
+from core.documents import DocumentCache, write_atomic
+from .models import RenderJob, Report, ReportTemplate
+from .services import RenderService, ReportService, TemplateCache, compiled_templates
+
+User = get_user_model()
+
+
+class RenderServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root, RENDER_QUEUE_ASYNC=True)
+        self.override.enable()
+
+        self.student = User.objects.create_user(username='student', password='test123', first_name='Sam')
+        organization = Organization.objects.create(name='Acme', address='1 Main St')
+        internship = Internship.objects.create(
+            student=self.student,
+            organization=organization,
+            title='Backend Intern',
+            description='API work',
+            start_date=date(2024, 1, 1),
+            end_date=date(2024, 6, 30)
+        )
+        self.agreement = Agreement.objects.create(
+            internship=internship,
+            student=self.student,
+            organization=organization,
+            start_date=internship.start_date,
+            end_date=internship.end_date
+        )
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        cache.clear()
+
+    def test_worker_renders_in_process_pool_and_stores_file(self):
+        job = RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, self.agreement, self.student)
+        self.assertEqual(RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, self.agreement).pk, job.pk)
+
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            self.assertEqual(RenderService.process_jobs(executor=executor), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, RenderJob.STATUS_DONE)
+        self.agreement.refresh_from_db()
+        self.assertEqual(self.agreement.agreement_file.name, job.file_path)
+        with open(os.path.join(self.media_root, job.file_path), 'rb') as rendered:
+            self.assertTrue(rendered.read().startswith(b'%PDF'))
+        self.assertFalse([name for name in os.listdir(os.path.dirname(os.path.join(self.media_root, job.file_path))) if name.startswith('.tmp-')])
+
+    def test_stale_running_job_is_queued_again(self):
+        job = RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, self.agreement)
+        RenderJob.objects.filter(pk=job.pk).update(
+            status=RenderJob.STATUS_RUNNING,
+            started_at=timezone.now() - timedelta(seconds=settings.RENDER_JOB_TIMEOUT + 1)
+        )
+
+        self.assertEqual(RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, self.agreement).status, RenderJob.STATUS_PENDING)
+        self.assertEqual(RenderService.process_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, RenderJob.STATUS_DONE)
+
+    def test_broken_pool_fails_claimed_jobs(self):
+        job = RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, self.agreement)
+        executor = Mock()
+        executor.submit.side_effect = BrokenProcessPool('A process in the pool was terminated abruptly')
+
+        with self.assertRaises(BrokenProcessPool):
+            RenderService.process_jobs(executor=executor)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, RenderJob.STATUS_FAILED)
+        # The next request queues a fresh render instead of waiting on the dead one
+        self.assertNotEqual(RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, self.agreement).pk, job.pk)
+
+    def test_unchanged_document_is_not_rendered_again(self):
+        RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, self.agreement)
+        RenderService.process_jobs()
+        first = RenderJob.objects.get()
+
+        second = RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, self.agreement)
+        RenderService.process_jobs()
+        second.refresh_from_db()
+        self.assertEqual(second.file_path, first.file_path)
+        self.assertEqual(RenderService.cache_stats()['renders'], 1)
+
+        self.student.first_name = 'Samantha'
+        self.student.save()
+        third = RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, self.agreement)
+        RenderService.process_jobs()
+        third.refresh_from_db()
+        self.assertNotEqual(third.file_path, first.file_path)
+
+    def test_cached_document_attached_when_queued(self):
+        RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, self.agreement)
+        RenderService.process_jobs()
+        Agreement.objects.filter(pk=self.agreement.pk).update(agreement_file='')
+
+        job = RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, self.agreement)
+        self.assertEqual(job.status, RenderJob.STATUS_DONE)
+        self.agreement.refresh_from_db()
+        self.assertEqual(self.agreement.agreement_file.name, job.file_path)
+        self.assertEqual(RenderService.cache_stats()['hits'], 1)
+        # One miss for the first render: the worker does not count its repeat lookup
+        self.assertEqual(RenderService.cache_stats()['misses'], 1)
+
+    def test_eviction_drops_least_recently_used_unreferenced_files(self):
+        RenderService.enqueue(RenderJob.KIND_AGREEMENT_PDF, self.agreement)
+        RenderService.process_jobs()
+        self.agreement.refresh_from_db()
+        referenced = self.agreement.agreement_file.name
+
+        for index, name in enumerate(['old', 'recent']):
+            path = write_atomic(f'agreements/{name}.pdf', b'x' * 100)
+            os.utime(os.path.join(self.media_root, path), (index + 1, index + 1))
+        os.utime(os.path.join(self.media_root, referenced), (0, 0))
+
+        deleted, freed = RenderService.evict(max_bytes=os.path.getsize(os.path.join(self.media_root, referenced)) + 100)
+
+        self.assertEqual((deleted, freed), (1, 100))
+        remaining = {path for path, _, _ in DocumentCache.files(['agreements'])}
+        self.assertEqual(remaining, {referenced, 'agreements/recent.pdf'})
+        self.assertEqual(RenderService.cache_stats()['evictions'], 1)
+
+
+@override_settings(NOTIFICATION_QUEUE_ASYNC=False)
+class ReportTemplateTests(TestCase):
+    def setUp(self):
+        self.mentor = User.objects.create_user(username='mentor', password='test123')
+        organization = Organization.objects.create(name='Acme')
+        self.pairs = []
+        for index in range(3):
+            student = User.objects.create_user(username=f'student{index}', password='test123', first_name=f'S{index}')
+            internship = Internship.objects.create(
+                student=student,
+                mentor=self.mentor,
+                organization=organization,
+                title='Intern',
+                description='Work',
+                start_date=date(2024, 1, 1),
+                end_date=date(2024, 6, 30)
+            )
+            self.pairs.append((student, internship))
+        self.template = ReportTemplate.objects.create(
+            name='Weekly',
+            description='Weekly report',
+            content_template='{{ student.first_name }} at {{ internship.organization.name }}, week {{ week }}',
+            report_type=Report.TYPE_WEEKLY
+        )
+
+    def test_compiled_template_reused_until_changed(self):
+        templates = TemplateCache(max_size=1)
+        compiled = templates.get(self.template)
+        self.assertIs(templates.get(self.template), compiled)
+
+        self.template.content_template = 'changed'
+        self.template.save()
+        self.assertIsNot(templates.get(self.template), compiled)
+        self.assertEqual(len(templates.entries), 1)
+
+    def test_saving_template_drops_compiled_copy(self):
+        compiled_templates.get(self.template)
+        self.template.save()
+        self.assertFalse([key for key in compiled_templates.entries if key[0] == self.template.pk])
+
+    def test_cache_shared_between_threads(self):
+        templates = TemplateCache(max_size=8)
+        versions = [
+            SimpleNamespace(pk=index % 4, updated_at=index, content_template=f'v{index}')
+            for index in range(400)
+        ]
+
+        def use(version):
+            templates.get(version)
+            templates.invalidate((version.pk + 1) % 4)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(use, versions))
+        self.assertLessEqual(len(templates.entries), 8)
+
+    def test_bulk_render_creates_reports_stats_and_activity(self):
+        for student, _ in self.pairs:
+            UserStatsService.rebuild(student)
+
+        reports = ReportService.create_many_from_template(self.template.id, self.pairs, week=3)
+
+        self.assertEqual(len(reports), 3)
+        self.assertEqual(
+            sorted(Report.objects.values_list('content', flat=True)),
+            ['S0 at Acme, week 3', 'S1 at Acme, week 3', 'S2 at Acme, week 3']
+        )
+        self.assertTrue(all(report.report_type == Report.TYPE_WEEKLY for report in reports))
+        self.assertEqual(UserStats.objects.get(user=self.pairs[0][0]).reports_total, 1)
+        self.assertEqual(Activity.objects.filter(activity_type='report_submission').count(), 3)
 
-# Create your tests here.
@@ -9,6 +9,9 @@ urlpatterns = [
     path('preliminary/status/', views.PreliminaryReportStatusView.as_view(), name='preliminary-status'),
     path('preliminary/', views.PreliminaryReportView.as_view(), name='preliminary-report'),
     path('submit/', views.ReportViewSet.as_view({'post': 'create'}), name='submit-report'),
+    path('render-jobs/', views.RenderJobViewSet.as_view({'get': 'list'}), name='render-job-list'),
+    path('render-jobs/cache/', views.RenderJobViewSet.as_view({'get': 'cache_stats'}), name='render-job-cache'),
+    path('render-jobs/<int:pk>/', views.RenderJobViewSet.as_view({'get': 'retrieve'}), name='render-job-detail'),
     path('<int:pk>/comments/', views.ReportViewSet.as_view({'post': 'add_comment'}), name='report-comments'),
     path('', include(router.urls)),
 ]
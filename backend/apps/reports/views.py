@@ -3,17 +3,20 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.core.exceptions import ValidationError
-from .models import Report, ReportTemplate, Internship
+from .models import Report, ReportTemplate, Internship, RenderJob
 from .serializers import (
     ReportSerializer, 
     ReportTemplateSerializer,
-    ReportCommentSerializer
+    ReportCommentSerializer,
+    RenderJobSerializer
 )
 from .permissions import IsReportParticipant, CanReviewReports
+from .services import RenderService
 from apps.notifications.services import NotificationService
 from rest_framework.views import APIView
+from core.mixins import ConditionalGetMixin
 
-class ReportViewSet(viewsets.ModelViewSet):
+class ReportViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ReportSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -100,15 +103,13 @@ class ReportViewSet(viewsets.ModelViewSet):
             )
 
             # Notify relevant users
-            recipients = {report.student, report.mentor} - {request.user}
-            for recipient in recipients:
-                if recipient:
-                    NotificationService.create_notification(
-                        recipient=recipient,
-                        title='New Comment on Report',
-                        message=f'New comment on report: {report.title}',
-                        notification_type='report_comment'
-                    )
+            recipients = {report.student_id, report.internship.mentor_id} - {request.user.id}
+            NotificationService.notify_recipients(
+                recipients,
+                title='New Comment on Report',
+                message=f'New comment on report: {report.title}',
+                notification_type='report_comment'
+            )
 
             return Response(
                 ReportCommentSerializer(comment).data,
@@ -127,6 +128,28 @@ class ReportTemplateViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+class RenderJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status of document renders queued by agreement and report views."""
+    serializer_class = RenderJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['kind', 'object_id', 'status']
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.user_type in ['teacher', 'admin']:
+            return RenderJob.objects.all()
+        return RenderJob.objects.filter(requested_by=user)
+
+    def cache_stats(self, request):
+        """Document cache hit/miss counters and disk usage."""
+        if request.user.user_type not in ['teacher', 'admin']:
+            return Response(
+                {'error': 'Only teachers and admins can view cache statistics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response(RenderService.cache_stats())
+
 class PreliminaryReportStatusView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
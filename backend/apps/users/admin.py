@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Activity, NotificationPreference
+from .models import User, Activity, NotificationPreference, UserStats
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -31,3 +31,9 @@ class NotificationPreferenceAdmin(admin.ModelAdmin):
     list_display = ('user', 'email_notifications', 'push_notifications', 'sms_notifications')
     list_filter = ('email_notifications', 'push_notifications', 'sms_notifications')
     search_fields = ('user__username',)
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'internships_total', 'reports_total', 'tasks_total', 'mentored_total', 'updated_at')
+    search_fields = ('user__username',)
+    raw_id_fields = ('user',)
@@ -52,6 +52,9 @@ class Activity(models.Model):
         verbose_name = _('activity')
         verbose_name_plural = _('activities')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='user_activity_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.activity_type}"
@@ -76,4 +79,36 @@ class NotificationPreference(models.Model):
             'email_notifications': True,
             'push_notifications': True,
             'sms_notifications': False,
-        }
\ No newline at end of file
+        }
+
+class UserStats(models.Model):
+    """Denormalized per-user counters kept up to date by model signals."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+
+    # Student counters
+    internships_total = models.IntegerField(default=0)
+    internships_active = models.IntegerField(default=0)
+    internships_completed = models.IntegerField(default=0)
+    reports_total = models.IntegerField(default=0)
+    reports_pending = models.IntegerField(default=0)
+    reports_approved = models.IntegerField(default=0)
+    reports_rejected = models.IntegerField(default=0)
+    tasks_total = models.IntegerField(default=0)
+    tasks_completed = models.IntegerField(default=0)
+    tasks_pending = models.IntegerField(default=0)
+
+    # Mentor counters
+    mentored_total = models.IntegerField(default=0)
+    mentored_active = models.IntegerField(default=0)
+    reports_pending_review = models.IntegerField(default=0)
+    reports_reviewed = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('user stats')
+        verbose_name_plural = _('user stats')
+
+    def __str__(self):
+        return f"{self.user.username}'s stats"
+
@@ -1,6 +1,8 @@
-from django.db.models import Q, Count
+from collections import Counter, defaultdict
+from django.db.models import Q, Count, F
 from django.utils import timezone
-from .models import User
+from .models import User, UserStats
+from core.cache import bump_generation
 
 class UserService:
     @staticmethod
@@ -49,4 +51,137 @@ class UserService:
                 'reports_reviewed': user.reviewed_reports.count()
             })
 
-        return stats 
\ No newline at end of file
+        return stats
+
+class UserStatsService:
+    """Maintain the denormalized UserStats counters."""
+
+    @staticmethod
+    def internship_contribution(student_id, mentor_id, status):
+        """Counters an internship in the given state adds to its participants."""
+        from apps.internships.models import Internship
+
+        contribution = defaultdict(list)
+        contribution[student_id].append('internships_total')
+        if status == Internship.STATUS_ACTIVE:
+            contribution[student_id].append('internships_active')
+        elif status == Internship.STATUS_COMPLETED:
+            contribution[student_id].append('internships_completed')
+
+        if mentor_id:
+            contribution[mentor_id].append('mentored_total')
+            if status == Internship.STATUS_ACTIVE:
+                contribution[mentor_id].append('mentored_active')
+        return contribution
+
+    @staticmethod
+    def task_contribution(student_id, status):
+        """Counters a task in the given state adds to its student."""
+        contribution = defaultdict(list)
+        contribution[student_id].append('tasks_total')
+        if status == 'completed':
+            contribution[student_id].append('tasks_completed')
+        elif status == 'pending':
+            contribution[student_id].append('tasks_pending')
+        return contribution
+
+    @staticmethod
+    def report_contribution(student_id, mentor_id, status):
+        """Counters a report in the given state adds to its student and mentor."""
+        contribution = defaultdict(list)
+        contribution[student_id].append('reports_total')
+        if status in ['pending', 'approved', 'rejected']:
+            contribution[student_id].append(f'reports_{status}')
+
+        if mentor_id:
+            if status == 'pending':
+                contribution[mentor_id].append('reports_pending_review')
+            elif status in ['approved', 'rejected']:
+                contribution[mentor_id].append('reports_reviewed')
+        return contribution
+
+    @staticmethod
+    def mentor_reports_contribution(internship_id, mentor_id):
+        """Counters an internship's reports add to its mentor."""
+        from apps.reports.models import Report
+
+        contribution = defaultdict(list)
+        if not mentor_id:
+            return contribution
+        statuses = Report.objects.filter(internship_id=internship_id).values('status').annotate(count=Count('id'))
+        for row in statuses:
+            fields = UserStatsService.report_contribution(None, mentor_id, row['status'])[mentor_id]
+            contribution[mentor_id].extend(fields * row['count'])
+        return contribution
+
+    @staticmethod
+    def apply_change(old=None, new=None):
+        """Move counters from an old contribution to a new one with F() updates."""
+        deltas = defaultdict(Counter)
+        for user_id, fields in (new or {}).items():
+            for field in fields:
+                deltas[user_id][field] += 1
+        for user_id, fields in (old or {}).items():
+            for field in fields:
+                deltas[user_id][field] -= 1
+
+        changed = False
+        for user_id, counter in deltas.items():
+            updates = {
+                field: F(field) + delta
+                for field, delta in counter.items()
+                if delta
+            }
+            # Users without a row are rebuilt from scratch on first read
+            if user_id and updates:
+                UserStats.objects.filter(user_id=user_id).update(**updates)
+                changed = True
+        if changed:
+            bump_generation(UserStats)
+
+    @staticmethod
+    def rebuild(user):
+        """Recompute a user's counters from the source tables."""
+        from apps.internships.models import Internship, Task
+        from apps.reports.models import Report
+
+        active = Internship.STATUS_ACTIVE
+        completed = Internship.STATUS_COMPLETED
+
+        values = {}
+        values.update(Internship.objects.filter(student=user).aggregate(
+            internships_total=Count('id'),
+            internships_active=Count('id', filter=Q(status=active)),
+            internships_completed=Count('id', filter=Q(status=completed))
+        ))
+        values.update(Report.objects.filter(student=user).aggregate(
+            reports_total=Count('id'),
+            reports_pending=Count('id', filter=Q(status='pending')),
+            reports_approved=Count('id', filter=Q(status='approved')),
+            reports_rejected=Count('id', filter=Q(status='rejected'))
+        ))
+        values.update(Task.objects.filter(internship__student=user).aggregate(
+            tasks_total=Count('id'),
+            tasks_completed=Count('id', filter=Q(status='completed')),
+            tasks_pending=Count('id', filter=Q(status='pending'))
+        ))
+        values.update(Internship.objects.filter(mentor=user).aggregate(
+            mentored_total=Count('id'),
+            mentored_active=Count('id', filter=Q(status=active))
+        ))
+        values.update(Report.objects.filter(internship__mentor=user).aggregate(
+            reports_pending_review=Count('id', filter=Q(status='pending')),
+            reports_reviewed=Count('id', filter=Q(status__in=['approved', 'rejected']))
+        ))
+
+        stats, created = UserStats.objects.update_or_create(user=user, defaults=values)
+        return stats
+
+    @staticmethod
+    def get_stats(user):
+        """Get a user's counters, building the row on first access."""
+        stats = UserStats.objects.filter(user=user).first()
+        if stats is None:
+            stats = UserStatsService.rebuild(user)
+        return stats
+
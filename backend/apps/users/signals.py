@@ -4,7 +4,7 @@ from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
 from .models import User, NotificationPreference
-from apps.notifications.services import NotificationService
+from apps.notifications.services import NotificationQueue
 from apps.internships.models import Report, Internship
 
 @receiver(post_save, sender=User)
@@ -19,8 +19,8 @@ def user_post_save(sender, instance, created, **kwargs):
                 )
 
                 # Create welcome notification
-                NotificationService.create_notification(
-                    recipient=instance,
+                NotificationQueue.enqueue_notification(
+                    [instance],
                     title='Welcome to IMS',
                     message=f'Welcome to the Internship Management System, {instance.get_full_name() or instance.username}!',
                     notification_type='system'
@@ -156,3 +156,104 @@ class UserValidationTests(TestCase):
         }
         response = self.client.post(self.register_url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class UserStatsTests(TestCase):
+    def setUp(self):
+        from apps.companies.models import Organization
+        from apps.internships.models import Internship
+
+        self.student = User.objects.create_user(
+            username='student',
+            password='test123',
+            user_type='student'
+        )
+        self.mentor = User.objects.create_user(
+            username='mentor',
+            password='test123',
+            user_type='mentor'
+        )
+        organization = Organization.objects.create(name='Test Org')
+        self.internship = Internship.objects.create(
+            student=self.student,
+            mentor=self.mentor,
+            organization=organization,
+            title='Test Internship',
+            description='Test Description',
+            start_date='2024-01-01',
+            end_date='2024-06-30'
+        )
+
+    def test_stats_built_on_first_read(self):
+        from .services import UserStatsService
+
+        stats = UserStatsService.get_stats(self.student)
+        self.assertEqual(stats.internships_total, 1)
+        self.assertEqual(stats.internships_active, 0)
+
+    def test_signals_keep_counters_in_sync(self):
+        from apps.internships.models import Internship, Task
+        from apps.reports.models import Report
+        from .services import UserStatsService
+
+        UserStatsService.get_stats(self.student)
+        UserStatsService.get_stats(self.mentor)
+
+        self.internship.status = Internship.STATUS_ACTIVE
+        self.internship.save()
+        report = Report.objects.create(
+            title='Week 1',
+            content='Content',
+            student=self.student,
+            internship=self.internship,
+            report_type='weekly',
+            status='pending'
+        )
+        Task.objects.create(
+            internship=self.internship,
+            title='Task',
+            description='Description',
+            due_date='2024-02-01'
+        )
+        report.status = 'approved'
+        report.save()
+
+        student_stats = UserStatsService.get_stats(self.student)
+        mentor_stats = UserStatsService.get_stats(self.mentor)
+        self.assertEqual(student_stats.internships_active, 1)
+        self.assertEqual(student_stats.reports_total, 1)
+        self.assertEqual(student_stats.reports_pending, 0)
+        self.assertEqual(student_stats.reports_approved, 1)
+        self.assertEqual(student_stats.tasks_pending, 1)
+        self.assertEqual(mentor_stats.mentored_active, 1)
+        self.assertEqual(mentor_stats.reports_reviewed, 1)
+
+        report.delete()
+        student_stats.refresh_from_db()
+        self.assertEqual(student_stats.reports_total, 0)
+        self.assertEqual(student_stats.reports_approved, 0)
+
+    def test_mentor_change_moves_report_counters(self):
+        from apps.reports.models import Report
+        from .services import UserStatsService
+
+        for status in ['pending', 'approved']:
+            Report.objects.create(
+                title='Week',
+                content='Content',
+                student=self.student,
+                internship=self.internship,
+                report_type='weekly',
+                status=status
+            )
+        new_mentor = User.objects.create_user(username='new_mentor', password='test123', user_type='mentor')
+        old_stats = UserStatsService.get_stats(self.mentor)
+        new_stats = UserStatsService.get_stats(new_mentor)
+
+        self.internship.mentor = new_mentor
+        self.internship.save()
+
+        old_stats.refresh_from_db()
+        new_stats.refresh_from_db()
+        self.assertEqual((old_stats.reports_pending_review, old_stats.reports_reviewed), (0, 0))
+        self.assertEqual((new_stats.reports_pending_review, new_stats.reports_reviewed), (1, 1))
+        self.assertEqual(new_stats.mentored_total, 1)
@@ -5,7 +5,9 @@ from django.db.models import Count, Q
 from .serializers import UserSerializer, LoginSerializer, ActivitySerializer, NotificationPreferenceSerializer, UserRegistrationSerializer
 from .permissions import IsUserManagerOrSelf, IsAdminUser
 from .models import User, Activity, NotificationPreference
-from apps.internships.models import Internship, Report, Task
+from .services import UserStatsService
+from apps.internships.models import Internship
+from apps.reports.models import Report
 from django.contrib.auth import get_user_model, authenticate, login
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.views import APIView
@@ -15,6 +17,7 @@ from django.utils.decorators import method_decorator
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
 from django.conf import settings
+from core.cache import cache_response
 
 User = get_user_model()
 
@@ -104,59 +107,64 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @cache_response(timeout=300, key_prefix='user_stats', models=[
+        User, 'users.userstats', Internship, Report
+    ])
     def stats(self, request):
         try:
             user = request.user
             stats = {}
 
             if user.user_type == 'student':
-                internships = Internship.objects.filter(student=user)
-                reports = Report.objects.filter(student=user)
-                
+                counters = UserStatsService.get_stats(user)
                 stats = {
                     'internships': {
-                        'total': internships.count(),
-                        'active': internships.filter(status='active').count(),
-                        'completed': internships.filter(status='completed').count()
+                        'total': counters.internships_total,
+                        'active': counters.internships_active,
+                        'completed': counters.internships_completed
                     },
                     'reports': {
-                        'total': reports.count(),
-                        'pending': reports.filter(status='pending').count(),
-                        'approved': reports.filter(status='approved').count(),
-                        'rejected': reports.filter(status='rejected').count()
+                        'total': counters.reports_total,
+                        'pending': counters.reports_pending,
+                        'approved': counters.reports_approved,
+                        'rejected': counters.reports_rejected
                     },
                     'tasks': {
-                        'total': Task.objects.filter(internship__student=user).count(),
-                        'completed': Task.objects.filter(internship__student=user, status='completed').count(),
-                        'pending': Task.objects.filter(internship__student=user, status='pending').count()
+                        'total': counters.tasks_total,
+                        'completed': counters.tasks_completed,
+                        'pending': counters.tasks_pending
                     }
                 }
             elif user.user_type == 'mentor':
+                counters = UserStatsService.get_stats(user)
                 stats = {
                     'students': {
-                        'total': Internship.objects.filter(mentor=user).count(),
-                        'active': Internship.objects.filter(mentor=user, status='active').count()
+                        'total': counters.mentored_total,
+                        'active': counters.mentored_active
                     },
                     'reports': {
-                        'pending_review': Report.objects.filter(mentor=user, status='pending').count(),
-                        'reviewed': Report.objects.filter(mentor=user).exclude(status='pending').count()
+                        'pending_review': counters.reports_pending_review,
+                        'reviewed': counters.reports_reviewed
                     }
                 }
             elif user.user_type in ['teacher', 'admin']:
+                # Site-wide numbers are not per-user, so aggregate them directly
+                internships = Internship.objects.aggregate(
+                    total=Count('id'),
+                    active=Count('id', filter=Q(status=Internship.STATUS_ACTIVE)),
+                    completed=Count('id', filter=Q(status=Internship.STATUS_COMPLETED))
+                )
+                reports = Report.objects.aggregate(
+                    total=Count('id'),
+                    pending=Count('id', filter=Q(status='pending'))
+                )
                 stats = {
                     'students': {
                         'total': User.objects.filter(user_type='student').count(),
-                        'active': Internship.objects.filter(status='active').count()
-                    },
-                    'reports': {
-                        'total': Report.objects.all().count(),
-                        'pending': Report.objects.filter(status='pending').count()
+                        'active': internships['active']
                     },
-                    'internships': {
-                        'total': Internship.objects.all().count(),
-                        'active': Internship.objects.filter(status='active').count(),
-                        'completed': Internship.objects.filter(status='completed').count()
-                    }
+                    'reports': reports,
+                    'internships': internships
                 }
 
             return Response({
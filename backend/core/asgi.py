@@ -9,19 +9,25 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+# Set up Django before the routing modules import models
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from channels.security.websocket import AllowedHostsOriginValidator
-from apps.chat import routing
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+from apps.chat import routing as chat_routing
+from apps.notifications import routing as notification_routing
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(
         AuthMiddlewareStack(
             URLRouter(
-                routing.websocket_urlpatterns
+                chat_routing.websocket_urlpatterns +
+                notification_routing.websocket_urlpatterns
             )
         )
     ),
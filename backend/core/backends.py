@@ -0,0 +1,164 @@
+"""
+Shared cache and channel layer configuration.
+
+With ``REDIS_URL`` set every worker talks to the same Redis server, so cached
+responses, presence and websocket groups are shared across gunicorn/daphne
+processes. Without it (local development, the test suite) the in-memory
+backends are used and nothing needs to be running.
+"""
+import asyncio
+import time
+import uuid
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+# Seconds to stay on the local fallback after Redis stops answering
+FALLBACK_RETRY_INTERVAL = 30
+# Seconds the channel layer health check waits for its message to come back
+HEALTH_CHECK_TIMEOUT = 2
+
+
+def cache_settings(redis_url, key_prefix='ims'):
+    """Get the CACHES setting for the given Redis URL."""
+    if not redis_url:
+        return {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'unique-snowflake',
+            }
+        }
+    return {
+        'default': {
+            'BACKEND': 'core.backends.FallbackCache',
+            'LOCATION': redis_url,
+            'KEY_PREFIX': key_prefix,
+            'OPTIONS': {
+                'socket_connect_timeout': 1,
+                'socket_timeout': 1,
+            },
+        }
+    }
+
+
+def channel_layer_settings(redis_url, prefix='ims'):
+    """Get the CHANNEL_LAYERS setting for the given Redis URL."""
+    if not redis_url:
+        return {
+            'default': {
+                'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            }
+        }
+    return {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [redis_url],
+                'prefix': prefix,
+                'capacity': 1500,
+                'expiry': 10,
+            },
+        }
+    }
+
+
+class FallbackCache(RedisCache):
+    """
+    Redis cache that keeps serving from a per-worker LocMemCache while Redis
+    is unreachable, and goes back to Redis after FALLBACK_RETRY_INTERVAL.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._fallback = LocMemCache(f'fallback-{id(self)}', {
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'KEY_PREFIX': params.get('KEY_PREFIX', ''),
+        })
+        self._failed_at = None
+
+    @property
+    def using_fallback(self):
+        return self._failed_at is not None and time.monotonic() - self._failed_at < FALLBACK_RETRY_INTERVAL
+
+    def _call(self, method, *args, **kwargs):
+        if not self.using_fallback:
+            try:
+                result = getattr(super(), method)(*args, **kwargs)
+                self._failed_at = None
+                return result
+            except Exception as e:
+                if self._failed_at is None:
+                    print(f"Error reaching cache server, using local cache: {str(e)}")
+                self._failed_at = time.monotonic()
+        return getattr(self._fallback, method)(*args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        return self._call('add', *args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return self._call('get', *args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self._call('set', *args, **kwargs)
+
+    def touch(self, *args, **kwargs):
+        return self._call('touch', *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._call('delete', *args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        return self._call('get_many', *args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return self._call('set_many', *args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        return self._call('delete_many', *args, **kwargs)
+
+    def has_key(self, *args, **kwargs):
+        return self._call('has_key', *args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        return self._call('incr', *args, **kwargs)
+
+    def clear(self):
+        return self._call('clear')
+
+
+def check_cache(alias='default'):
+    """Write and read back a key. Returns (ok, detail); detail is for logs, not clients."""
+    try:
+        backend = caches[alias]
+        key = f'health_check_{uuid.uuid4().hex}'
+        backend.set(key, 'ok', 10)
+        ok = backend.get(key) == 'ok'
+        backend.delete(key)
+        if getattr(backend, 'using_fallback', False):
+            return False, 'using local fallback'
+        return ok, backend.__class__.__name__
+    except Exception as e:
+        return False, str(e)
+
+
+def check_channel_layer(alias='default', timeout=HEALTH_CHECK_TIMEOUT):
+    """Send a message to a fresh channel and receive it. Returns (ok, detail); detail is for logs, not clients."""
+    from channels.layers import get_channel_layer
+
+    try:
+        layer = get_channel_layer(alias)
+        if layer is None:
+            return False, 'not configured'
+
+        async def round_trip():
+            channel = await layer.new_channel()
+            await layer.send(channel, {'type': 'health.check'})
+            return await asyncio.wait_for(layer.receive(channel), timeout)
+
+        message = async_to_sync(round_trip)()
+        return message.get('type') == 'health.check', layer.__class__.__name__
+    except asyncio.TimeoutError:
+        return False, f'no reply within {timeout}s'
+    except Exception as e:
+        return False, str(e)
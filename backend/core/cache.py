@@ -1,27 +1,118 @@
 from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, quote_etag
 from functools import wraps
-from django.conf import settings
 import hashlib
 import json
+import time
+
+
+def model_label(model):
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def generation_key(model):
+    return f"cache_generation:{model_label(model)}"
+
+
+def get_generations(models):
+    """Get the current generation of each model, starting missing ones at a fresh value."""
+    keys = [generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # Seed from the clock so a counter lost to eviction never repeats an old value
+            cache.add(key, int(time.time() * 1000), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+# Labels of the models some cached response is built from, filled in by cache_response
+cached_models = set()
+
+
+def track_models(models):
+    cached_models.update(model_label(model) for model in models)
+
+
+def is_tracked(model):
+    return model_label(model) in cached_models
+
+
+def bump_generation(model):
+    """Invalidate every cached response that depends on the model."""
+    key = generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def cache_response(timeout=300, key_prefix='', models=(), max_age=None):
+    """
+    Cache the rendered body of a DRF view method per user and request.
+
+    ``models`` lists the models (classes or "app_label.model" labels) the
+    response is built from; saving or deleting any of them changes the cache
+    key, so stale entries are never served and simply expire. Only saves of
+    models listed here invalidate anything. With
+    ``max_age`` the response also carries ``Cache-Control: private, max-age``
+    so browsers can reuse it without asking.
+    """
+    track_models(models)
 
-def cache_response(timeout=300, key_prefix=''):
     def decorator(view_func):
         @wraps(view_func)
-        def wrapper(request, *args, **kwargs):
-            # Create unique cache key based on user, method and params
-            cache_key = f"{key_prefix}:{request.user.id}:{request.method}:"
-            cache_key += hashlib.md5(
-                f"{json.dumps(request.GET.dict())}:{json.dumps(kwargs)}".encode()
-            ).hexdigest()
+        def wrapper(view, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(view, request, *args, **kwargs)
+
+            # Create unique cache key based on user, path, params, format and model generations
+            cache_key = f"{key_prefix}:{request.user.id}:"
+            cache_key += hashlib.md5(json.dumps([
+                request.path,
+                sorted(request.GET.lists()),
+                kwargs,
+                request.accepted_renderer.format,
+                get_generations(models)
+            ], default=str).encode()).hexdigest()
 
             # Try to get cached response
-            cached_response = cache.get(cache_key)
-            if cached_response is not None:
-                return cached_response
+            cached = cache.get(cache_key)
+            if cached is not None:
+                if cached['etag'] in request.headers.get('If-None-Match', ''):
+                    response = HttpResponse(status=304)
+                else:
+                    response = HttpResponse(
+                        cached['content'],
+                        status=cached['status'],
+                        content_type=cached['content_type']
+                    )
+                response['ETag'] = cached['etag']
+                response['Last-Modified'] = cached['last_modified']
+                if max_age is not None:
+                    patch_cache_control(response, private=True, max_age=max_age)
+                return response
+
+            # Get fresh response and render it so only bytes are stored
+            response = view_func(view, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response = view.finalize_response(request, response, *args, **kwargs)
+            response.render()
 
-            # Get fresh response
-            response = view_func(request, *args, **kwargs)
-            cache.set(cache_key, response, timeout)
+            response['ETag'] = quote_etag(hashlib.md5(response.content).hexdigest())
+            response['Last-Modified'] = http_date()
+            cache.set(cache_key, {
+                'content': response.content,
+                'status': response.status_code,
+                'content_type': response['Content-Type'],
+                'etag': response['ETag'],
+                'last_modified': response['Last-Modified']
+            }, timeout)
+            if max_age is not None:
+                patch_cache_control(response, private=True, max_age=max_age)
             return response
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator
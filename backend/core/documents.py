@@ -0,0 +1,170 @@
+"""
+Storage helpers for generated documents.
+
+Rendered files are named by a hash of everything that goes into them, so a
+document whose inputs have not changed is found on disk instead of being
+rendered again, and identical documents share one file. Files are written to
+a temporary name next to the target and renamed into place, so readers never
+see a partial file.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def content_hash(kind, data):
+    """Hash a document's kind, input fields and the template version."""
+    source = json.dumps([kind, settings.RENDER_TEMPLATE_VERSION, data], sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def document_path(folder, digest, extension):
+    """Get the MEDIA_ROOT-relative path of a rendered document."""
+    return f'{folder}/{digest}.{extension}'
+
+
+def document_exists(relative_path):
+    return os.path.exists(os.path.join(settings.MEDIA_ROOT, relative_path))
+
+
+def write_atomic(relative_path, content):
+    """Write bytes under MEDIA_ROOT through a temporary file and rename."""
+    path = os.path.join(settings.MEDIA_ROOT, relative_path)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(handle, 'wb') as temp_file:
+            temp_file.write(content)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return relative_path
+
+
+class DocumentCache:
+    """
+    Content-addressed document files with LRU eviction and hit/miss counters.
+
+    A hit touches the file's mtime, so eviction removes the least recently
+    used files first. Counters live in the shared cache so every worker
+    reports into the same totals.
+    """
+    METRICS = ('hits', 'misses', 'renders', 'evictions')
+
+    @staticmethod
+    def metric_key(name):
+        return f'document_cache_{name}'
+
+    @staticmethod
+    def count(name, delta=1):
+        key = DocumentCache.metric_key(name)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            if not cache.add(key, delta, None):
+                cache.incr(key, delta)
+
+    @staticmethod
+    def lookup(kind, data, folder, extension, count=True):
+        """
+        Get (digest, path, hit) for a document, marking a hit as recently used.
+
+        Pass ``count=False`` when repeating a lookup already counted for the
+        same request, so the hit rate is not skewed.
+        """
+        digest = content_hash(kind, data)
+        path = document_path(folder, digest, extension)
+        try:
+            os.utime(os.path.join(settings.MEDIA_ROOT, path))
+        except FileNotFoundError:
+            if count:
+                DocumentCache.count('misses')
+            return digest, path, False
+        if count:
+            DocumentCache.count('hits')
+        return digest, path, True
+
+    @staticmethod
+    def store(path, content):
+        write_atomic(path, content)
+        DocumentCache.count('renders')
+        return path
+
+    @staticmethod
+    def get_or_render(kind, data, folder, extension, render):
+        """Get the path of a document, rendering it with ``render(data)`` on a miss."""
+        _, path, hit = DocumentCache.lookup(kind, data, folder, extension)
+        if not hit:
+            DocumentCache.store(path, render(data))
+        return path
+
+    @staticmethod
+    def files(folders):
+        """Get (path, size, mtime) for every cached file under ``folders``."""
+        found = []
+        for folder in folders:
+            directory = os.path.join(settings.MEDIA_ROOT, folder)
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if entry.is_file() and not entry.name.startswith('.tmp-'):
+                    stat = entry.stat()
+                    found.append((f'{folder}/{entry.name}', stat.st_size, stat.st_mtime))
+        return found
+
+    @staticmethod
+    def evict(folders, max_bytes=None, protected=()):
+        """
+        Delete least recently used files until ``folders`` fit in ``max_bytes``.
+
+        Paths in ``protected`` (files a row still points at) are never
+        deleted. Returns (files deleted, bytes freed).
+        """
+        if max_bytes is None:
+            max_bytes = settings.DOCUMENT_CACHE_MAX_BYTES
+        protected = set(protected)
+        files = DocumentCache.files(folders)
+        total = sum(size for _, size, _ in files)
+
+        deleted = freed = 0
+        for path, size, _ in sorted(files, key=lambda item: item[2]):
+            if total <= max_bytes:
+                break
+            if path in protected:
+                continue
+            try:
+                os.remove(os.path.join(settings.MEDIA_ROOT, path))
+            except FileNotFoundError:
+                pass
+            total -= size
+            deleted += 1
+            freed += size
+
+        if deleted:
+            DocumentCache.count('evictions', deleted)
+        return deleted, freed
+
+    @staticmethod
+    def stats(folders):
+        """Get the counters, hit rate and current disk usage."""
+        values = cache.get_many([DocumentCache.metric_key(name) for name in DocumentCache.METRICS])
+        stats = {name: values.get(DocumentCache.metric_key(name), 0) for name in DocumentCache.METRICS}
+        lookups = stats['hits'] + stats['misses']
+        files = DocumentCache.files(folders)
+        stats.update({
+            'hit_rate': stats['hits'] / lookups if lookups else None,
+            'files': len(files),
+            'bytes': sum(size for _, size, _ in files),
+            'max_bytes': settings.DOCUMENT_CACHE_MAX_BYTES,
+        })
+        return stats
+
@@ -0,0 +1,82 @@
+import hashlib
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+    """
+    Answer If-None-Match / If-Modified-Since on list and retrieve with a 304
+    before anything is serialized.
+
+    The list validator is ``Max()`` of ``conditional_fields`` plus the row
+    count, taken in one aggregate over the filtered queryset. The detail
+    validator is the object's own ``conditional_fields``.
+    """
+    conditional_fields = ('updated_at',)
+
+    def list_validators(self, queryset):
+        """Get the (etag, last_modified) pair for a filtered queryset."""
+        values = queryset.order_by().aggregate(
+            conditional_count=Count('pk', distinct=True),
+            **{f'conditional_{field}': Max(field) for field in self.conditional_fields}
+        )
+        stamps = [values[f'conditional_{field}'] for field in self.conditional_fields]
+        return self.build_validators(values['conditional_count'], stamps)
+
+    def object_validators(self, instance):
+        """Get the (etag, last_modified) pair for one object."""
+        stamps = [getattr(instance, field) for field in self.conditional_fields]
+        return self.build_validators(instance.pk, stamps)
+
+    def build_validators(self, identity, stamps):
+        # Query params select the page, filters and search, so they are part of the tag
+        source = [
+            self.request.user.pk,
+            identity,
+            [stamp.isoformat() if stamp else None for stamp in stamps],
+            sorted(self.request.GET.lists()),
+        ]
+        etag = quote_etag(hashlib.md5(repr(source).encode()).hexdigest())
+        present = [stamp for stamp in stamps if stamp]
+        last_modified = int(max(present).timestamp()) if present else None
+        return etag, last_modified
+
+    def not_modified(self, etag, last_modified, use_modified_since=True):
+        if_none_match = self.request.headers.get('If-None-Match')
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+        if use_modified_since and last_modified is not None:
+            if_modified_since = parse_http_date_safe(self.request.headers.get('If-Modified-Since', ''))
+            return if_modified_since is not None and last_modified <= if_modified_since
+        return False
+
+    def with_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = self.list_validators(queryset)
+
+        # A deleted row never moves Max(), so lists only trust the ETag
+        if self.not_modified(etag, last_modified, use_modified_since=False):
+            return self.with_validators(HttpResponseNotModified(), etag, last_modified)
+
+        response = super().list(request, *args, **kwargs)
+        return self.with_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.object_validators(instance)
+
+        if self.not_modified(etag, last_modified):
+            return self.with_validators(HttpResponseNotModified(), etag, last_modified)
+
+        serializer = self.get_serializer(instance)
+        return self.with_validators(Response(serializer.data), etag, last_modified)
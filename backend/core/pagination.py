@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination on ``created_at`` with ``id`` as a tie-breaker, so the
+    cost of a page does not depend on how deep the client has scrolled.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class SubmittedAtCursorPagination(CreatedAtCursorPagination):
+    ordering = ('-submitted_at', '-id')
+
+
+class LastMessageAtCursorPagination(CreatedAtCursorPagination):
+    """Inbox order: the room with the newest message first."""
+    ordering = ('-last_message_at', '-id')
@@ -0,0 +1,58 @@
+"""
+Chunked deletion of old history rows.
+
+Rows are removed a batch of ids at a time, each batch in its own short
+transaction, so the table is never locked for the whole run. The id scan
+walks a ``(date_field, id)`` index. Batches may be written to a gzipped JSONL
+archive before they are deleted.
+"""
+import gzip
+import json
+import time
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router, transaction
+from core.cache import bump_generation
+
+
+def prune(model, date_field, cutoff, batch_size=1000, pause=0, archive_path=None, before_delete=None):
+    """Delete rows of ``model`` with ``date_field`` before ``cutoff``. Returns the number deleted."""
+    using = router.db_for_write(model)
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk_column = connection.ops.quote_name(model._meta.pk.column)
+
+    queryset = model._base_manager.using(using).filter(**{f'{date_field}__lt': cutoff})
+    archive = gzip.open(archive_path, 'at', encoding='utf-8') if archive_path else None
+    deleted = 0
+
+    try:
+        while True:
+            ids = list(queryset.order_by(date_field, 'pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+
+            with transaction.atomic(using=using):
+                if archive:
+                    for row in model._base_manager.using(using).filter(pk__in=ids).order_by('pk').values():
+                        archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                    archive.flush()
+                if before_delete:
+                    before_delete(ids)
+                # History tables have no dependents, so skip the per-row collector and signals
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'DELETE FROM {table} WHERE {pk_column} IN ({", ".join(["%s"] * len(ids))})',
+                        ids
+                    )
+                    deleted += cursor.rowcount
+
+            bump_generation(model)
+            if len(ids) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+    finally:
+        if archive:
+            archive.close()
+
+    return deleted
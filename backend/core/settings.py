@@ -15,6 +15,7 @@ import os
 import sys
 from datetime import timedelta
 from corsheaders.defaults import default_headers
+from core.backends import cache_settings, channel_layer_settings
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'channels',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -54,6 +56,7 @@ INSTALLED_APPS = [
     'apps.dashboard.apps.DashboardConfig',
     'apps.reports.apps.ReportsConfig',
     'apps.evaluations.apps.EvaluationsConfig',
+    'apps.chat.apps.ChatConfig',
     'rest_framework.authtoken',
     'apps.companies',
 ]
@@ -167,6 +170,19 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Generated documents
+UNIVERSITY_NAME = os.environ.get('UNIVERSITY_NAME', '')
+UNIVERSITY_ADDRESS = os.environ.get('UNIVERSITY_ADDRESS', '')
+UNIVERSITY_INFO = {'name': UNIVERSITY_NAME, 'address': UNIVERSITY_ADDRESS}
+REPORT_CSS = None  # optional stylesheet path for report PDFs
+RENDER_TEMPLATE_VERSION = 1  # bump when document layouts change so cached files are re-rendered
+RENDER_QUEUE_ASYNC = os.environ.get('RENDER_QUEUE_ASYNC', 'True').lower() == 'true'
+RENDER_WORKERS = os.cpu_count() or 1
+RENDER_JOB_TIMEOUT = 600  # seconds before a running job whose worker died is queued again
+REPORT_TEMPLATE_CACHE_SIZE = 128  # compiled ReportTemplate bodies kept per process
+DOCUMENT_CACHE_MAX_BYTES = 2 * 1024 ** 3  # disk budget for rendered documents
+DOCUMENT_CACHE_EVICT_INTERVAL = 300  # seconds between eviction passes in run_render_worker
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -196,13 +212,45 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
-# Cache settings
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
-}
+# Cache and channel layer settings
+# Set REDIS_URL to share both across workers; the test suite always runs in memory
+TESTING = 'test' in sys.argv
+REDIS_URL = '' if TESTING else os.environ.get('REDIS_URL', '')
+CACHES = cache_settings(REDIS_URL)
+
+ASGI_APPLICATION = 'core.asgi.application'
+CHANNEL_LAYERS = channel_layer_settings(REDIS_URL)
+
+# Notification settings
+NOTIFICATION_BULK_BATCH_SIZE = 500
+# Hand notifications, activity logs and channel sends to run_notification_worker
+NOTIFICATION_QUEUE_ASYNC = os.environ.get('NOTIFICATION_QUEUE_ASYNC', 'True').lower() == 'true'
+NOTIFICATION_QUEUE_MAX_ATTEMPTS = 5
+NOTIFICATION_QUEUE_RETRY_DELAY = 10  # seconds, doubled on every attempt
+NOTIFICATION_UNREAD_RECONCILE_INTERVAL = 300  # seconds before a cached unread count is recounted
+NOTIFICATION_PUSH_COALESCE_WINDOW = 0.25  # seconds of pushes merged into one websocket frame
+NOTIFICATION_REPLAY_LIMIT = 100
+
+# History retention, see prune_history
+HISTORY_RETENTION_DAYS = 180
+HISTORY_PRUNE_BATCH_SIZE = 1000
+
+# Chat settings
+CHAT_MESSAGE_FLUSH_INTERVAL = 0.2  # seconds a websocket message may wait before it is written
+CHAT_MESSAGE_FLUSH_SIZE = 200
+# Read state lives in ChatRoomParticipant.last_read_message_id; keep per-message MessageRead rows too
+CHAT_TRACK_MESSAGE_READS = False
+CHAT_MEMBERSHIP_CACHE_TTL = 60  # seconds
+CHAT_PRESENCE_TTL = 60  # seconds a socket counts as online without a heartbeat
+CHAT_PRESENCE_DEBOUNCE = 2  # seconds presence changes are collected before one broadcast
+CHAT_PRESENCE_FLUSH_INTERVAL = 30  # seconds between last_seen writes
+CHAT_PRESENCE_LOCK_TIMEOUT = 2  # seconds a room's presence lock is held, or waited for, at most
+CHAT_TYPING_INTERVAL = 3  # seconds between typing broadcasts per user and room
+CHAT_INBOUND_RATE = 5  # frames per second a socket may send on average
+CHAT_INBOUND_BURST = 20
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
+CHAT_HISTORY_SYNC_LIMIT = 500  # messages returned to a reconnecting client before it must reload
 
 # CSRF Settings
 CSRF_COOKIE_NAME = 'csrftoken'
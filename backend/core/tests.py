@@ -0,0 +1,52 @@
+from unittest.mock import Mock, PropertyMock, patch
+from django.core.cache.backends.redis import RedisCache
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+from .backends import FallbackCache, cache_settings, channel_layer_settings, check_cache, check_channel_layer
+from .views import backend_health
+
+
+class BackendSettingsTests(SimpleTestCase):
+    def test_in_memory_without_redis_url(self):
+        self.assertEqual(
+            cache_settings('')['default']['BACKEND'],
+            'django.core.cache.backends.locmem.LocMemCache'
+        )
+        self.assertEqual(
+            channel_layer_settings('')['default']['BACKEND'],
+            'channels.layers.InMemoryChannelLayer'
+        )
+
+    def test_redis_url_selects_shared_backends(self):
+        self.assertEqual(cache_settings('redis://cache:6379/1')['default']['BACKEND'], 'core.backends.FallbackCache')
+        self.assertEqual(
+            channel_layer_settings('redis://cache:6379/1')['default']['CONFIG']['hosts'],
+            ['redis://cache:6379/1']
+        )
+
+    def test_fallback_cache_serves_locally_when_server_is_down(self):
+        cache = FallbackCache('redis://127.0.0.1:1/0', {})
+        client = Mock()
+        client.set.side_effect = ConnectionError('Connection refused')
+
+        with patch.object(RedisCache, '_cache', new_callable=PropertyMock, return_value=client):
+            cache.set('key', 'value')
+
+            self.assertTrue(client.set.called)
+            self.assertTrue(cache.using_fallback)
+            self.assertEqual(cache.get('key'), 'value')
+            # Redis is not retried until FALLBACK_RETRY_INTERVAL has passed
+            self.assertFalse(client.get.called)
+
+    def test_health_checks_pass_in_memory(self):
+        self.assertEqual(check_cache(), (True, 'LocMemCache'))
+        self.assertEqual(check_channel_layer(), (True, 'InMemoryChannelLayer'))
+
+    def test_health_endpoint_hides_failure_details(self):
+        request = APIRequestFactory().get('/api/health/')
+
+        with patch('core.views.check_cache', return_value=(False, 'Error 111 connecting to cache.internal:6379')):
+            response = backend_health(request)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data, {'status': 'degraded', 'cache': 'unavailable', 'channel_layer': 'ok'})
@@ -23,9 +23,11 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 from apps.users.views import LoginView, PasswordResetView, PasswordResetConfirmView
+from core.views import backend_health
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/health/', backend_health, name='backend_health'),
     # JWT Authentication endpoints
     path('api/users/login/', LoginView.as_view(), name='login'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -40,6 +42,7 @@ urlpatterns = [
     path('api/dashboard/', include('apps.dashboard.urls')),
     path('api/reports/', include('apps.reports.urls')),
     path('api/evaluations/', include('apps.evaluations.urls')),
+    path('api/chat/', include('apps.chat.urls')),
 ]
 
 if settings.DEBUG:
@@ -1,6 +1,8 @@
+from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from .backends import check_cache, check_channel_layer
 
 @api_view(['GET'])
 def api_root(request):
@@ -15,4 +17,20 @@ def health_check(request):
     return Response({
         'status': 'healthy',
         'user': request.user.username
-    }) 
\ No newline at end of file
+    }) 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def backend_health(request):
+    cache_ok, cache_detail = check_cache()
+    channels_ok, channels_detail = check_channel_layer()
+    # Anyone can call this, so the failure details only go to the server log
+    if not cache_ok:
+        print(f"Error in cache health check: {cache_detail}")
+    if not channels_ok:
+        print(f"Error in channel layer health check: {channels_detail}")
+    healthy = cache_ok and channels_ok
+    return Response({
+        'status': 'healthy' if healthy else 'degraded',
+        'cache': 'ok' if cache_ok else 'unavailable',
+        'channel_layer': 'ok' if channels_ok else 'unavailable'
+    }, status=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE)